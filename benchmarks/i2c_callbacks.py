@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Micro-benchmark the Python i2c callbacks against a mock SMBus.
+
+Compares the per-byte callbacks from vl53l5cx-ctypes 0.0.3 with the
+current memmove/string_at implementation, for a firmware upload sized
+write and an 8x8 frame sized read.
+
+"""
+import time
+from ctypes import memmove, c_uint8
+from smbus2 import i2c_msg
+import vl53l5cx_ctypes as vl53l5cx
+from vl53l5cx_ctypes import _I2C_CHUNK_SIZE, _I2C_RD_FUNC, _I2C_WR_FUNC
+
+
+FIRMWARE_PAGES = (0x8000, 0x8000, 0x5000)  # 84k, as uploaded by vl53l5cx_init
+FRAME_SIZE = 1380        # 8x8 frame with all outputs enabled
+
+
+class MockSMBus:
+    """Register map which answers reads and discards writes."""
+    def __init__(self):
+        self.memory = bytearray(0x10000)
+        self.memory[0] = 0xF0  # Device ID
+        self.memory[1] = 0x02  # Revision ID
+
+    def i2c_rdwr(self, *msgs):
+        header = bytes(msgs[0])
+        reg = (header[0] << 8) | header[1]
+        if len(msgs) > 1:
+            msg_r = msgs[1]
+            memmove(msg_r.buf, bytes(self.memory[reg:reg + msg_r.len]), msg_r.len)
+
+
+def legacy_callbacks(i2c):
+    def _i2c_read(address, reg, data_p, length):
+        msg_w = i2c_msg.write(address, [reg >> 8, reg & 0xff])
+        msg_r = i2c_msg.read(address, length)
+        i2c.i2c_rdwr(msg_w, msg_r)
+
+        for index in range(length):
+            data_p[index] = ord(msg_r.buf[index])
+
+        return 0
+
+    def _i2c_write(address, reg, data_p, length):
+        data = []
+        for i in range(length):
+            data.append(data_p[i])
+
+        for offset in range(0, length, _I2C_CHUNK_SIZE):
+            chunk = data[offset:offset + _I2C_CHUNK_SIZE]
+            msg_w = i2c_msg.write(address, [(reg + offset) >> 8, (reg + offset) & 0xff] + chunk)
+            i2c.i2c_rdwr(msg_w)
+
+        return 0
+
+    return _I2C_RD_FUNC(_i2c_read), _I2C_WR_FUNC(_i2c_write)
+
+
+def bench(func, address, sizes, iterations):
+    bufs = [(c_uint8 * size)() for size in sizes]
+    t_start = time.perf_counter()
+    for _ in range(iterations):
+        for size, buf in zip(sizes, bufs):
+            func(address, 0, buf, size)
+    return (time.perf_counter() - t_start) / iterations
+
+
+i2c = MockSMBus()
+sensor = vl53l5cx.VL53L5CX(i2c_dev=i2c, skip_init=True)
+legacy_read, legacy_write = legacy_callbacks(i2c)
+address = vl53l5cx.DEFAULT_I2C_ADDRESS
+
+results = {
+    "firmware write": (bench(legacy_write, address, FIRMWARE_PAGES, 5), bench(sensor._i2c_wr_func, address, FIRMWARE_PAGES, 5)),
+    "frame read": (bench(legacy_read, address, (FRAME_SIZE,), 500), bench(sensor._i2c_rd_func, address, (FRAME_SIZE,), 500))
+}
+
+for name, (legacy, current) in results.items():
+    print(f"{name:16s} legacy: {legacy * 1000:8.3f}ms  current: {current * 1000:8.3f}ms  speedup: {legacy / current:6.1f}x")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Benchmark frame streaming over loopback with the simulated sensor.
+
+Streams frames from a SimulatedVL53L5CX through vl53l5cx_ctypes.network,
+over TCP and UDP at once, and reports the frames per second achieved and
+bytes per frame for full frames, selected fields and delta encoding,
+against pickling VL53L5CX_ResultsData.
+
+"""
+import time
+import pickle
+import asyncio
+import argparse
+import numpy
+import vl53l5cx_ctypes as vl53l5cx
+from vl53l5cx_ctypes.aio import AsyncVL53L5CX
+from vl53l5cx_ctypes.frame import Frame
+from vl53l5cx_ctypes.network import FrameServer, FrameClient, FrameEncoder, FrameDecoder
+from vl53l5cx_ctypes.simulator import SimulatedVL53L5CX, moving_object_scene
+
+
+RANGING_FREQUENCY_HZ = {4 * 4: 60, 8 * 8: 15}
+
+FORMATS = (
+    ("all fields", {}),
+    ("distance+status", {"fields": ("distance_mm", "target_status")}),
+    ("delta", {"fields": ("distance_mm", "target_status"), "delta": True})
+)
+
+parser = argparse.ArgumentParser(description='Benchmark frame streaming over loopback.')
+parser.add_argument('--resolution', type=int, choices=(16, 64), help='Sensor resolution.', default=64)
+parser.add_argument('--seconds', type=float, help='Time to stream each format for.', default=3.0)
+parser.add_argument('--noise', type=float, help='Simulated distance noise in mm, less noise gives smaller deltas.', default=2.0)
+parser.add_argument('--port', type=int, help='UDP port to stream to on 127.0.0.1.', default=5554)
+args = parser.parse_args()
+
+
+def pickled_size(results):
+    # As the dashboards did before
+    return len(pickle.dumps(results))
+
+
+def check_round_trip(frame, **encoding):
+    # Decoded arrays must match the frame exactly, including after a delta
+    encoder = FrameEncoder(**encoding)
+    decoder = FrameDecoder()
+    for _ in range(2):
+        decoded = decoder.decode(encoder.encode(frame))
+        for name in decoded.fields:
+            assert numpy.array_equal(getattr(decoded, name), getattr(frame, name)), name
+        frame.distance_mm[0, 0, 0] += 1
+
+
+async def receive(client, seconds):
+    t_end = time.monotonic() + seconds
+    while time.monotonic() < t_end:
+        try:
+            if await asyncio.wait_for(client.read(), t_end - time.monotonic()) is None:
+                break
+        except asyncio.TimeoutError:
+            break
+    return client.stats()
+
+
+async def stream(sensor, encoding):
+    server = FrameServer(AsyncVL53L5CX(sensor), host="127.0.0.1", port=0, udp=("127.0.0.1", args.port), **encoding)
+    udp = await FrameClient.listen(args.port, host="127.0.0.1")
+    await server.start()
+    task = asyncio.ensure_future(server.serve())
+    tcp = await FrameClient.connect("127.0.0.1", server.port)
+    tcp_stats, udp_stats = await asyncio.gather(receive(tcp, args.seconds), receive(udp, args.seconds))
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    tcp.close()
+    udp.close()
+    return server.stats(), tcp_stats, udp_stats, udp.dropped
+
+
+def main():
+    sensor = vl53l5cx.VL53L5CX(i2c_dev=SimulatedVL53L5CX(scene=moving_object_scene(), noise_mm=args.noise))
+    sensor.set_resolution(args.resolution)
+    sensor.set_ranging_frequency_hz(RANGING_FREQUENCY_HZ[args.resolution])
+
+    sensor.start_ranging()
+    sensor.wait_data_ready()
+    results = sensor.get_data()
+    sensor.stop_ranging()
+    for _, encoding in FORMATS:
+        check_round_trip(Frame(results, args.resolution), **encoding)
+
+    print(f"{args.resolution} zones at {RANGING_FREQUENCY_HZ[args.resolution]}Hz, pickled VL53L5CX_ResultsData: {pickled_size(results)} bytes/frame")
+    print(f"{'':16s} {'sent fps':>9s} {'bytes/frame':>12s} {'tcp fps':>8s} {'udp fps':>8s} {'udp lost':>9s}")
+    for name, encoding in FORMATS:
+        server, tcp, udp, lost = asyncio.run(stream(sensor, encoding))
+        print(f"{name:16s} {server['fps']:9.1f} {server['bytes_per_frame']:12.1f} {tcp['fps']:8.1f} {udp['fps']:8.1f} {lost:9d}")
+
+
+main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Benchmark frame validity masking, orientation, filters and tracking.
+
+Compares the numpy.isin/flipud code from examples/object_tracking.py
+with vl53l5cx_ctypes.processing.FrameProcessor, for single 8x8 frames
+and for a batch of frames as read from a recording, then times each
+vl53l5cx_ctypes.filters filter per frame for one and several sensors,
+and the vl53l5cx_ctypes.tracking object tracker.
+
+"""
+import time
+import argparse
+import numpy
+import vl53l5cx_ctypes as vl53l5cx
+from vl53l5cx_ctypes import STATUS_RANGE_VALID, STATUS_RANGE_VALID_LARGE_PULSE
+from vl53l5cx_ctypes.processing import FrameProcessor
+from vl53l5cx_ctypes.filters import EMAFilter, MedianFilter, KalmanFilter
+from vl53l5cx_ctypes.tracking import ObjectTracker
+
+
+parser = argparse.ArgumentParser(description='Benchmark frame validity masking, orientation, filters and tracking.')
+parser.add_argument('--rounds', type=int, help='Number of single frame rounds.', default=20000)
+parser.add_argument('--batch', type=int, help='Number of frames in a batch.', default=10000)
+parser.add_argument('--batch-rounds', type=int, help='Number of batch rounds.', default=20)
+parser.add_argument('--sensors', type=int, help='Number of sensors to filter together.', default=4)
+args = parser.parse_args()
+
+STATUSES = (STATUS_RANGE_VALID, STATUS_RANGE_VALID_LARGE_PULSE, vl53l5cx.STATUS_RANGE_SIGMA_HIGH, vl53l5cx.STATUS_RANGE_NO_TARGET)
+
+random = numpy.random.RandomState(0)
+
+
+def example(distance, reflectance, target_status):
+    # As examples/object_tracking.py, generalised to batches
+    status = numpy.isin(numpy.flip(target_status, -2), (STATUS_RANGE_VALID, STATUS_RANGE_VALID_LARGE_PULSE))
+    reflectance = numpy.flip(reflectance, -2).astype('float64')
+    distance = numpy.flip(distance, -2).astype('float64')
+    return numpy.where(status, distance, numpy.nan), numpy.where(status, reflectance, numpy.nan), status
+
+
+def frames(count):
+    shape = (count, 8, 8)
+    distance = random.randint(0, 4000, shape).astype(numpy.int16)
+    reflectance = random.randint(0, 100, shape).astype(numpy.uint8)
+    target_status = random.choice(STATUSES, shape).astype(numpy.uint8)
+    return distance, reflectance, target_status
+
+
+def bench(name, func, rounds):
+    func()
+    t_start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - t_start) / rounds
+
+
+processor = FrameProcessor(flip_y=True)
+
+# Check both give the same answer before timing them
+distance, reflectance, target_status = frames(args.batch)
+expected = example(distance, reflectance, target_status)
+result = processor.process(distance, reflectance, target_status)
+assert (expected[2] == result.valid).all()
+assert numpy.allclose(expected[0], result.distance_mm, equal_nan=True)
+
+single = [a[0] for a in frames(1)]
+print(f"{'':10s} {'example':>12s} {'processor':>12s} {'speedup':>8s}")
+for label, data, rounds in (("1 frame", single, args.rounds), (f"{args.batch} frames", (distance, reflectance, target_status), args.batch_rounds)):
+    t_example = bench("example", lambda: example(*data), rounds)
+    t_processor = bench("processor", lambda: processor.process(*data), rounds)
+    print(f"{label:10s} {t_example * 1e6:10.1f}us {t_processor * 1e6:10.1f}us {t_example / t_processor:7.1f}x")
+
+print()
+print(f"{'':14s} {'1 sensor':>12s} {f'{args.sensors} sensors':>12s}")
+for name, make_filter in (("ema", EMAFilter), ("median", MedianFilter), ("kalman", lambda: KalmanFilter(dt=1 / 15.0))):
+    times = []
+    for sensors in (1, args.sensors):
+        distance, reflectance, target_status = frames(sensors)
+        sigma = random.randint(5, 40, distance.shape).astype(numpy.uint16)
+        zone_filter = make_filter()
+        times.append(bench(name, lambda: zone_filter.update(distance, target_status, sigma), args.rounds))
+    print(f"{name:14s} {times[0] * 1e6:10.1f}us {times[1] * 1e6:10.1f}us")
+
+
+def scene(step):
+    # Two objects in front of a wall, one of them moving across
+    distance = numpy.full((8, 8), 2000.0)
+    distance[1:4, step % 6:step % 6 + 3] = 300
+    distance[5:8, 2:6] = 350
+    return distance
+
+
+tracker = ObjectTracker(dt=1 / 15.0)
+valid = numpy.ones((8, 8), dtype=bool)
+reflectance = numpy.full((8, 8), 60)
+steps = iter(range(args.rounds * 2))
+t_tracker = bench("tracker", lambda: tracker.update(scene(next(steps)), reflectance, valid), args.rounds)
+print(f"{'tracker':14s} {t_tracker * 1e6:10.1f}us")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Benchmark the library against the simulated sensor.
+
+Times sensor init (firmware upload), data_ready() polling, get_data(),
+ctypes to NumPy conversion and full processing pipelines at 4x4 and 8x8,
+and writes the results as JSON for comparison across releases, eg:
+
+    ./suite.py --latency 100 --output results.json
+
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import numpy
+import vl53l5cx_ctypes as vl53l5cx
+from vl53l5cx_ctypes import STATUS_RANGE_VALID, STATUS_RANGE_VALID_LARGE_PULSE
+from vl53l5cx_ctypes.frame import Frame
+from vl53l5cx_ctypes.simulator import SimulatedVL53L5CX, moving_object_scene
+
+
+RESOLUTIONS = (4 * 4, 8 * 8)
+RANGING_FREQUENCY_HZ = {4 * 4: 60, 8 * 8: 15}
+
+# Thresholds from examples/object_tracking.py
+R_THRESHOLD = 150
+D_THRESHOLD = 400
+
+parser = argparse.ArgumentParser(description='Benchmark vl53l5cx_ctypes against a simulated sensor.')
+parser.add_argument('--latency', type=float, help='Simulated time per i2c transaction in microseconds.', default=0)
+parser.add_argument('--bitrate', type=int, help='Simulated i2c bus clock in Hz, eg: 400000 (default: no transfer time).', default=None)
+parser.add_argument('--rounds', type=int, help='Number of timed rounds per benchmark.', default=200)
+parser.add_argument('--init-rounds', type=int, help='Number of timed rounds for init.', default=3)
+parser.add_argument('--filter', type=str, help='Only run benchmarks whose name contains this string.', default=None)
+parser.add_argument('--output', type=str, help='File to write JSON results to (default: stdout).', default=None)
+args = parser.parse_args()
+
+
+class ManualClock:
+    """Simulator clock which only moves when advanced, so frames arrive on demand."""
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+    def advance(self, seconds):
+        self.time += seconds
+
+
+def simulator(clock=None):
+    return SimulatedVL53L5CX(
+        scene=moving_object_scene(background_mm=D_THRESHOLD * 2, object_mm=D_THRESHOLD // 2),
+        reflectance=80,
+        latency=args.latency / 1000000.0,
+        bitrate=args.bitrate,
+        clock=clock or time.monotonic)
+
+
+def timed(func, rounds, setup=None):
+    # Time each round separately so the spread can be reported
+    times = []
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        t_start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t_start)
+    return times
+
+
+def summarise(times):
+    return {
+        "rounds": len(times),
+        "mean": statistics.mean(times),
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0
+    }
+
+
+def centroid(distance, reflectance, target_status):
+    # The tracking pipeline from examples/object_tracking.py
+    size = distance.shape[0]
+    status = numpy.isin(numpy.flipud(target_status), (STATUS_RANGE_VALID, STATUS_RANGE_VALID_LARGE_PULSE))
+    reflectance = numpy.flipud(reflectance).astype('float64')
+    distance = numpy.flipud(distance).astype('float64')
+
+    reflectance *= (255.0 / 100.0)
+    reflectance = numpy.clip(reflectance, 0, 255)
+    rfilt = numpy.where(status, reflectance, 0)
+    rfilt = numpy.where(distance < D_THRESHOLD, rfilt, 0)
+    rfilt = numpy.where(rfilt > R_THRESHOLD, rfilt, 0)
+    dfilt = numpy.where(rfilt > 0, distance, numpy.nan)
+
+    total = rfilt.sum()
+    if total == 0:
+        return None
+    x = (rfilt * range(size)).sum() / total / (size - 1)
+    y = (rfilt * [[i] for i in range(size)]).sum() / total / (size - 1)
+    return x * 2 - 1.0, y * 2 - 1.0, numpy.nanmean(dfilt)
+
+
+class Ranging:
+    """An initialised, ranging sensor at a given resolution."""
+    def __init__(self, resolution):
+        self.clock = ManualClock()
+        self.sim = simulator(self.clock)
+        self.sensor = vl53l5cx.VL53L5CX(i2c_dev=self.sim)
+        self.sensor.set_resolution(resolution)
+        self.sensor.set_ranging_frequency_hz(RANGING_FREQUENCY_HZ[resolution])
+        self.period = 1.0 / RANGING_FREQUENCY_HZ[resolution]
+        self.sensor.start_ranging()
+        self.next_frame()
+
+    def next_frame(self):
+        self.clock.advance(self.period)
+
+    def close(self):
+        self.sensor.stop_ranging()
+
+
+def bench_init():
+    sims = []
+
+    def setup():
+        sims.append(simulator())
+
+    times = timed(lambda: vl53l5cx.VL53L5CX(i2c_dev=sims[-1]), args.init_rounds, setup)
+    sim = sims[-1]
+    return times, {"transactions": sim.transactions, "bytes_written": sim.bytes_written, "bus_time": sim.bus_time}
+
+
+def bench_data_ready(ranging):
+    # Polling between frames, as a busy loop would
+    ranging.sensor.data_ready()
+    return timed(ranging.sensor.data_ready, args.rounds), {}
+
+
+def bench_get_data(ranging):
+    bytes_read = ranging.sim.bytes_read
+    times = timed(ranging.sensor.get_data, args.rounds)
+    return times, {"bytes_per_frame": (ranging.sim.bytes_read - bytes_read) // args.rounds}
+
+
+def bench_get_data_into(ranging):
+    results = vl53l5cx.VL53L5CX_ResultsData()
+    return timed(lambda: ranging.sensor.get_data(into=results), args.rounds), {}
+
+
+def bench_numpy_copy(ranging):
+    # Conversion as done by the examples: a new array per field, per frame
+    data = ranging.sensor.get_data()
+    size = int(ranging.sensor.get_resolution() ** 0.5)
+
+    def convert():
+        for name in ("distance_mm", "reflectance", "target_status"):
+            numpy.array(getattr(data, name))[:size * size].reshape((size, size))
+
+    return timed(convert, args.rounds), {}
+
+
+def bench_numpy_views(ranging):
+    # The zero-copy alternative to numpy_copy: views are built once, then each frame is read into them
+    results = vl53l5cx.VL53L5CX_ResultsData()
+    frame = Frame(results, ranging.sensor.get_resolution())
+
+    def read():
+        ranging.sensor.get_data(into=results)
+        for name in ("distance_mm", "reflectance", "target_status"):
+            getattr(frame, name)[0]
+
+    return timed(read, args.rounds), {}
+
+
+def bench_get_frame(ranging):
+    ranging.sensor.get_frame()
+    return timed(ranging.sensor.get_frame, args.rounds), {}
+
+
+def bench_centroid(ranging):
+    frame = ranging.sensor.get_frame()
+    return timed(lambda: centroid(frame.distance_mm[0], frame.reflectance[0], frame.target_status[0]), args.rounds), {}
+
+
+def bench_pipeline(ranging):
+    # Wait for a frame, read it and track the target, with a new frame every round.
+    # This includes the time taken by the simulator to render each frame.
+    sensor = ranging.sensor
+
+    def pipeline():
+        while not sensor.data_ready():
+            pass
+        frame = sensor.get_frame()
+        centroid(frame.distance_mm[0], frame.reflectance[0], frame.target_status[0])
+
+    frames = ranging.sim.frames
+    times = timed(pipeline, args.rounds, ranging.next_frame)
+    return times, {"frames": ranging.sim.frames - frames}
+
+
+BENCHMARKS = (
+    ("data_ready", bench_data_ready),
+    ("get_data", bench_get_data),
+    ("get_data_into", bench_get_data_into),
+    ("numpy_copy", bench_numpy_copy),
+    ("numpy_views", bench_numpy_views),
+    ("get_frame", bench_get_frame),
+    ("centroid", bench_centroid),
+    ("pipeline", bench_pipeline)
+)
+
+
+def selected(name):
+    return args.filter is None or args.filter in name
+
+
+results = []
+
+
+def record(name, resolution, times, extra):
+    results.append({
+        "name": name,
+        "params": {"resolution": resolution},
+        "stats": summarise(times),
+        "extra": extra
+    })
+    zones = f"{resolution} zones" if resolution else ""
+    print(f"{name:14s} {zones:8s}  mean: {statistics.mean(times) * 1000:9.4f}ms  min: {min(times) * 1000:9.4f}ms", file=sys.stderr)
+
+
+if selected("init"):
+    record("init", None, *bench_init())
+
+for resolution in RESOLUTIONS:
+    if not any(selected(name) for name, _ in BENCHMARKS):
+        break
+    ranging = Ranging(resolution)
+    for name, func in BENCHMARKS:
+        if selected(name):
+            record(name, resolution, *func(ranging))
+    ranging.close()
+
+report = {
+    "version": vl53l5cx.__version__,
+    "api_revision": vl53l5cx._VL53.get_api_revision().decode(),
+    "nb_target_per_zone": vl53l5cx.NB_TARGET_PER_ZONE,
+    "results_fields": list(vl53l5cx.RESULTS_FIELDS),
+    "python": platform.python_version(),
+    "machine": platform.machine(),
+    "timestamp": time.time(),
+    "latency_us": args.latency,
+    "bitrate": args.bitrate,
+    "benchmarks": results
+}
+
+if args.output:
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+else:
+    print(json.dumps(report, indent=2))
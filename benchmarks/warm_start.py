@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Compare cold (firmware upload) and warm (restore_state) sensor startup.
+
+Run against a real sensor, eg: ./warm_start.py --bus 1 --native
+
+"""
+import time
+import argparse
+import vl53l5cx_ctypes as vl53l5cx
+
+parser = argparse.ArgumentParser(description='Benchmark cold vs warm VL53L5CX startup.')
+parser.add_argument('--address', type=lambda x: int(x, 0), help='VL53L5CX i2c address.', default=vl53l5cx.DEFAULT_I2C_ADDRESS)
+parser.add_argument('--bus', type=int, help='i2c bus number.', default=1)
+parser.add_argument('--native', action='store_true', help='Use the native C i2c transport.')
+parser.add_argument('--runs', type=int, help='Number of warm starts to time.', default=5)
+args = parser.parse_args()
+
+
+def create(**kwargs):
+    if args.native:
+        return vl53l5cx.VL53L5CX(args.address, i2c_bus=args.bus, **kwargs)
+    from smbus2 import SMBus
+    return vl53l5cx.VL53L5CX(args.address, i2c_dev=SMBus(args.bus), **kwargs)
+
+
+t_start = time.perf_counter()
+sensor = create()
+cold = time.perf_counter() - t_start
+state = sensor.save_state()
+del sensor
+
+warm = []
+for _ in range(args.runs):
+    t_start = time.perf_counter()
+    sensor = create(state=state)
+    warm.append(time.perf_counter() - t_start)
+    del sensor
+
+print(f"cold: {cold * 1000:.1f}ms")
+print(f"warm: {min(warm) * 1000:.1f}ms (best of {args.runs}), speedup: {cold / min(warm):.1f}x")
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
 import time
+import math
 import ST7789
 import vl53l5cx_ctypes as vl53l5cx
-from vl53l5cx_ctypes import STATUS_RANGE_VALID, STATUS_RANGE_VALID_LARGE_PULSE
+from vl53l5cx_ctypes.processing import FrameProcessor
+from vl53l5cx_ctypes.projection import ray_table
 import numpy
 from PIL import Image, ImageDraw
 
@@ -42,14 +44,21 @@ vl53.set_ranging_frequency_hz(15)
 vl53.set_integration_time_ms(20)
 vl53.start_ranging()
 
+# Flip the frames to match the display, and replace invalid readings with NaN
+processor = FrameProcessor(flip_y=True)
+
+# Direction of the ray through each zone, flipped to match the frames
+rays = processor.orient(ray_table(8 * 8))
+
 
 while True:
     if vl53.data_ready():
-        data = vl53.get_data()
+        frame = processor.process_frame(vl53.get_frame())
 
-        status = numpy.isin(numpy.flipud(numpy.array(data.target_status).reshape((8, 8))), (STATUS_RANGE_VALID, STATUS_RANGE_VALID_LARGE_PULSE))
-        reflectance = numpy.flipud(numpy.array(data.reflectance).reshape((8, 8))).astype('float64')
-        distance = numpy.flipud(numpy.array(data.distance_mm).reshape((8, 8))).astype('float64')
+        # Use the first target in each zone
+        status = frame.valid[0]
+        reflectance = numpy.nan_to_num(frame.reflectance[0]).astype('float64')
+        distance = frame.distance_mm[0].astype('float64')
 
         # Scale reflectance (a percentage) to 0 - 255
         reflectance *= (255.0 / 100.0)
@@ -93,15 +102,13 @@ while True:
 
         # Print 'em out. Wooohoo!
         if valid:
-            print(f"{vx:.02f}, {vy:.02f}, {mdist:.02f}")
-
-        # TODO: Angle to target can be calculated using trig?
-        # the distance to target is the hypotenuse (c)
-        # the offset in the data is the opposite (a)
-        # the angle is angle (α)
-        # The sensor FOV (63°) factors into this... somehow
-        #
-        # Better target rejection could use distance + feature size
+            # Project the target's zones along their rays to find its position (in mm),
+            # the angle to it follows from its offset (opposite) and depth (adjacent)
+            tx, ty, tz = numpy.nanmean(rays * dfilt, axis=(1, 2))
+            angle = math.degrees(math.atan2(tx, tz))
+            print(f"{vx:.02f}, {vy:.02f}, {mdist:.02f}, {angle:.01f}°")
+
+        # TODO: Better target rejection could use distance + feature size
         # to reject targets that are too big/small
 
         # Basic visualisation to confirm our numbers are sensible!
@@ -21,14 +21,14 @@ vl53.start_ranging()
 
 while True:
     if vl53.data_ready():
-        data = vl53.get_data()
+        frame = vl53.get_frame()
         # 2d array of motion data (always 4x4?)
-        motion = numpy.flipud(numpy.array(data.motion_indicator.motion[0:16]).reshape((4, 4)))
+        motion = numpy.flipud(frame.motion[0:16].reshape((4, 4)))
         # 2d array of distance
-        distance = numpy.flipud(numpy.array(data.distance_mm).reshape((8, 8)))
+        distance = numpy.flipud(frame.distance_mm[0])
         # 2d array of reflectance
-        reflectance = numpy.flipud(numpy.array(data.reflectance).reshape((8, 8)))
+        reflectance = numpy.flipud(frame.reflectance[0])
         # 2d array of good ranging data
-        status = numpy.isin(numpy.flipud(numpy.array(data.target_status).reshape((8, 8))), (STATUS_RANGE_VALID, STATUS_RANGE_VALID_LARGE_PULSE))
+        status = numpy.isin(numpy.flipud(frame.target_status[0]), (STATUS_RANGE_VALID, STATUS_RANGE_VALID_LARGE_PULSE))
         print(motion, distance, reflectance, status)
     time.sleep(0.1)
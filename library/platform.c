@@ -61,18 +61,154 @@
 *******************************************************************************/
 
 
+#include <time.h>
+#include <fcntl.h>
+#include <stdio.h>
+#include <unistd.h>
+#include <sys/ioctl.h>
+#include <linux/i2c.h>
+#include <linux/i2c-dev.h>
+
 #include "platform.h"
+#include "vl53l5cx_api.h"
+#include "vl53l5cx_plugin_xtalk.h"
+
+/* Longest native sleep between checks for a cancel */
+#define WAIT_SLICE_NS	5000000ULL
+
+/* Returned by call_cancellable when the call was aborted by cancel() */
+#define STATUS_CANCELLED	((uint8_t) 254U)
+
+static int native_i2c_read(
+		int fd,
+		uint8_t address,
+		uint16_t reg,
+		uint8_t *data,
+		uint32_t length)
+{
+	uint8_t reg_buf[2];
+	uint32_t offset, chunk;
+	struct i2c_msg msgs[2];
+	struct i2c_rdwr_ioctl_data rdwr = {msgs, 2};
+
+	for(offset = 0; offset < length; offset += chunk)
+	{
+		chunk = length - offset;
+		if(chunk > I2C_READ_CHUNK_SIZE) chunk = I2C_READ_CHUNK_SIZE;
+
+		reg_buf[0] = (uint8_t)((reg + offset) >> 8);
+		reg_buf[1] = (uint8_t)((reg + offset) & 0xff);
+
+		msgs[0].addr = address;
+		msgs[0].flags = 0;
+		msgs[0].len = 2;
+		msgs[0].buf = reg_buf;
+
+		msgs[1].addr = address;
+		msgs[1].flags = I2C_M_RD;
+		msgs[1].len = (uint16_t)chunk;
+		msgs[1].buf = data + offset;
+
+		if(ioctl(fd, I2C_RDWR, &rdwr) < 0) return -1;
+	}
+
+	return 0;
+}
+
+static int native_i2c_write(
+		int fd,
+		uint8_t address,
+		uint16_t reg,
+		uint8_t *data,
+		uint32_t length)
+{
+	uint8_t buf[I2C_WRITE_CHUNK_SIZE + 2];
+	uint32_t offset, chunk;
+	struct i2c_msg msg;
+	struct i2c_rdwr_ioctl_data rdwr = {&msg, 1};
+
+	for(offset = 0; offset < length; offset += chunk)
+	{
+		chunk = length - offset;
+		if(chunk > I2C_WRITE_CHUNK_SIZE) chunk = I2C_WRITE_CHUNK_SIZE;
+
+		buf[0] = (uint8_t)((reg + offset) >> 8);
+		buf[1] = (uint8_t)((reg + offset) & 0xff);
+		memcpy(&buf[2], data + offset, chunk);
+
+		msg.addr = address;
+		msg.flags = 0;
+		msg.len = (uint16_t)(chunk + 2);
+		msg.buf = buf;
+
+		if(ioctl(fd, I2C_RDWR, &rdwr) < 0) return -1;
+	}
+
+	return 0;
+}
+
+static uint64_t monotonic_ns(void)
+{
+	struct timespec ts;
+
+	clock_gettime(CLOCK_MONOTONIC, &ts);
+	return (uint64_t)ts.tv_sec * 1000000000ULL + (uint64_t)ts.tv_nsec;
+}
+
+static void check_cancel(
+		VL53L5CX_Platform *p_platform)
+{
+	/* Unwind to run_cancellable, the driver state is abandoned */
+	if(p_platform->cancel && p_platform->cancel_jmp) longjmp(*p_platform->cancel_jmp, 1);
+}
+
+static void wait_until(
+		VL53L5CX_Platform *p_platform,
+		uint64_t deadline_ns)
+{
+	struct timespec ts;
+	uint64_t wake_ns;
+	uint64_t spin_ns = (uint64_t)p_platform->spin_us * 1000ULL;
+	uint64_t now_ns = monotonic_ns();
+
+	/* Sleep to an absolute deadline so early wakeups don't add up, in slices so a cancel is seen promptly */
+	while(now_ns + spin_ns < deadline_ns)
+	{
+		wake_ns = deadline_ns - spin_ns;
+		if(wake_ns > now_ns + WAIT_SLICE_NS) wake_ns = now_ns + WAIT_SLICE_NS;
+
+		ts.tv_sec = (time_t)(wake_ns / 1000000000ULL);
+		ts.tv_nsec = (long)(wake_ns % 1000000000ULL);
+		clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, &ts, NULL);
+
+		check_cancel(p_platform);
+		now_ns = monotonic_ns();
+	}
+
+	while(now_ns < deadline_ns) now_ns = monotonic_ns();
+}
+
+int i2c_open(
+		uint8_t bus)
+{
+	char path[20];
+
+	snprintf(path, sizeof(path), "/dev/i2c-%u", bus);
+	return open(path, O_RDWR);
+}
+
+void i2c_close(
+		int fd)
+{
+	if(fd >= 0) close(fd);
+}
 
 uint8_t RdByte(
 		VL53L5CX_Platform *p_platform,
 		uint16_t RegisterAddress,
 		uint8_t *p_value)
 {
-	if (p_platform->i2c_read && p_platform->i2c_read(p_platform->address >> 1, RegisterAddress, p_value, 1) == 0) {
-		return 0;
-	}
-
-	return 255;
+	return RdMulti(p_platform, RegisterAddress, p_value, 1);
 }
 
 uint8_t WrByte(
@@ -80,11 +216,7 @@ uint8_t WrByte(
 		uint16_t RegisterAddress,
 		uint8_t value)
 {
-	if (p_platform->i2c_write && p_platform->i2c_write(p_platform->address >> 1, RegisterAddress, &value, 1) == 0) {
-		return 0;
-	}
-
-	return 255;
+	return WrMulti(p_platform, RegisterAddress, &value, 1);
 }
 
 uint8_t WrMulti(
@@ -93,11 +225,24 @@ uint8_t WrMulti(
 		uint8_t *p_values,
 		uint32_t size)
 {
-	if (p_platform->i2c_write && p_platform->i2c_write(p_platform->address >> 1, RegisterAddress, p_values, size) == 0) {
-		return 0;
+	uint8_t status = 255;
+	uint64_t t_start = p_platform->stats_enabled ? monotonic_ns() : 0;
+
+	if(p_platform->i2c_fd >= 0) {
+		if(native_i2c_write(p_platform->i2c_fd, p_platform->address >> 1, RegisterAddress, p_values, size) == 0) {
+			status = 0;
+		}
+	} else if (p_platform->i2c_write && p_platform->i2c_write(p_platform->address >> 1, RegisterAddress, p_values, size) == 0) {
+		status = 0;
+	}
+
+	if(p_platform->stats_enabled) {
+		p_platform->stats.i2c_writes++;
+		p_platform->stats.bytes_written += size;
+		p_platform->stats.i2c_ns += monotonic_ns() - t_start;
 	}
 
-	return 255;
+	return status;
 }
 
 uint8_t RdMulti(
@@ -106,11 +251,24 @@ uint8_t RdMulti(
 		uint8_t *p_values,
 		uint32_t size)
 {
-	if (p_platform->i2c_read && p_platform->i2c_read(p_platform->address >> 1, RegisterAddress, p_values, size) == 0) {
-		return 0;
+	uint8_t status = 255;
+	uint64_t t_start = p_platform->stats_enabled ? monotonic_ns() : 0;
+
+	if(p_platform->i2c_fd >= 0) {
+		if(native_i2c_read(p_platform->i2c_fd, p_platform->address >> 1, RegisterAddress, p_values, size) == 0) {
+			status = 0;
+		}
+	} else if (p_platform->i2c_read && p_platform->i2c_read(p_platform->address >> 1, RegisterAddress, p_values, size) == 0) {
+		status = 0;
+	}
+
+	if(p_platform->stats_enabled) {
+		p_platform->stats.i2c_reads++;
+		p_platform->stats.bytes_read += size;
+		p_platform->stats.i2c_ns += monotonic_ns() - t_start;
 	}
 
-	return 255;
+	return status;
 }
 
 uint8_t Reset_Sensor(
@@ -161,6 +319,107 @@ uint8_t WaitMs(
 		VL53L5CX_Platform *p_platform,
 		uint32_t TimeMs)
 {
-	if(p_platform->sleep) p_platform->sleep(TimeMs);
+	uint64_t t_start;
+
+	check_cancel(p_platform);
+	t_start = monotonic_ns();
+
+	if(p_platform->sleep) {
+		p_platform->sleep(TimeMs);
+	} else {
+		wait_until(p_platform, t_start + (uint64_t)TimeMs * 1000000ULL);
+	}
+
+	if(p_platform->stats_enabled) {
+		p_platform->stats.sleeps++;
+		p_platform->stats.sleep_ms += TimeMs;
+		p_platform->stats.sleep_ns += monotonic_ns() - t_start;
+	}
 	return 0;
 }
+
+void cancel(
+		VL53L5CX_Configuration *p_dev)
+{
+	/* Only seen by a call running under run_cancellable, and cleared when one starts */
+	p_dev->platform.cancel = 1;
+}
+
+typedef uint8_t (*cancellable_func)(
+		VL53L5CX_Configuration *p_dev,
+		void *p_context);
+
+/*
+ * Run func so that cancel(), from another thread, can abort it at its next
+ * WaitMs. The driver loops until the sensor answers, so abandoning the call
+ * is the only way out. setjmp and longjmp are kept in this C file, so only C
+ * frames (the driver and the functions below) are ever unwound.
+ */
+static uint8_t run_cancellable(
+		VL53L5CX_Configuration *p_dev,
+		cancellable_func func,
+		void *p_context)
+{
+	jmp_buf cancel_jmp;
+	uint8_t status;
+
+	/* A cancel() from before the call started has no effect */
+	p_dev->platform.cancel = 0;
+
+	if(setjmp(cancel_jmp) != 0) {
+		p_dev->platform.cancel_jmp = NULL;
+		p_dev->platform.cancel = 0;
+		return STATUS_CANCELLED;
+	}
+
+	p_dev->platform.cancel_jmp = &cancel_jmp;
+	status = func(p_dev, p_context);
+	p_dev->platform.cancel_jmp = NULL;
+	p_dev->platform.cancel = 0;
+	return status;
+}
+
+typedef uint8_t (*driver_func)(
+		VL53L5CX_Configuration *p_dev);
+
+static uint8_t run_driver_func(
+		VL53L5CX_Configuration *p_dev,
+		void *p_context)
+{
+	return (*(driver_func *)p_context)(p_dev);
+}
+
+uint8_t call_cancellable(
+		VL53L5CX_Configuration *p_dev,
+		driver_func func)
+{
+	return run_cancellable(p_dev, run_driver_func, &func);
+}
+
+typedef struct
+{
+	uint16_t reflectance_percent;
+	uint8_t nb_samples;
+	uint16_t distance_mm;
+} xtalk_args;
+
+static uint8_t run_calibrate_xtalk(
+		VL53L5CX_Configuration *p_dev,
+		void *p_context)
+{
+	xtalk_args *p_args = (xtalk_args *)p_context;
+
+	return vl53l5cx_calibrate_xtalk(p_dev, p_args->reflectance_percent, p_args->nb_samples, p_args->distance_mm);
+}
+
+/* Crosstalk calibration ranges for up to 20 seconds, so cancel() can abort it like call_cancellable */
+uint8_t calibrate_xtalk(
+		VL53L5CX_Configuration *p_dev,
+		uint16_t reflectance_percent,
+		uint8_t nb_samples,
+		uint16_t distance_mm)
+{
+	xtalk_args args = {reflectance_percent, nb_samples, distance_mm};
+
+	return run_cancellable(p_dev, run_calibrate_xtalk, &args);
+}
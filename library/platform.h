@@ -66,6 +66,7 @@
 
 #include <stdint.h>
 #include <string.h>
+#include <setjmp.h>
 
 /**
  * @brief Structure VL53L5CX_Platform needs to be filled by the customer,
@@ -82,14 +83,48 @@ typedef int (*i2c_write_func)(uint8_t address, uint16_t reg, uint8_t *list, uint
 
 typedef int (*sleep_func)(uint32_t time_ms);
 
+// Counters kept by the platform layer while stats_enabled is set
+typedef struct
+{
+    uint64_t i2c_reads;
+    uint64_t i2c_writes;
+    uint64_t bytes_read;
+    uint64_t bytes_written;
+    // time spent in i2c transfers, including the Python callbacks
+    uint64_t i2c_ns;
+    uint64_t sleeps;
+    // sleep time requested by the driver through WaitMs
+    uint64_t sleep_ms;
+    // time actually spent in WaitMs
+    uint64_t sleep_ns;
+} VL53L5CX_PlatformStats;
+
 typedef struct
 {
     uint16_t address;
     i2c_read_func i2c_read;
     i2c_write_func i2c_write;
+    // Python sleep callback, or NULL to sleep natively in WaitMs
     sleep_func sleep;
+    // file descriptor for a natively opened /dev/i2c-N, or -1 to use the callbacks above
+    int i2c_fd;
+    uint8_t stats_enabled;
+    VL53L5CX_PlatformStats stats;
+    // finish native sleeps by spinning for their last spin_us, rather than oversleeping
+    uint32_t spin_us;
+    // set from another thread to abort a cancellable call at its next WaitMs
+    volatile uint8_t cancel;
+    jmp_buf *cancel_jmp;
 } VL53L5CX_Platform;
 
+/*
+ * @brief Transfers are split so they fit within the limits of the Linux
+ * i2c-dev I2C_RDWR ioctl. Writes are chunked to match the Python callbacks.
+ */
+
+#define I2C_WRITE_CHUNK_SIZE	2048U
+#define I2C_READ_CHUNK_SIZE	8192U
+
 /*
  * @brief The macro below is used to define the number of target per zone sent
  * through I2C. This value can be changed by user, in order to tune I2C
@@ -219,4 +254,21 @@ uint8_t WaitMs(
 		VL53L5CX_Platform *p_platform,
 		uint32_t TimeMs);
 
+/**
+ * @brief Open /dev/i2c-<bus> for native transfers, bypassing the callbacks.
+ * @param (uint8_t) bus : I2C bus number.
+ * @return (int) fd : file descriptor, or -1 on failure.
+ */
+
+int i2c_open(
+		uint8_t bus);
+
+/**
+ * @brief Close a file descriptor returned by i2c_open.
+ * @param (int) fd : file descriptor, ignored if < 0.
+ */
+
+void i2c_close(
+		int fd);
+
 #endif	// _PLATFORM_H_
@@ -1,9 +1,46 @@
+import os
 from setuptools import setup, Extension
 
 
+# Output profiles, selected with eg: VL53L5CX_PROFILE=distance python3 setup.py install
+# Each disables sensor outputs to reduce the amount of data read over i2c per frame.
+PROFILES = {
+    "full": [],
+    "distance+status": [
+        "VL53L5CX_DISABLE_AMBIENT_PER_SPAD",
+        "VL53L5CX_DISABLE_NB_SPADS_ENABLED",
+        "VL53L5CX_DISABLE_SIGNAL_PER_SPAD",
+        "VL53L5CX_DISABLE_RANGE_SIGMA_MM",
+        "VL53L5CX_DISABLE_REFLECTANCE_PERCENT",
+        "VL53L5CX_DISABLE_MOTION_INDICATOR"
+    ],
+    "distance": [
+        "VL53L5CX_DISABLE_AMBIENT_PER_SPAD",
+        "VL53L5CX_DISABLE_NB_SPADS_ENABLED",
+        "VL53L5CX_DISABLE_NB_TARGET_DETECTED",
+        "VL53L5CX_DISABLE_SIGNAL_PER_SPAD",
+        "VL53L5CX_DISABLE_RANGE_SIGMA_MM",
+        "VL53L5CX_DISABLE_REFLECTANCE_PERCENT",
+        "VL53L5CX_DISABLE_TARGET_STATUS",
+        "VL53L5CX_DISABLE_MOTION_INDICATOR"
+    ]
+}
+
+profile = os.environ.get("VL53L5CX_PROFILE", "full")
+
+if profile not in PROFILES:
+    raise ValueError(f"VL53L5CX_PROFILE must be one of: {', '.join(PROFILES)}")
+
+# Targets reported per zone (1 to 4), eg: VL53L5CX_NB_TARGET_PER_ZONE=4 python3 setup.py install
+nb_target_per_zone = os.environ.get("VL53L5CX_NB_TARGET_PER_ZONE", "1")
+
+if nb_target_per_zone not in ("1", "2", "3", "4"):
+    raise ValueError("VL53L5CX_NB_TARGET_PER_ZONE must be between 1 and 4")
+
+
 extension = Extension(
     'vl53l5cx_ctypes',
-    define_macros=[('VL53L5CX_NB_TARGET_PER_ZONE', '1')],
+    define_macros=[('VL53L5CX_NB_TARGET_PER_ZONE', nb_target_per_zone)] + [(macro, None) for macro in PROFILES[profile]],
     extra_compile_args=[],
     include_dirs=['.', 'src/VL53L5CX_ULD_API/inc'],
     libraries=[],
@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.fixture()
+def simulator():
+    from vl53l5cx_ctypes.simulator import SimulatedVL53L5CX
+    return SimulatedVL53L5CX()
+
+
+@pytest.fixture()
+def sensor(simulator):
+    import vl53l5cx_ctypes
+    sensor = vl53l5cx_ctypes.VL53L5CX(i2c_dev=simulator)
+    yield sensor
+    sensor.stop_streaming()
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+
+
+def frame(resolution=4 * 4):
+    import vl53l5cx_ctypes
+    from vl53l5cx_ctypes.frame import Frame
+    return Frame(vl53l5cx_ctypes.VL53L5CX_ResultsData(), resolution)
+
+
+def test_encode_decode_delta():
+    from vl53l5cx_ctypes.network import FrameEncoder, FrameDecoder
+    encoder = FrameEncoder(fields=("distance_mm", "target_status"), delta=True, keyframe_interval=3)
+    decoder = FrameDecoder()
+    source = frame()
+    source.distance_mm[0] = 1000
+    source.target_status[0] = 5
+
+    sizes = []
+    for i in range(6):
+        source.distance_mm[0, 1, 2] = 500 + i
+        message = encoder.encode(source, timestamp=i)
+        sizes.append(len(message))
+        decoded = decoder.decode(message)
+        assert decoded.fields == ("distance_mm", "target_status")
+        assert (decoded.distance_mm == source.distance_mm).all()
+        assert (decoded.target_status == source.target_status).all()
+        assert decoded.timestamp == i
+
+    # A keyframe every third frame, deltas in between are smaller
+    assert sizes[0] == sizes[3] > sizes[1]
+    assert sizes[1] == sizes[2] == sizes[4]
+
+
+def test_decode_waits_for_keyframe_after_loss():
+    from vl53l5cx_ctypes.network import FrameEncoder, FrameDecoder
+    encoder = FrameEncoder(delta=True, keyframe_interval=3)
+    decoder = FrameDecoder()
+    source = frame()
+
+    messages = []
+    for i in range(4):
+        source.distance_mm[0, 0, 0] = i
+        messages.append(encoder.encode(source))
+
+    assert decoder.decode(messages[0]) is not None
+    # messages[1] is lost, so the delta in messages[2] can't be applied
+    assert decoder.decode(messages[2]) is None
+    assert decoder.dropped == 1
+    assert decoder.decode(messages[3]).distance_mm[0, 0, 0] == 3
+
+
+def test_decode_resolution_change():
+    from vl53l5cx_ctypes.network import FrameEncoder, FrameDecoder
+    encoder = FrameEncoder(delta=True)
+    decoder = FrameDecoder()
+
+    assert decoder.decode(encoder.encode(frame(4 * 4))).distance_mm.shape[1:] == (4, 4)
+    decoded = decoder.decode(encoder.encode(frame(8 * 8)))
+    assert decoded.resolution == 8 * 8
+    assert decoded.distance_mm.shape[1:] == (8, 8)
+
+
+def test_decode_bad_message():
+    from vl53l5cx_ctypes.network import FrameEncoder, FrameDecoder
+    message = FrameEncoder().encode(frame())
+    with pytest.raises(ValueError):
+        FrameDecoder().decode(b"nope" + message[4:])
+    with pytest.raises(ValueError):
+        FrameDecoder().decode(message[:-1])
+
+
+def test_server_client():
+    from vl53l5cx_ctypes.network import FrameServer, FrameClient
+
+    async def run():
+        server = FrameServer(host="127.0.0.1", port=0, delta=True)
+        await server.start()
+        client = await FrameClient.connect("127.0.0.1", server.port)
+        try:
+            while server.clients == 0:
+                await asyncio.sleep(0.01)
+            source = frame()
+            for i in range(3):
+                source.distance_mm[0] = 100 * (i + 1)
+                server.send(source, timestamp=i)
+                received = await asyncio.wait_for(client.read(), 1.0)
+                assert received.sequence == i + 1
+                assert (received.distance_mm == source.distance_mm).all()
+        finally:
+            client.close()
+            await server.close()
+        assert client.dropped == 0
+        assert server.stats()["frames"] == 3
+
+    asyncio.run(run())
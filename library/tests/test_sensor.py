@@ -0,0 +1,60 @@
+import pytest
+
+
+def test_init(simulator):
+    import vl53l5cx_ctypes
+    sensor = vl53l5cx_ctypes.VL53L5CX(i2c_dev=simulator)
+    assert sensor.is_alive()
+    assert sensor.get_resolution() == vl53l5cx_ctypes.RESOLUTION_4X4
+    # The firmware upload is by far the largest write
+    assert simulator.bytes_written > 80000
+
+
+@pytest.mark.parametrize("resolution,frequency,size", [(4 * 4, 60, 4), (8 * 8, 15, 8)])
+def test_get_frame_shape(sensor, resolution, frequency, size):
+    from vl53l5cx_ctypes import NB_TARGET_PER_ZONE
+    assert sensor.apply_config({"resolution": resolution, "ranging_frequency_hz": frequency})
+    assert sensor.start_ranging()
+    assert sensor.wait_data_ready(timeout=1.0)
+    frame = sensor.get_frame()
+    sensor.stop_ranging()
+
+    assert frame.resolution == resolution
+    assert frame.ambient_per_spad.shape == (size, size)
+    assert frame.distance_mm.shape == (NB_TARGET_PER_ZONE, size, size)
+    assert frame.target_status.shape == (NB_TARGET_PER_ZONE, size, size)
+    # The simulator's default scene is a flat wall at 1000mm
+    assert (frame.distance_mm[0] == 1000).all()
+
+
+def test_apply_config_rejects_8x8_at_60hz(sensor):
+    with pytest.raises(ValueError):
+        sensor.apply_config({"resolution": 8 * 8, "ranging_frequency_hz": 60})
+    assert sensor.get_resolution() == 4 * 4
+
+
+def test_apply_config_checks_resolution_against_frequency(sensor):
+    assert sensor.set_ranging_frequency_hz(30)
+    with pytest.raises(ValueError):
+        sensor.apply_config({"resolution": 8 * 8})
+
+
+def test_save_restore_state(simulator, sensor):
+    import vl53l5cx_ctypes
+    assert sensor.apply_config({"resolution": 8 * 8, "ranging_frequency_hz": 10, "sharpener_percent": 20})
+    state = sensor.save_state()
+
+    bytes_written = simulator.bytes_written
+    restored = vl53l5cx_ctypes.VL53L5CX(i2c_dev=simulator, state=state)
+    # Warm started, so the firmware was not uploaded again
+    assert simulator.bytes_written - bytes_written < 1000
+    assert restored.get_settings() == sensor.get_settings()
+    assert restored.get_resolution() == 8 * 8
+
+
+def test_restore_state_needs_running_firmware(sensor):
+    from vl53l5cx_ctypes.simulator import SimulatedVL53L5CX
+    import vl53l5cx_ctypes
+    state = sensor.save_state()
+    cold = vl53l5cx_ctypes.VL53L5CX(i2c_dev=SimulatedVL53L5CX(), skip_init=True)
+    assert not cold.restore_state(state)
@@ -0,0 +1,46 @@
+import pytest
+
+
+def test_bus_routes_by_address():
+    import vl53l5cx_ctypes
+    from vl53l5cx_ctypes.simulator import SimulatedVL53L5CX, SimulatedBus, flat_scene
+    near = SimulatedVL53L5CX(i2c_addr=0x29, scene=flat_scene(500))
+    far = SimulatedVL53L5CX(i2c_addr=0x30, scene=flat_scene(1500))
+    bus = SimulatedBus([near, far])
+
+    for address, distance in ((0x29, 500), (0x30, 1500)):
+        sensor = vl53l5cx_ctypes.VL53L5CX(i2c_addr=address, i2c_dev=bus)
+        assert sensor.set_ranging_frequency_hz(60)
+        assert sensor.start_ranging()
+        assert sensor.wait_data_ready(timeout=1.0)
+        assert (sensor.get_frame().distance_mm[0] == distance).all()
+        sensor.stop_ranging()
+
+    assert near.frames >= 1
+    assert far.frames >= 1
+
+
+def test_bus_unknown_address():
+    from smbus2 import i2c_msg
+    from vl53l5cx_ctypes.simulator import SimulatedVL53L5CX, SimulatedBus
+    bus = SimulatedBus([SimulatedVL53L5CX(i2c_addr=0x29)])
+    with pytest.raises(OSError):
+        bus.i2c_rdwr(i2c_msg.write(0x30, [0x00, 0x00]))
+
+
+def test_noise_is_repeatable():
+    from vl53l5cx_ctypes.simulator import SimulatedVL53L5CX
+
+    def frame(seed):
+        import vl53l5cx_ctypes
+        sensor = vl53l5cx_ctypes.VL53L5CX(i2c_dev=SimulatedVL53L5CX(noise_mm=20, seed=seed))
+        assert sensor.set_ranging_frequency_hz(60)
+        assert sensor.start_ranging()
+        assert sensor.wait_data_ready(timeout=1.0)
+        distance = sensor.get_frame().distance_mm.copy()
+        sensor.stop_ranging()
+        return distance
+
+    first = frame(1)
+    assert (first == frame(1)).all()
+    assert (first != 1000).any()
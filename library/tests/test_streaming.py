@@ -0,0 +1,38 @@
+import pytest
+
+
+@pytest.fixture()
+def interrupt():
+    from vl53l5cx_ctypes.gpio import FakeGPIOInterrupt
+    interrupt = FakeGPIOInterrupt()
+    yield interrupt
+    interrupt.close()
+
+
+def test_stream_with_interrupt(interrupt):
+    import vl53l5cx_ctypes
+    from vl53l5cx_ctypes.simulator import SimulatedVL53L5CX
+    sensor = vl53l5cx_ctypes.VL53L5CX(i2c_dev=SimulatedVL53L5CX(interrupt=interrupt), interrupt=interrupt)
+    assert sensor.set_ranging_frequency_hz(15)
+    sensor.start_streaming()
+    try:
+        for _ in range(5):
+            data = sensor.wait_frame(timeout=1.0)
+            assert data is not None
+            assert data.distance_mm[0] == 1000
+        stats = sensor.stream_stats()
+    finally:
+        sensor.stop_streaming()
+
+    assert stats["frames"] >= 5
+    assert stats["dropped"] == 0
+    assert stats["errors"] == 0
+
+
+def test_not_streaming(sensor):
+    with pytest.raises(RuntimeError):
+        sensor.latest_frame()
+    with pytest.raises(RuntimeError):
+        sensor.wait_frame(timeout=0)
+    with pytest.raises(RuntimeError):
+        sensor.stream_stats()
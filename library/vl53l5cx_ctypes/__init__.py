@@ -1,17 +1,19 @@
-
+import os
+import re
 import time
+import struct
+import threading
+from contextlib import contextmanager
 import sysconfig
 import pathlib
 from smbus2 import SMBus, i2c_msg
-from ctypes import CDLL, CFUNCTYPE, POINTER, Structure, byref, c_int, c_int8, c_uint8, c_int16, c_uint16, c_uint32
+from ctypes import CDLL, CFUNCTYPE, POINTER, Structure, byref, sizeof, memmove, string_at, c_int, c_int8, c_uint8, c_int16, c_uint16, c_int32, c_uint32, c_uint64, c_void_p, c_char_p
 
 
-__version__ = '0.0.3'
+__version__ = '0.1.0'
 
 DEFAULT_I2C_ADDRESS = 0x29
 
-NB_TARGET_PER_ZONE = 1
-
 RESOLUTION_4X4 = 16  # For completeness, feels nicer just to use 4*4
 RESOLUTION_8X8 = 64
 
@@ -29,6 +31,8 @@ STATUS_TIMEOUT = 1
 STATUS_MCU_ERROR = 66
 STATUS_INVALID_PARAM = 127
 STATUS_ERROR = 255
+# Returned when init(), start_ranging() or stop_ranging() is aborted by cancel()
+STATUS_CANCELLED = 254
 
 STATUS_RANGE_NOT_UPDATED = 0
 STATUS_RANGE_LOW_SIGNAL = 1
@@ -46,11 +50,45 @@ STATUS_RANGE_TARGET_BLURRED = 12
 STATUS_RANGE_TARGET_INCONSISTENT = 13
 STATUS_RANGE_NO_TARGET = 255
 
+# Measurements compared by detection thresholds
+THRESHOLD_DISTANCE_MM = 1
+THRESHOLD_SIGNAL_PER_SPAD_KCPS = 2
+THRESHOLD_RANGE_SIGMA_MM = 4
+THRESHOLD_AMBIENT_PER_SPAD_KCPS = 8
+THRESHOLD_NB_TARGET_DETECTED = 9
+THRESHOLD_TARGET_STATUS = 12
+THRESHOLD_NB_SPADS_ENABLED = 13
+THRESHOLD_MOTION_INDICATOR = 19
+
+# How a measurement is compared with the low and high thresholds
+THRESHOLD_IN_WINDOW = 0
+THRESHOLD_OUT_OF_WINDOW = 1
+THRESHOLD_LESS_THAN_EQUAL_MIN = 2
+THRESHOLD_GREATER_THAN_MAX = 3
+THRESHOLD_EQUAL_MIN = 4
+THRESHOLD_NOT_EQUAL_MIN = 5
+
+# How a threshold is combined with the previous one
+THRESHOLD_OPERATION_NONE = 0
+THRESHOLD_OPERATION_OR = 0
+THRESHOLD_OPERATION_AND = 2
+
+# Detection thresholds the sensor holds
+NB_THRESHOLDS = 64
+
 _I2C_CHUNK_SIZE = 2048
 
+# Number of reusable results buffers behind get_frame()
+_FRAME_RING_SIZE = 2
+
+# Shortest interval between data_ready polls while streaming (seconds)
+_STREAM_POLL_INTERVAL = 0.001
+
+# Longest wait on an interrupt before checking for stop_streaming() (seconds)
+_STREAM_STOP_INTERVAL = 0.1
+
 _I2C_RD_FUNC = CFUNCTYPE(c_int, c_uint8, c_uint16, POINTER(c_uint8), c_uint32)
 _I2C_WR_FUNC = CFUNCTYPE(c_int, c_uint8, c_uint16, POINTER(c_uint8), c_uint32)
-_SLEEP_FUNC = CFUNCTYPE(c_int, c_uint32)
 
 # Path to the library dir
 _PATH = pathlib.Path(__file__).parent.parent.absolute()
@@ -64,6 +102,83 @@ _NAME = pathlib.Path("vl53l5cx_ctypes").with_suffix(_SUFFIX)
 # Load the DLL
 _VL53 = CDLL(_PATH / _NAME)
 
+# Configurations are allocated in C, return them as full width pointers so they survive on 64-bit
+_VL53.get_configuration.restype = c_void_p
+_VL53.get_native_configuration.restype = c_void_p
+_VL53.get_motion_configuration.restype = c_void_p
+_VL53.get_api_revision.restype = c_char_p
+
+# Driver functions return a uint8_t status, the rest of the return register is undefined
+for _name in (
+    "vl53l5cx_check_data_ready",
+    "vl53l5cx_get_detection_thresholds",
+    "vl53l5cx_get_detection_thresholds_enable",
+    "vl53l5cx_get_integration_time_ms",
+    "vl53l5cx_get_ranging_data",
+    "vl53l5cx_get_ranging_frequency_hz",
+    "vl53l5cx_get_ranging_mode",
+    "vl53l5cx_get_resolution",
+    "vl53l5cx_get_sharpener_percent",
+    "vl53l5cx_get_target_order",
+    "vl53l5cx_init",
+    "vl53l5cx_is_alive",
+    "vl53l5cx_motion_indicator_init",
+    "vl53l5cx_motion_indicator_set_distance_motion",
+    "vl53l5cx_motion_indicator_set_resolution",
+    "vl53l5cx_set_detection_thresholds",
+    "vl53l5cx_set_detection_thresholds_enable",
+    "vl53l5cx_set_i2c_address",
+    "vl53l5cx_set_integration_time_ms",
+    "vl53l5cx_set_power_mode",
+    "vl53l5cx_set_ranging_frequency_hz",
+    "vl53l5cx_set_ranging_mode",
+    "vl53l5cx_set_resolution",
+    "vl53l5cx_set_sharpener_percent",
+    "vl53l5cx_set_target_order",
+    "vl53l5cx_start_ranging",
+    "vl53l5cx_stop_ranging",
+    "vl53l5cx_get_caldata_xtalk",
+    "vl53l5cx_set_caldata_xtalk",
+    "vl53l5cx_get_xtalk_margin",
+    "vl53l5cx_set_xtalk_margin",
+    "probe_firmware",
+    "call_cancellable",
+    "calibrate_xtalk"
+):
+    getattr(_VL53, _name).restype = c_uint8
+
+# Targets reported per zone, set with VL53L5CX_NB_TARGET_PER_ZONE at build time
+NB_TARGET_PER_ZONE = _VL53.get_nb_target_per_zone()
+
+# Size of the driver calibration state saved by save_state()
+_STATE_SIZE = _VL53.get_state_size()
+
+# save_state() header: magic, driver API revision and the sensor settings it was saved with
+_STATE_HEADER = struct.Struct("<4s16sBBIBBB")
+_STATE_MAGIC = b"VL5S"
+
+# Attempts (10ms apart) to get an answer from already running firmware in restore_state()
+_STATE_PROBE_RETRIES = 5
+
+# Size of the crosstalk calibration data from get_xtalk_data()
+XTALK_SIZE = _VL53.get_xtalk_size()
+
+# Flag in zone_num marking the last detection threshold in use
+_LAST_THRESHOLD = 128
+
+
+class VL53L5CX_PlatformStats(Structure):
+    _fields_ = [
+        ("i2c_reads", c_uint64),
+        ("i2c_writes", c_uint64),
+        ("bytes_read", c_uint64),
+        ("bytes_written", c_uint64),
+        ("i2c_ns", c_uint64),
+        ("sleeps", c_uint64),
+        ("sleep_ms", c_uint64),
+        ("sleep_ns", c_uint64)
+    ]
+
 
 class VL53L5CX_MotionData(Structure):
     _fields_ = [
@@ -77,75 +192,279 @@ class VL53L5CX_MotionData(Structure):
     ]
 
 
-class VL53L5CX_ResultsData(Structure):
+class VL53L5CX_DetectionThresholds(Structure):
+    _fields_ = [
+        ("param_low_thresh", c_int32),
+        ("param_high_thresh", c_int32),
+        ("measurement", c_uint8),
+        ("type", c_uint8),
+        ("zone_num", c_uint8),
+        ("mathematic_operation", c_uint8)
+    ]
+
+    def __repr__(self):
+        return (f"VL53L5CX_DetectionThresholds(zone_num={self.zone_num}, measurement={self.measurement}, type={self.type}, "
+                f"param_low_thresh={self.param_low_thresh}, param_high_thresh={self.param_high_thresh}, "
+                f"mathematic_operation={self.mathematic_operation})")
+
+
+def detection_thresholds(zones, measurement=THRESHOLD_DISTANCE_MM, comparison=THRESHOLD_IN_WINDOW, low=0, high=0, operation=THRESHOLD_OPERATION_OR):
+    """Build the same detection threshold for several zones.
+
+    eg: detection_thresholds(range(16), low=0, high=500) fires when
+    anything is within 500mm of any zone at 4*4.
+
+    :param zones: Zone numbers, in driver order.
+    :param measurement: Measurement to compare, eg: THRESHOLD_DISTANCE_MM
+    :param comparison: How to compare, eg: THRESHOLD_IN_WINDOW for low <= measurement <= high
+    :param low: Low threshold, in the units of the measurement.
+    :param high: High threshold, in the units of the measurement.
+    :param operation: How each threshold combines with the previous one, THRESHOLD_OPERATION_OR or THRESHOLD_OPERATION_AND
+
+    Returns a list of VL53L5CX_DetectionThresholds for set_detection_thresholds().
+
+    """
+    return [VL53L5CX_DetectionThresholds(int(low), int(high), measurement, comparison, zone, operation) for zone in zones]
+
+
+class _ResultsField(Structure):
     _fields_ = [
-        ("silicon_temp_degc", c_int8),
-        ("ambient_per_spad", c_uint32 * 64),
-        ("nb_target_detected", c_uint8 * 64),
-        ("nb_spads_enabled", c_uint32 * 64),
-        ("signal_per_spad", c_uint32 * 64 * NB_TARGET_PER_ZONE),
-        ("range_sigma_mm", c_uint16 * 64 * NB_TARGET_PER_ZONE),
-        ("distance_mm", c_int16 * 64 * NB_TARGET_PER_ZONE),
-        ("reflectance", c_uint8 * 64 * NB_TARGET_PER_ZONE),
-        ("target_status", c_uint8 * 64 * NB_TARGET_PER_ZONE),
-        ("motion_indicator", VL53L5CX_MotionData)
+        ("name", c_char_p),
+        ("offset", c_uint32),
+        ("size", c_uint32)
     ]
 
 
+# Element type of every VL53L5CX_ResultsData field the driver can output
+_RESULTS_TYPES = {
+    "silicon_temp_degc": c_int8,
+    "ambient_per_spad": c_uint32,
+    "nb_target_detected": c_uint8,
+    "nb_spads_enabled": c_uint32,
+    "signal_per_spad": c_uint32,
+    "range_sigma_mm": c_uint16,
+    "distance_mm": c_int16,
+    "reflectance": c_uint8,
+    "target_status": c_uint8,
+    "motion_indicator": VL53L5CX_MotionData
+}
+
+
+def _results_layout():
+    # The fields present depend on the VL53L5CX_DISABLE_* flags the library was built with
+    fields = POINTER(_ResultsField)()
+    count = _VL53.get_results_fields(byref(fields))
+    return [(fields[i].name.decode(), fields[i].offset, fields[i].size) for i in range(count)]
+
+
+def _results_fields(layout):
+    result = []
+    for name, _, size in layout:
+        ctype = _RESULTS_TYPES[name]
+        length = size // sizeof(ctype)
+        result.append((name, ctype if length == 1 else ctype * length))
+    return result
+
+
+class VL53L5CX_ResultsData(Structure):
+    _fields_ = _results_fields(_results_layout())
+
+
+if sizeof(VL53L5CX_ResultsData) != _VL53.get_results_size() or any(
+        getattr(VL53L5CX_ResultsData, name).offset != offset for name, offset, _ in _results_layout()):
+    raise RuntimeError("VL53L5CX_ResultsData does not match the compiled library layout.")
+
+# Names of the outputs available from this build of the library
+RESULTS_FIELDS = tuple(name for name, _ in VL53L5CX_ResultsData._fields_)
+
+
+# Settings accepted by apply_config(), in the order they are applied
+_CONFIG_SETTERS = {
+    "ranging_mode": "set_ranging_mode",
+    "resolution": "set_resolution",
+    "ranging_frequency_hz": "set_ranging_frequency_hz",
+    "integration_time_ms": "set_integration_time_ms",
+    "sharpener_percent": "set_sharpener_percent",
+    "target_order": "set_target_order"
+}
+
+
+def _validate_settings(settings):
+    resolution = settings.get("resolution")
+    frequency = settings.get("ranging_frequency_hz")
+    integration_time = settings.get("integration_time_ms")
+
+    if resolution not in (None, RESOLUTION_4X4, RESOLUTION_8X8):
+        raise ValueError("resolution must be 4*4 or 8*8")
+    if frequency is not None:
+        max_frequency = 15 if resolution == RESOLUTION_8X8 else 60
+        if not 1 <= frequency <= max_frequency:
+            raise ValueError(f"ranging_frequency_hz must be 1-{max_frequency}Hz at this resolution")
+    if integration_time is not None:
+        if not 2 <= integration_time <= 1000:
+            raise ValueError("integration_time_ms must be 2-1000ms")
+        # Integration time is only used in autonomous mode, continuous mode integrates for the whole period
+        autonomous = settings.get("ranging_mode") == RANGING_MODE_AUTONOMOUS
+        if autonomous and frequency is not None and integration_time >= 1000 / frequency:
+            raise ValueError("integration_time_ms must be lower than the ranging period")
+    if not 0 <= settings.get("sharpener_percent", 0) <= 99:
+        raise ValueError("sharpener_percent must be 0-99")
+    if settings.get("target_order") not in (None, TARGET_ORDER_CLOSEST, TARGET_ORDER_STRONGEST):
+        raise ValueError("target_order must be TARGET_ORDER_CLOSEST or TARGET_ORDER_STRONGEST")
+    if settings.get("ranging_mode") not in (None, RANGING_MODE_CONTINUOUS, RANGING_MODE_AUTONOMOUS):
+        raise ValueError("ranging_mode must be RANGING_MODE_CONTINUOUS or RANGING_MODE_AUTONOMOUS")
+
+
+class FrameRing:
+    """Bounded ring of reusable VL53L5CX_ResultsData, filled by a single producer.
+
+    The most recent frame is published with a single reference assignment so
+    latest() never blocks, while wait() sleeps until a newer frame arrives.
+    A frame is overwritten after `size - 1` newer frames have been published.
+
+    """
+    def __init__(self, size=4):
+        """Initialise FrameRing.
+
+        :param size: Number of frames to buffer, must be at least 2.
+
+        """
+        if size < 2:
+            raise ValueError("size must be >= 2")
+        self._slots = [VL53L5CX_ResultsData() for _ in range(size)]
+        self._index = 0
+        self._latest = (0, None)
+        self._read_sequence = 0
+        self._condition = threading.Condition()
+        self.dropped = 0
+        self.errors = 0
+
+    @property
+    def frames(self):
+        """Total number of frames published."""
+        return self._latest[0]
+
+    def next_slot(self):
+        """Get the buffer the producer should fill next."""
+        return self._slots[self._index]
+
+    def publish(self):
+        """Publish the buffer returned by next_slot() as the latest frame."""
+        self._latest = (self._latest[0] + 1, self._slots[self._index])
+        self._index = (self._index + 1) % len(self._slots)
+        with self._condition:
+            self._condition.notify_all()
+
+    def latest(self):
+        """Get the latest frame, or None if nothing has been published."""
+        sequence, results = self._latest
+        if sequence > self._read_sequence:
+            # Count frames that were published but never handed to a consumer
+            self.dropped += sequence - self._read_sequence - 1
+            self._read_sequence = sequence
+        return results
+
+    def wait(self, timeout=None):
+        """Wait for a frame newer than the last one returned.
+
+        :param timeout: Timeout in seconds, or None to wait forever.
+
+        Returns the frame, or None on timeout.
+
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._latest[0] > self._read_sequence, timeout):
+                return None
+        return self.latest()
+
+
+def _i2c_bus_number(i2c_dev):
+    # Find the bus an SMBus was opened on from its file descriptor, None if it isn't /dev/i2c-N
+    try:
+        path = os.readlink(f"/proc/self/fd/{i2c_dev.fd}")
+    except (AttributeError, TypeError, OSError):
+        return None
+    match = re.fullmatch(r"/dev/i2c-(\d+)", path)
+    return int(match.group(1)) if match else None
+
+
 class VL53L5CX:
-    def __init__(self, i2c_addr=DEFAULT_I2C_ADDRESS, i2c_dev=None, skip_init=False):
+    def __init__(self, i2c_addr=DEFAULT_I2C_ADDRESS, i2c_dev=None, skip_init=False, i2c_bus=None, state=None, interrupt=None):
         """Initialise VL53L5CX.
 
         :param i2c_addr: Sensor i2c address. (defualt: 0x29)
+        :param i2c_dev: SMBus compatible i2c device (default: SMBus(1))
         :param skip_init: Skip (slow) sensor init (if it has not been power cycled).
+        :param i2c_bus: Open /dev/i2c-<i2c_bus> natively from C, bypassing the Python i2c callbacks and i2c_dev.
+        :param state: State from save_state(), init is skipped if the sensor is still running with it.
+        :param interrupt: GPIOInterrupt watching the sensor's INT pin, replaces data_ready() polling over i2c.
 
         """
         self._configuration = None
         self._motion_configuration = None
+        self._settings = {}
+        self._ranging = False
+        self._frames = None
+        self._frame_index = 0
+        self._stream_ring = None
+        self._stream_thread = None
+        self._stream_stop = threading.Event()
+        self._instrumentation = None
+        self.interrupt = interrupt
+        self.i2c_addr = i2c_addr
 
         def _i2c_read(address, reg, data_p, length):
             msg_w = i2c_msg.write(address, [reg >> 8, reg & 0xff])
             msg_r = i2c_msg.read(address, length)
             self._i2c.i2c_rdwr(msg_w, msg_r)
 
-            for index in range(length):
-                data_p[index] = ord(msg_r.buf[index])
+            # Copy the read buffer straight into the ctypes pointer
+            memmove(data_p, msg_r.buf, length)
 
             return 0
 
         def _i2c_write(address, reg, data_p, length):
-            # Copy the ctypes pointer data into a Python list
-            data = []
-            for i in range(length):
-                data.append(data_p[i])
+            # Copy the ctypes pointer data into bytes in one go
+            data = memoryview(string_at(data_p, length))
 
             for offset in range(0, length, _I2C_CHUNK_SIZE):
                 chunk = data[offset:offset + _I2C_CHUNK_SIZE]
-                msg_w = i2c_msg.write(address, [(reg + offset) >> 8, (reg + offset) & 0xff] + chunk)
+                msg_w = i2c_msg.write(address, bytes(((reg + offset) >> 8, (reg + offset) & 0xff)) + chunk)
                 self._i2c.i2c_rdwr(msg_w)
 
             return 0
 
-        def _sleep(ms):
-            time.sleep(ms / 1000.0)
-            return 0
+        if i2c_bus is not None:
+            self._i2c = None
+            configuration = _VL53.get_native_configuration(i2c_addr << 1, i2c_bus, None)
+            if not configuration:
+                raise RuntimeError(f"Could not open /dev/i2c-{i2c_bus}")
+        else:
+            self._i2c = i2c_dev or SMBus(1)
+            self._i2c_rd_func = _I2C_RD_FUNC(_i2c_read)
+            self._i2c_wr_func = _I2C_WR_FUNC(_i2c_write)
+            configuration = _VL53.get_configuration(i2c_addr << 1, self._i2c_rd_func, self._i2c_wr_func, None)
+            i2c_bus = _i2c_bus_number(self._i2c)
+
+        # Bus number, or None if i2c_dev isn't a /dev/i2c-N device (eg: a simulator)
+        self.i2c_bus = i2c_bus
 
-        self._i2c = i2c_dev or SMBus(1)
-        self._i2c_rd_func = _I2C_RD_FUNC(_i2c_read)
-        self._i2c_wr_func = _I2C_WR_FUNC(_i2c_write)
-        self._sleep_func = _SLEEP_FUNC(_sleep)
-        self._configuration = _VL53.get_configuration(i2c_addr << 1, self._i2c_rd_func, self._i2c_wr_func, self._sleep_func)
+        self._configuration = c_void_p(configuration)
 
         if not self.is_alive():
             raise RuntimeError(f"VL53L5CX not detected on 0x{i2c_addr:02x}")
 
+        if state is not None and self.restore_state(state):
+            return
+
         if not skip_init:
             if not self.init():
                 raise RuntimeError("VL53L5CX init failed!")
 
     def init(self):
         """Initialise VL53L5CX."""
-        return _VL53.vl53l5cx_init(self._configuration) == STATUS_OK
+        self._settings = {}
+        return _VL53.call_cancellable(self._configuration, _VL53.vl53l5cx_init) == STATUS_OK
 
     def __del__(self):
         if self._configuration:
@@ -162,7 +481,7 @@ class VL53L5CX:
 
         """
         if self._motion_configuration is None:
-            self._motion_configuration = _VL53.get_motion_configuration()
+            self._motion_configuration = c_void_p(_VL53.get_motion_configuration())
         return _VL53.vl53l5cx_motion_indicator_init(self._configuration, self._motion_configuration, resolution) == 0
 
     def set_motion_distance(self, distance_min, distance_max):
@@ -180,6 +499,70 @@ class VL53L5CX:
             raise ValueError("distance between distance_min and distance_max must be < 1500mm")
         return _VL53.vl53l5cx_motion_indicator_set_distance_motion(self._configuration, self._motion_configuration, distance_min, distance_max)
 
+    def set_motion_resolution(self, resolution):
+        """Set motion indicator resolution, after changing the sensor resolution.
+
+        Unlike enable_motion_indicator(), the motion distance window is kept.
+
+        :param resolution: Either 4*4 or 8*8, matching set_resolution()
+
+        """
+        if self._motion_configuration is None:
+            raise RuntimeError("Enable motion first.")
+        return _VL53.vl53l5cx_motion_indicator_set_resolution(self._configuration, self._motion_configuration, resolution) == STATUS_OK
+
+    def set_detection_thresholds(self, thresholds):
+        """Program detection thresholds.
+
+        With thresholds enabled the sensor only pulls INT low for frames where
+        they are met, so with an interrupt, wait_data_ready() and streaming only
+        read the frames of interest. data_ready() over i2c still reports every frame.
+
+        Set thresholds while ranging is stopped.
+
+        :param thresholds: Up to NB_THRESHOLDS VL53L5CX_DetectionThresholds, see detection_thresholds()
+
+        """
+        if not 1 <= len(thresholds) <= NB_THRESHOLDS:
+            raise ValueError(f"thresholds must have 1-{NB_THRESHOLDS} entries")
+        if any(threshold.zone_num >= NB_THRESHOLDS for threshold in thresholds):
+            raise ValueError(f"zone_num must be 0-{NB_THRESHOLDS - 1}")
+
+        # The driver scales the array in place, so always pass it a copy
+        array = (VL53L5CX_DetectionThresholds * NB_THRESHOLDS)()
+        for i, threshold in enumerate(thresholds):
+            memmove(byref(array[i]), byref(threshold), sizeof(VL53L5CX_DetectionThresholds))
+        array[len(thresholds) - 1].zone_num |= _LAST_THRESHOLD
+        return _VL53.vl53l5cx_set_detection_thresholds(self._configuration, array) == STATUS_OK
+
+    def get_detection_thresholds(self):
+        """Get the detection thresholds programmed on the sensor, as a list of VL53L5CX_DetectionThresholds."""
+        array = (VL53L5CX_DetectionThresholds * NB_THRESHOLDS)()
+        if _VL53.vl53l5cx_get_detection_thresholds(self._configuration, array) != STATUS_OK:
+            raise RuntimeError("Error reading detection thresholds.")
+        result = []
+        for threshold in array:
+            result.append(threshold)
+            if threshold.zone_num & _LAST_THRESHOLD:
+                threshold.zone_num &= ~_LAST_THRESHOLD
+                break
+        return result
+
+    def set_detection_thresholds_enable(self, enabled):
+        """Enable or disable detection thresholds.
+
+        :param enabled: True to gate INT on the thresholds, False to pull INT low for every frame.
+
+        """
+        return _VL53.vl53l5cx_set_detection_thresholds_enable(self._configuration, 1 if enabled else 0) == STATUS_OK
+
+    def get_detection_thresholds_enable(self):
+        """Check if detection thresholds are enabled."""
+        enabled = c_uint8(0)
+        if _VL53.vl53l5cx_get_detection_thresholds_enable(self._configuration, byref(enabled)) != STATUS_OK:
+            raise RuntimeError("Error reading configuration.")
+        return enabled.value == 1
+
     def is_alive(self):
         """Check sensor is connected.
 
@@ -192,15 +575,109 @@ class VL53L5CX:
 
     def start_ranging(self):
         """Start ranging."""
-        _VL53.vl53l5cx_start_ranging(self._configuration)
+        if self.interrupt is not None:
+            # Discard edges from before ranging started
+            self.interrupt.clear()
+        if _VL53.call_cancellable(self._configuration, _VL53.vl53l5cx_start_ranging) != STATUS_OK:
+            return False
+        self._ranging = True
+        return True
 
     def stop_ranging(self):
         """Stop ranging."""
-        _VL53.vl53l5cx_stop_ranging(self._configuration)
+        if _VL53.call_cancellable(self._configuration, _VL53.vl53l5cx_stop_ranging) != STATUS_OK:
+            return False
+        self._ranging = False
+        return True
+
+    def cancel(self):
+        """Abort a running init(), start_ranging(), stop_ranging() or calibrate_xtalk() from another thread.
+
+        The call returns False at its next driver sleep, leaving the sensor
+        in an unknown state, so it must be initialised again with init().
+        If no call is running it has no effect.
+
+        """
+        _VL53.cancel(self._configuration)
+
+    def set_sleep_spin_us(self, spin_us):
+        """Set how much of each driver sleep is spent spinning instead of sleeping.
+
+        Driver sleeps are timed natively to an absolute deadline, spinning
+        for the last part trades CPU time for less oversleeping, eg: 200.
+
+        :param spin_us: Microseconds to spin at the end of each sleep (default: 0)
+
+        """
+        if spin_us < 0:
+            raise ValueError("spin_us must be >= 0")
+        _VL53.set_sleep_spin_us(self._configuration, int(spin_us))
 
     def set_i2c_address(self, i2c_address):
         """Change the i2c address."""
-        return _VL53.vl53l5cx_set_i2c_address(self._configuration, i2c_address << 1) == STATUS_OK
+        if _VL53.vl53l5cx_set_i2c_address(self._configuration, i2c_address << 1) != STATUS_OK:
+            return False
+        self.i2c_addr = i2c_address
+        return True
+
+    def calibrate_xtalk(self, reflectance_percent=3, nb_samples=4, distance_mm=600):
+        """Calibrate crosstalk from a cover glass.
+
+        Point the sensor, behind its cover glass, at a target filling the
+        whole field of view. Takes up to 20 seconds, ranging must be stopped
+        and cancel() can abort it. The calibration is lost on reset, see
+        get_xtalk_data() and vl53l5cx_ctypes.calibration to keep it.
+
+        :param reflectance_percent: Reflectance of the target, 1-99% (ST recommend 3%)
+        :param nb_samples: Samples to take, 1-16. More is more accurate but slower.
+        :param distance_mm: Distance to the target, 600-3000mm.
+
+        """
+        if not 1 <= reflectance_percent <= 99:
+            raise ValueError("reflectance_percent must be 1-99%")
+        if not 1 <= nb_samples <= 16:
+            raise ValueError("nb_samples must be 1-16")
+        if not 600 <= distance_mm <= 3000:
+            raise ValueError("distance_mm must be 600-3000mm")
+        return _VL53.calibrate_xtalk(self._configuration, reflectance_percent, nb_samples, distance_mm) == STATUS_OK
+
+    def get_xtalk_data(self):
+        """Get the crosstalk calibration data in use, as XTALK_SIZE bytes for set_xtalk_data()."""
+        data = (c_uint8 * XTALK_SIZE)()
+        if _VL53.vl53l5cx_get_caldata_xtalk(self._configuration, data) != STATUS_OK:
+            raise RuntimeError("Error reading crosstalk calibration.")
+        return bytes(data)
+
+    def set_xtalk_data(self, data):
+        """Load crosstalk calibration data from get_xtalk_data().
+
+        The data is uploaded to the sensor in a single i2c write.
+
+        :param data: XTALK_SIZE bytes from get_xtalk_data()
+
+        """
+        if len(data) != XTALK_SIZE:
+            raise ValueError(f"data must be {XTALK_SIZE} bytes")
+        return _VL53.vl53l5cx_set_caldata_xtalk(self._configuration, (c_uint8 * XTALK_SIZE).from_buffer_copy(data)) == STATUS_OK
+
+    def set_xtalk_margin(self, xtalk_margin):
+        """Set the crosstalk margin.
+
+        Raises the crosstalk threshold to avoid false positives after calibration.
+
+        :param xtalk_margin: Margin in kcps/SPAD, 0-10000 (default: 50)
+
+        """
+        if not 0 <= xtalk_margin <= 10000:
+            raise ValueError("xtalk_margin must be 0-10000 kcps/SPAD")
+        return _VL53.vl53l5cx_set_xtalk_margin(self._configuration, xtalk_margin) == STATUS_OK
+
+    def get_xtalk_margin(self):
+        """Get the crosstalk margin in kcps/SPAD."""
+        margin = c_uint32(0)
+        if _VL53.vl53l5cx_get_xtalk_margin(self._configuration, byref(margin)) != STATUS_OK:
+            raise RuntimeError("Error reading configuration.")
+        return margin.value
 
     def set_ranging_mode(self, ranging_mode):
         """Set ranging mode.
@@ -208,7 +685,11 @@ class VL53L5CX:
         :param ranging_mode: Either Continuous (RANGING_MODE_CONTINUOUS) or Autonomous (RANGING_MODE_AUTONOMOUS).
 
         """
-        _VL53.vl53l5cx_set_ranging_mode(self._configuration, ranging_mode)
+        return self._set("ranging_mode", _VL53.vl53l5cx_set_ranging_mode, ranging_mode)
+
+    def get_ranging_mode(self):
+        """Get ranging mode, either RANGING_MODE_CONTINUOUS or RANGING_MODE_AUTONOMOUS."""
+        return self._get("ranging_mode", _VL53.vl53l5cx_get_ranging_mode)
 
     def set_ranging_frequency_hz(self, ranging_frequency_hz):
         """Set ranging frequency.
@@ -218,7 +699,11 @@ class VL53L5CX:
         :param ranging_frequency_hz: Frequency in hz from 1-60Hz at 4*4 and 1-15Hz at 8*8.
 
         """
-        _VL53.vl53l5cx_set_ranging_frequency_hz(self._configuration, ranging_frequency_hz)
+        return self._set("ranging_frequency_hz", _VL53.vl53l5cx_set_ranging_frequency_hz, ranging_frequency_hz)
+
+    def get_ranging_frequency_hz(self):
+        """Get ranging frequency in hz."""
+        return self._get("ranging_frequency_hz", _VL53.vl53l5cx_get_ranging_frequency_hz)
 
     def set_resolution(self, resolution):
         """Set sensor resolution.
@@ -228,7 +713,15 @@ class VL53L5CX:
         :param resolution: Either 4*4 or 8*8. The lower resolution supports a faster output data rate,
 
         """
-        _VL53.vl53l5cx_set_resolution(self._configuration, resolution)
+        return self._set("resolution", _VL53.vl53l5cx_set_resolution, resolution)
+
+    def get_resolution(self):
+        """Get sensor resolution.
+
+        Returns either 4*4 or 8*8.
+
+        """
+        return self._get("resolution", _VL53.vl53l5cx_get_resolution)
 
     def set_integration_time_ms(self, integration_time_ms):
         """Set sensor integration time.
@@ -236,7 +729,11 @@ class VL53L5CX:
         :param integration_time_ms: From 2ms to 1000ms. Must be lower than the ranging period.
 
         """
-        _VL53.vl53l5cx_set_integration_time_ms(self._configuration, integration_time_ms)
+        return self._set("integration_time_ms", _VL53.vl53l5cx_set_integration_time_ms, integration_time_ms)
+
+    def get_integration_time_ms(self):
+        """Get sensor integration time in ms."""
+        return self._get("integration_time_ms", _VL53.vl53l5cx_get_integration_time_ms, c_uint32)
 
     def set_sharpener_percent(self, sharpener_percent):
         """Set sharpener intensity.
@@ -246,7 +743,11 @@ class VL53L5CX:
         :param sharpener_percent: From 0 (off) to 99 (full) (hardware default: 5%)
 
         """
-        _VL53.vl53l5cx_set_sharpener_percent(self._configuration, sharpener_percent)
+        return self._set("sharpener_percent", _VL53.vl53l5cx_set_sharpener_percent, sharpener_percent)
+
+    def get_sharpener_percent(self):
+        """Get sharpener intensity, from 0 to 99."""
+        return self._get("sharpener_percent", _VL53.vl53l5cx_get_sharpener_percent)
 
     def set_target_order(self, target_order):
         """Set target order.
@@ -256,7 +757,11 @@ class VL53L5CX:
         :param target_order: Either Strongest (default, TARGET_ORDER_STRONGEST) or Closest (TARGET_ORDER_CLOSEST)
 
         """
-        _VL53.vl53l5cx_set_target_order(self._configuration, target_order)
+        return self._set("target_order", _VL53.vl53l5cx_set_target_order, target_order)
+
+    def get_target_order(self):
+        """Get target order, either TARGET_ORDER_STRONGEST or TARGET_ORDER_CLOSEST."""
+        return self._get("target_order", _VL53.vl53l5cx_get_target_order)
 
     def set_power_mode(self, power_mode):
         """Set power mode.
@@ -264,18 +769,317 @@ class VL53L5CX:
         :param power_mode: One of Sleep (POWER_MODE_SLEEP) or Wakeup (POWER_MODE_WAKEUP)
 
         """
-        _VL53.vl53l5cx_set_power_mode(self._configuration, power_mode)
+        return _VL53.vl53l5cx_set_power_mode(self._configuration, power_mode) == STATUS_OK
+
+    def get_settings(self):
+        """Read the current ranging settings back from the sensor.
+
+        Returns a dict of resolution, ranging_frequency_hz, integration_time_ms,
+        sharpener_percent, target_order and ranging_mode.
+
+        """
+        self._settings = {}
+        return {
+            "resolution": self.get_resolution(),
+            "ranging_frequency_hz": self.get_ranging_frequency_hz(),
+            "integration_time_ms": self.get_integration_time_ms(),
+            "sharpener_percent": self.get_sharpener_percent(),
+            "target_order": self.get_target_order(),
+            "ranging_mode": self.get_ranging_mode()
+        }
+
+    def apply_config(self, settings):
+        """Validate and apply several ranging settings in one pass.
+
+        The whole set is validated before anything is sent to the sensor.
+        Settings already known to have the requested value are skipped, the
+        rest are applied in dependency order, and ranging is stopped and
+        restarted at most once.
+
+        :param settings: Dict with any of resolution, ranging_frequency_hz, integration_time_ms,
+            sharpener_percent, target_order and ranging_mode.
+
+        Returns True if every setting was applied successfully.
+
+        """
+        unknown = set(settings) - set(_CONFIG_SETTERS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+        merged = dict(self._settings)
+        merged.update(settings)
+        # The limits depend on the resolution and ranging mode, so read them if they aren't known
+        if "ranging_frequency_hz" in merged and "resolution" not in merged:
+            merged["resolution"] = self.get_resolution()
+        if "resolution" in settings and "ranging_frequency_hz" not in merged:
+            merged["ranging_frequency_hz"] = self.get_ranging_frequency_hz()
+        if "integration_time_ms" in merged and "ranging_frequency_hz" in merged and "ranging_mode" not in merged:
+            merged["ranging_mode"] = self.get_ranging_mode()
+        _validate_settings(merged)
+
+        changes = [name for name in _CONFIG_SETTERS if name in settings and self._settings.get(name) != settings[name]]
+        if not changes:
+            return True
+
+        was_ranging = self._ranging
+        if was_ranging and not self.stop_ranging():
+            return False
+
+        result = True
+        for name in changes:
+            result = getattr(self, _CONFIG_SETTERS[name])(settings[name]) and result
+
+        if was_ranging:
+            result = self.start_ranging() and result
+
+        return result
+
+    @contextmanager
+    def configure(self):
+        """Collect settings in a dict and apply them together with apply_config() on exit.
+
+        Raises RuntimeError if any setting could not be applied.
+
+        """
+        settings = {}
+        yield settings
+        if not self.apply_config(settings):
+            raise RuntimeError("VL53L5CX configuration failed!")
+
+    def save_state(self):
+        """Save the driver state of an initialised sensor for a later warm start.
+
+        The returned bytes can be passed as `state` to VL53L5CX(), or to restore_state(),
+        in a new process to skip the firmware upload if the sensor has not been reset.
+
+        """
+        settings = self.get_settings()
+        state = (c_uint8 * _STATE_SIZE)()
+        _VL53.get_state(self._configuration, state)
+        header = _STATE_HEADER.pack(_STATE_MAGIC, _VL53.get_api_revision(), *settings.values())
+        return header + bytes(state)
+
+    def restore_state(self, state):
+        """Restore driver state from save_state() without re-uploading firmware.
+
+        Succeeds only if the state was saved by the same driver revision and the
+        sensor firmware is still running with the same settings.
+
+        :param state: Bytes returned by save_state()
+
+        Returns True if the state was restored, False if a full init() is required.
+
+        """
+        if len(state) != _STATE_HEADER.size + _STATE_SIZE:
+            return False
+        magic, revision, *settings = _STATE_HEADER.unpack_from(state)
+        if magic != _STATE_MAGIC or revision.rstrip(b"\0") != _VL53.get_api_revision():
+            return False
+        if _VL53.probe_firmware(self._configuration, _STATE_PROBE_RETRIES) != STATUS_OK:
+            return False
+        _VL53.set_state(self._configuration, (c_uint8 * _STATE_SIZE).from_buffer_copy(state, _STATE_HEADER.size))
+        try:
+            return list(self.get_settings().values()) == settings
+        except RuntimeError:
+            return False
+
+    def _get(self, name, func, ctype=c_uint8):
+        # Read a setting from the sensor, unless it has already been read or set
+        if name not in self._settings:
+            value = ctype(0)
+            if func(self._configuration, byref(value)) != STATUS_OK:
+                raise RuntimeError("Error reading configuration.")
+            self._settings[name] = value.value
+        return self._settings[name]
+
+    def _set(self, name, func, value):
+        if func(self._configuration, value) != STATUS_OK:
+            self._settings.pop(name, None)
+            return False
+        self._settings[name] = value
+        return True
 
     def data_ready(self):
-        """Check if data is ready."""
+        """Check if data is ready.
+
+        With an interrupt this checks for an edge on INT, without any i2c traffic.
+
+        """
+        if self.interrupt is not None:
+            return self.interrupt.wait(0)
         ready = c_int(0)
         status = _VL53.vl53l5cx_check_data_ready(self._configuration, byref(ready))
         return ready.value and status == STATUS_OK
 
-    def get_data(self):
-        """Get data."""
-        results = VL53L5CX_ResultsData()
+    def wait_data_ready(self, timeout=None):
+        """Wait until data is ready.
+
+        Blocks on the INT pin edge with an interrupt, otherwise polls
+        data_ready() at a rate relative to the ranging frequency.
+
+        :param timeout: Timeout in seconds, or None to wait forever.
+
+        Returns True if data is ready, False on timeout.
+
+        """
+        if self.interrupt is not None:
+            return self.interrupt.wait(timeout)
+        poll_interval = max(_STREAM_POLL_INTERVAL, 1.0 / self.get_ranging_frequency_hz() / 20)
+        t_end = None if timeout is None else time.monotonic() + timeout
+        while not self.data_ready():
+            if t_end is not None and time.monotonic() >= t_end:
+                return False
+            time.sleep(poll_interval)
+        return True
+
+    def get_data(self, into=None):
+        """Get data.
+
+        :param into: Optional VL53L5CX_ResultsData to read into, instead of allocating a new one.
+
+        """
+        results = VL53L5CX_ResultsData() if into is None else into
         status = _VL53.vl53l5cx_get_ranging_data(self._configuration, byref(results))
         if status != STATUS_OK:
             raise RuntimeError("Error reading data.")
         return results
+
+    def get_frame(self):
+        """Get data as a Frame of zero-copy NumPy views, shaped to the current resolution.
+
+        Frames are read into a small ring of reusable buffers, so a returned
+        Frame is only valid until it is overwritten by a later call.
+
+        Requires numpy.
+
+        """
+        from .frame import Frame
+
+        resolution = self.get_resolution()
+        if self._frames is None or self._frames[0].resolution != resolution:
+            self._frames = [Frame(VL53L5CX_ResultsData(), resolution) for _ in range(_FRAME_RING_SIZE)]
+
+        frame = self._frames[self._frame_index]
+        self._frame_index = (self._frame_index + 1) % _FRAME_RING_SIZE
+        self.get_data(into=frame.results)
+        return frame
+
+    def start_streaming(self, buffers=4):
+        """Start ranging and read frames in a background thread.
+
+        Frames are published into a FrameRing, use latest_frame() or
+        wait_frame() to consume them. Other methods must not be called
+        until stop_streaming().
+
+        The driver runs with the GIL released, except for the Python i2c
+        callbacks, which are bypassed entirely when using i2c_bus. With an
+        interrupt, frames are read only on an INT edge, with no polling.
+
+        :param buffers: Number of frames to buffer before the oldest is overwritten.
+
+        """
+        if self._stream_thread is not None:
+            raise RuntimeError("Already streaming.")
+        period = 1.0 / self.get_ranging_frequency_hz()
+        self._stream_ring = FrameRing(buffers)
+        self._stream_stop.clear()
+        if not self.start_ranging():
+            self._stream_ring = None
+            raise RuntimeError("Could not start ranging.")
+        self._stream_thread = threading.Thread(target=self._stream, args=(self._stream_ring, period), daemon=True)
+        self._stream_thread.start()
+
+    def stop_streaming(self):
+        """Stop the background reader thread and stop ranging."""
+        if self._stream_thread is None:
+            return
+        self._stream_stop.set()
+        self._stream_thread.join()
+        self._stream_thread = None
+        self.stop_ranging()
+
+    def latest_frame(self):
+        """Get the most recent streamed frame without blocking, or None."""
+        return self._streaming_ring().latest()
+
+    def wait_frame(self, timeout=None):
+        """Wait for a streamed frame newer than the last one returned.
+
+        :param timeout: Timeout in seconds, or None to wait forever.
+
+        Returns a VL53L5CX_ResultsData, or None on timeout.
+
+        """
+        return self._streaming_ring().wait(timeout)
+
+    def stream_stats(self):
+        """Get streaming counters: frames published, dropped (never consumed) and read errors."""
+        ring = self._stream_ring
+        if ring is None:
+            raise RuntimeError("Not streaming.")
+        return {"frames": ring.frames, "dropped": ring.dropped, "errors": ring.errors}
+
+    def _streaming_ring(self):
+        if self._stream_thread is None:
+            raise RuntimeError("Not streaming.")
+        return self._stream_ring
+
+    def enable_instrumentation(self):
+        """Start counting i2c traffic, driver sleeps and time spent in each public method.
+
+        Methods are only wrapped while instrumentation is enabled, so it
+        has no cost otherwise. Call init() afterwards to measure it.
+
+        Returns an Instrumentation, see vl53l5cx_ctypes.instrumentation.
+
+        """
+        from .instrumentation import Instrumentation
+
+        if self._instrumentation is None:
+            self._instrumentation = Instrumentation(self)
+        return self._instrumentation
+
+    def disable_instrumentation(self):
+        """Stop instrumentation, restoring the uninstrumented methods."""
+        if self._instrumentation is not None:
+            self._instrumentation.detach()
+            self._instrumentation = None
+
+    def get_platform_stats(self):
+        """Get the i2c and sleep counters kept by the platform layer while instrumentation is enabled."""
+        stats = VL53L5CX_PlatformStats()
+        _VL53.get_platform_stats(self._configuration, byref(stats))
+        return stats
+
+    def _stream(self, ring, period):
+        if self.interrupt is not None:
+            self._stream_interrupt(ring)
+            return
+
+        # Sleep for most of a ranging period after each frame, then poll for the next
+        poll_interval = max(_STREAM_POLL_INTERVAL, period / 20)
+        next_poll = time.monotonic()
+        while not self._stream_stop.is_set():
+            now = time.monotonic()
+            if now < next_poll:
+                self._stream_stop.wait(next_poll - now)
+                continue
+            if self.data_ready():
+                try:
+                    self.get_data(into=ring.next_slot())
+                    ring.publish()
+                except RuntimeError:
+                    ring.errors += 1
+                next_poll = now + period * 0.8
+            else:
+                next_poll = now + poll_interval
+
+    def _stream_interrupt(self, ring):
+        # Block on INT, waking periodically to check for stop_streaming()
+        while not self._stream_stop.is_set():
+            if self.interrupt.wait(_STREAM_STOP_INTERVAL):
+                try:
+                    self.get_data(into=ring.next_slot())
+                    ring.publish()
+                except RuntimeError:
+                    ring.errors += 1
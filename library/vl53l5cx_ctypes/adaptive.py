@@ -0,0 +1,362 @@
+import time
+import collections
+import numpy
+from . import RANGING_MODE_AUTONOMOUS, POWER_MODE_SLEEP, POWER_MODE_WAKEUP, _CONFIG_SETTERS, _validate_settings
+from .processing import VALID_STATUSES, status_table
+
+
+# Name the time spent asleep is recorded under in AdaptiveController.stats()
+SLEEP = "sleep"
+
+# Transitions kept in AdaptiveController.history
+_HISTORY_SIZE = 100
+
+SceneStats = collections.namedtuple("SceneStats", ("nearest_mm", "approach_mm_s", "change_mm", "motion"))
+
+Transition = collections.namedtuple("Transition", ("time", "source", "target", "scene", "latency_s", "gap_s"))
+
+
+class Profile:
+    """Ranging settings, and the scene activity which calls for them.
+
+    A profile is entered when any of its conditions is met, and kept
+    while any of them is still met with the thresholds relaxed by the
+    controller's hysteresis. Conditions left as None are not checked.
+
+    """
+    def __init__(self, name, settings, near_mm=None, approach_mm_s=None, change_mm=None, motion=None, hold_s=1.0):
+        """Initialise Profile.
+
+        :param name: Name to report metrics under.
+        :param settings: Dict of settings for VL53L5CX.apply_config()
+        :param near_mm: Enter when the nearest valid target is at most this far away.
+        :param approach_mm_s: Enter when the nearest valid target approaches at least this fast.
+        :param change_mm: Enter when zones move by at least this much, on average, between frames.
+        :param motion: Enter when the largest motion indicator value is at least this, requires motion=True in the controller.
+        :param hold_s: Time to stay after the conditions were last met, before dropping to a lower profile.
+
+        """
+        unknown = set(settings) - set(_CONFIG_SETTERS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        _validate_settings(settings)
+        if name == SLEEP:
+            raise ValueError(f"{SLEEP} is reserved for time spent asleep")
+        self.name = name
+        self.settings = dict(settings)
+        self.near_mm = near_mm
+        self.approach_mm_s = approach_mm_s
+        self.change_mm = change_mm
+        self.motion = motion
+        self.hold_s = hold_s
+
+    def __repr__(self):
+        return f"Profile({self.name!r}, {self.settings!r})"
+
+    def triggered(self, scene, hysteresis=0.0):
+        """Check whether a scene calls for this profile.
+
+        :param scene: SceneStats from AdaptiveController.measure()
+        :param hysteresis: Fraction to relax the thresholds by, eg: 0.2 for 20%
+
+        """
+        return any((
+            self.near_mm is not None and scene.nearest_mm <= self.near_mm * (1 + hysteresis),
+            self.approach_mm_s is not None and scene.approach_mm_s >= self.approach_mm_s * (1 - hysteresis),
+            self.change_mm is not None and scene.change_mm >= self.change_mm * (1 - hysteresis),
+            self.motion is not None and scene.motion >= self.motion * (1 - hysteresis)
+        ))
+
+
+# Profiles used when none are given, from least to most active
+DEFAULT_PROFILES = (
+    Profile("idle", {"resolution": 8 * 8, "ranging_frequency_hz": 5, "ranging_mode": RANGING_MODE_AUTONOMOUS, "integration_time_ms": 5}),
+    Profile("active", {"resolution": 8 * 8, "ranging_frequency_hz": 15, "ranging_mode": RANGING_MODE_AUTONOMOUS, "integration_time_ms": 20}, near_mm=1500, change_mm=50),
+    Profile("fast", {"resolution": 4 * 4, "ranging_frequency_hz": 60, "ranging_mode": RANGING_MODE_AUTONOMOUS, "integration_time_ms": 10}, approach_mm_s=1000, hold_s=2.0)
+)
+
+
+class AdaptiveController:
+    """Switch a sensor between ranging profiles as the scene demands.
+
+    Each frame is reduced to SceneStats (the nearest valid distance, how
+    fast it is approaching, the mean change of each zone since the last
+    frame and the motion indicator) and the most active profile whose
+    conditions are met is selected. Moving up needs enter_frames frames
+    in a row, moving down waits for the profile's hold_s to pass with
+    its relaxed thresholds unmet, so noise near a threshold doesn't
+    cause the sensor to flap between profiles.
+
+    Switching stops ranging once, sends only the settings which differ
+    between the two profiles and starts ranging again. The time this
+    takes, and the gap between the last frame of one profile and the
+    first frame of the next, are kept along with the time spent in each
+    profile, see stats()
+
+    Not for use with start_streaming(), whose thread must have the sensor to itself.
+
+    """
+    def __init__(self, sensor, profiles=DEFAULT_PROFILES, hysteresis=0.2, enter_frames=2, motion=False, valid=VALID_STATUSES):
+        """Initialise AdaptiveController.
+
+        :param sensor: Initialised VL53L5CX.
+        :param profiles: Profiles from least to most active, the first is used whenever no other is called for.
+        :param hysteresis: Fraction to relax a profile's thresholds by while it is in use.
+        :param enter_frames: Consecutive frames a more active profile must be called for before switching to it.
+        :param motion: Keep the motion indicator resolution in step with the sensor, call enable_motion_indicator() first.
+        :param valid: Target statuses to treat as valid.
+
+        """
+        if not profiles:
+            raise ValueError("At least one profile is required")
+        names = [profile.name for profile in profiles]
+        if len(set(names)) != len(names):
+            raise ValueError("Profile names must be unique")
+        # Settings left out of one profile would otherwise be inherited from whichever ran before it
+        if any(set(profile.settings) != set(profiles[0].settings) for profile in profiles):
+            raise ValueError("Every profile must have the same settings")
+        if not 0 <= hysteresis < 1:
+            raise ValueError("hysteresis must be 0.0-1.0")
+        if enter_frames < 1:
+            raise ValueError("enter_frames must be >= 1")
+
+        self.sensor = sensor
+        self.profiles = tuple(profiles)
+        self.hysteresis = hysteresis
+        self.enter_frames = enter_frames
+        self.motion = motion
+        self.table = status_table(valid)
+        self.history = collections.deque(maxlen=_HISTORY_SIZE)
+        self.scene = None
+        self.sleeping = False
+
+        self._index = 0
+        self._pending = None
+        self._pending_frames = 0
+        self._t_active = None
+        self._previous = None
+        self._t_gap = None
+        self._t_entered = None
+        self._time = dict.fromkeys(names + [SLEEP], 0.0)
+        self._frames = dict.fromkeys(names, 0)
+        self._latencies = []
+        self._gaps = []
+
+    @property
+    def profile(self):
+        """The Profile in use."""
+        return self.profiles[self._index]
+
+    def start(self, profile=None):
+        """Apply a profile and start ranging.
+
+        :param profile: Name of the profile to start in (default: the least active)
+
+        Raises RuntimeError if the profile could not be applied.
+
+        """
+        index = 0 if profile is None else [p.name for p in self.profiles].index(profile)
+        self._index = index
+        self._apply(self.profiles[index])
+        if not self.sensor.start_ranging():
+            raise RuntimeError("Could not start ranging.")
+        self._previous = None
+        self._pending = None
+        self._t_entered = self._t_active = time.monotonic()
+
+    def stop(self):
+        """Stop ranging."""
+        self._account(time.monotonic())
+        self._t_entered = None
+        self.sensor.stop_ranging()
+
+    def sleep(self):
+        """Stop ranging and put the sensor into low power sleep, keeping its settings.
+
+        Nothing is measured while asleep, so wake() is up to the caller,
+        eg: on a timer, or when another sensor sees activity.
+
+        """
+        if self.sleeping:
+            return
+        now = time.monotonic()
+        self._account(now)
+        self.sensor.stop_ranging()
+        if not self.sensor.set_power_mode(POWER_MODE_SLEEP):
+            raise RuntimeError("Could not put the sensor to sleep.")
+        self.sleeping = True
+        self._t_entered = now
+
+    def wake(self):
+        """Wake the sensor and resume ranging in the profile it slept in."""
+        if not self.sleeping:
+            return
+        if not self.sensor.set_power_mode(POWER_MODE_WAKEUP):
+            raise RuntimeError("Could not wake the sensor.")
+        self._account(time.monotonic())
+        self.sleeping = False
+        self.start(self.profile.name)
+
+    def frames(self, timeout=None):
+        """Start ranging and yield a Frame from get_frame() as each is ready, adapting the profile after every one.
+
+        :param timeout: Seconds to wait for a frame before giving up, or None to wait forever.
+
+        Stops ranging when the generator is closed, or on timeout.
+
+        """
+        self.start(self.profile.name)
+        try:
+            while self.sensor.wait_data_ready(timeout):
+                frame = self.sensor.get_frame()
+                self.update(frame)
+                yield frame
+        finally:
+            self.stop()
+
+    def measure(self, frame, timestamp=None):
+        """Reduce a Frame to SceneStats, comparing it with the previous frame measured.
+
+        :param frame: Frame, eg: from VL53L5CX.get_frame()
+        :param timestamp: time.monotonic() time of the frame (default: now)
+
+        """
+        now = time.monotonic() if timestamp is None else timestamp
+        distance = frame.distance_mm[0]
+        target_status = getattr(frame, "target_status", None)
+        valid = numpy.ones(distance.shape, dtype=bool) if target_status is None else self.table.take(target_status[0])
+        nearest = float(distance[valid].min()) if valid.any() else float("inf")
+
+        approach = change = 0.0
+        if self._previous is not None and self._previous[0].shape == distance.shape:
+            previous_distance, previous_valid, previous_nearest, previous_time = self._previous
+            both = valid & previous_valid
+            if both.any():
+                change = float(numpy.abs(distance[both].astype(numpy.float32) - previous_distance[both]).mean())
+            if nearest != float("inf") and previous_nearest != float("inf") and now > previous_time:
+                approach = (previous_nearest - nearest) / (now - previous_time)
+        self._previous = (distance.copy(), valid, nearest, now)
+
+        motion = 0
+        if self.motion and frame.motion is not None:
+            aggregates = frame.results.motion_indicator.nb_of_aggregates
+            motion = int(frame.motion[:aggregates].max()) if aggregates else 0
+
+        return SceneStats(nearest, approach, change, motion)
+
+    def update(self, frame, timestamp=None):
+        """Measure a frame and switch profile if the scene calls for it.
+
+        :param frame: Frame, eg: from VL53L5CX.get_frame()
+        :param timestamp: time.monotonic() time of the frame (default: now)
+
+        Returns the Profile in use after this frame.
+
+        """
+        now = time.monotonic() if timestamp is None else timestamp
+        if self._t_gap is not None:
+            # First frame since switching profile
+            self._gaps.append(now - self._t_gap)
+            self.history[-1] = self.history[-1]._replace(gap_s=self._gaps[-1])
+            self._t_gap = None
+
+        self.scene = scene = self.measure(frame, now)
+        self._frames[self.profile.name] += 1
+        if self._t_active is None:
+            self._t_active = now
+
+        target = None
+        for index in range(len(self.profiles) - 1, self._index, -1):
+            if self.profiles[index].triggered(scene):
+                target = index
+                break
+
+        if target is not None:
+            if self._pending != target:
+                self._pending = target
+                self._pending_frames = 0
+            self._pending_frames += 1
+            if self._pending_frames < self.enter_frames:
+                target = None
+        else:
+            self._pending = None
+            if self.profile.triggered(scene, self.hysteresis):
+                self._t_active = now
+            elif self._index > 0 and now - self._t_active >= self.profile.hold_s:
+                target = 0
+                for index in range(self._index - 1, 0, -1):
+                    if self.profiles[index].triggered(scene, self.hysteresis):
+                        target = index
+                        break
+
+        if target is not None:
+            self._switch(target, scene, now)
+        return self.profile
+
+    def stats(self):
+        """Get profile metrics.
+
+        Returns a dict of the profile in use, the number of transitions,
+        the latency of each transition (stop, reconfigure and start) and
+        the gap between frames across it, as last, mean and max seconds,
+        and the time and frames spent in each profile.
+
+        """
+        now = time.monotonic()
+        time_in_profile = dict(self._time)
+        if self._t_entered is not None:
+            time_in_profile[SLEEP if self.sleeping else self.profile.name] += now - self._t_entered
+        return {
+            "profile": SLEEP if self.sleeping else self.profile.name,
+            "transitions": len(self._latencies),
+            "transition_latency_s": self._summary(self._latencies),
+            "frame_gap_s": self._summary(self._gaps),
+            "time_in_profile_s": time_in_profile,
+            "frames_in_profile": dict(self._frames)
+        }
+
+    def _switch(self, index, scene, now):
+        source = self.profile
+        target = self.profiles[index]
+        t_start = time.monotonic()
+        was_ranging = self.sensor._ranging
+        if was_ranging:
+            self.sensor.stop_ranging()
+        try:
+            self._apply(target, source)
+        finally:
+            if was_ranging and not self.sensor.start_ranging():
+                raise RuntimeError("Could not start ranging.")
+        t_end = time.monotonic()
+
+        self._account(t_end)
+        self._index = index
+        self._t_entered = t_end
+        self._t_active = now
+        self._pending = None
+        self._previous = None
+        self._t_gap = now
+        self._latencies.append(t_end - t_start)
+        self.history.append(Transition(now, source.name, target.name, scene, t_end - t_start, None))
+
+    def _apply(self, profile, source=None):
+        # Ranging is stopped here, so apply_config() doesn't stop and start it again itself
+        if not self.sensor.apply_config(profile.settings):
+            raise RuntimeError(f"Could not apply profile {profile.name}.")
+        resolution = profile.settings.get("resolution")
+        if self.motion and resolution is not None and (source is None or source.settings.get("resolution") != resolution):
+            if not self.sensor.set_motion_resolution(resolution):
+                raise RuntimeError("Could not set motion indicator resolution.")
+
+    def _account(self, now):
+        if self._t_entered is not None:
+            self._time[SLEEP if self.sleeping else self.profile.name] += now - self._t_entered
+            self._t_entered = now
+
+    @staticmethod
+    def _summary(values):
+        return {
+            "last": values[-1] if values else 0.0,
+            "mean": sum(values) / len(values) if values else 0.0,
+            "max": max(values) if values else 0.0
+        }
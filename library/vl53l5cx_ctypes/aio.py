@@ -0,0 +1,122 @@
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from . import VL53L5CX, _STREAM_POLL_INTERVAL
+from .instrumentation import INSTRUMENTED_METHODS
+
+
+# Blocking VL53L5CX methods exposed as coroutines, wait_data_ready is reimplemented below
+_ASYNC_METHODS = tuple(name for name in INSTRUMENTED_METHODS if name != "wait_data_ready")
+
+
+class AsyncVL53L5CX:
+    """asyncio wrapper for VL53L5CX.
+
+    Blocking driver calls are run one at a time on a dedicated worker
+    thread, so the event loop is never held up by i2c traffic.
+
+    """
+    def __init__(self, sensor, executor=None):
+        """Initialise AsyncVL53L5CX.
+
+        :param sensor: VL53L5CX instance to wrap, see also AsyncVL53L5CX.create()
+        :param executor: Single worker executor for driver calls (default: a new ThreadPoolExecutor)
+
+        """
+        self.sensor = sensor
+        self._executor = executor or ThreadPoolExecutor(max_workers=1)
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        """Construct (and initialise) a VL53L5CX without blocking the event loop.
+
+        Accepts the same arguments as VL53L5CX.
+
+        """
+        executor = ThreadPoolExecutor(max_workers=1)
+        sensor = await asyncio.get_running_loop().run_in_executor(executor, functools.partial(VL53L5CX, *args, **kwargs))
+        return cls(sensor, executor)
+
+    def close(self):
+        """Shut down the worker thread."""
+        self._executor.shutdown(wait=True)
+
+    def cancel(self):
+        """Abort a running init(), start_ranging(), stop_ranging() or calibrate_xtalk().
+
+        Called directly rather than on the worker thread, where it would wait for the call it is cancelling.
+
+        """
+        self.sensor.cancel()
+
+    async def _run(self, func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def wait_data_ready(self):
+        """Wait until new data is ready.
+
+        With an interrupt the INT pin is watched by the event loop,
+        otherwise data_ready() is polled at a rate relative to the ranging frequency.
+
+        """
+        interrupt = self.sensor.interrupt
+        if interrupt is not None:
+            await self._wait_interrupt(interrupt)
+            return
+        period = 1.0 / await self.get_ranging_frequency_hz()
+        poll_interval = max(_STREAM_POLL_INTERVAL, period / 20)
+        while not await self.data_ready():
+            await asyncio.sleep(poll_interval)
+
+    async def frames(self):
+        """Start ranging and yield a VL53L5CX_ResultsData for each new frame.
+
+        Ranging is stopped when the iterator is closed or the consuming task is cancelled.
+
+        """
+        period = 1.0 / await self.get_ranging_frequency_hz()
+        await self.start_ranging()
+        try:
+            while True:
+                await self.wait_data_ready()
+                t_frame = time.monotonic()
+                yield await self.get_data()
+                if self.sensor.interrupt is not None:
+                    continue
+                # Skip polling for most of the next ranging period
+                delay = t_frame + period * 0.8 - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        finally:
+            await self.stop_ranging()
+
+    async def _wait_interrupt(self, interrupt):
+        loop = asyncio.get_running_loop()
+        while True:
+            ready = loop.create_future()
+
+            def on_readable():
+                if not ready.done():
+                    ready.set_result(None)
+
+            loop.add_reader(interrupt.fileno(), on_readable)
+            try:
+                await ready
+            finally:
+                loop.remove_reader(interrupt.fileno())
+            if interrupt.wait(0):
+                return
+
+
+def _async_method(name):
+    async def method(self, *args, **kwargs):
+        return await self._run(getattr(self.sensor, name), *args, **kwargs)
+
+    method.__name__ = name
+    method.__doc__ = getattr(VL53L5CX, name).__doc__
+    return method
+
+
+for _name in _ASYNC_METHODS:
+    setattr(AsyncVL53L5CX, _name, _async_method(_name))
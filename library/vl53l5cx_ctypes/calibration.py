@@ -0,0 +1,107 @@
+import os
+import struct
+import pathlib
+import tempfile
+from . import _VL53, XTALK_SIZE
+
+
+# Default cache directory, following the XDG base directory spec
+DEFAULT_CACHE_DIR = pathlib.Path(os.environ.get("XDG_CACHE_HOME", pathlib.Path.home() / ".cache")) / "vl53l5cx"
+
+# Cache file header: magic and the driver API revision the data was saved by
+_HEADER = struct.Struct("<4s16s")
+_MAGIC = b"VL5X"
+
+
+class XtalkCache:
+    """Crosstalk calibration data saved on disk, one file per sensor.
+
+    Sensors are keyed by their i2c bus and address, or by a serial (eg: a
+    label on the enclosure) where sensors may move between addresses. Files are
+    replaced atomically, so a crash mid-save leaves the old data intact.
+
+    """
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        """Initialise XtalkCache.
+
+        :param directory: Directory to keep calibration files in, created on first save.
+
+        """
+        self.directory = pathlib.Path(directory)
+
+    def path(self, sensor, serial=None):
+        """Get the cache file for a sensor.
+
+        :param sensor: VL53L5CX to key by i2c bus and address.
+        :param serial: Key by this instead of the i2c bus and address.
+
+        """
+        if serial is not None:
+            key = str(serial).replace(os.sep, "_")
+        elif sensor.i2c_bus is not None:
+            key = f"{sensor.i2c_bus}-0x{sensor.i2c_addr:02x}"
+        else:
+            key = f"0x{sensor.i2c_addr:02x}"
+        return self.directory / f"xtalk-{key}.bin"
+
+    def load(self, sensor, serial=None):
+        """Get the cached calibration data for a sensor.
+
+        Returns XTALK_SIZE bytes, or None if there is no usable cache for this sensor and driver revision.
+
+        """
+        try:
+            data = self.path(sensor, serial).read_bytes()
+        except OSError:
+            return None
+        if len(data) != _HEADER.size + XTALK_SIZE:
+            return None
+        magic, revision = _HEADER.unpack_from(data)
+        if magic != _MAGIC or revision.rstrip(b"\0") != _VL53.get_api_revision():
+            return None
+        return data[_HEADER.size:]
+
+    def save(self, sensor, data, serial=None):
+        """Save calibration data from VL53L5CX.get_xtalk_data() for a sensor."""
+        if len(data) != XTALK_SIZE:
+            raise ValueError(f"data must be {XTALK_SIZE} bytes")
+        path = self.path(sensor, serial)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=str(self.directory), prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(_HEADER.pack(_MAGIC, _VL53.get_api_revision()) + bytes(data))
+            os.replace(temp, str(path))
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    def remove(self, sensor, serial=None):
+        """Forget the cached calibration for a sensor, so the next apply() calibrates again."""
+        try:
+            self.path(sensor, serial).unlink()
+        except FileNotFoundError:
+            pass
+
+    def apply(self, sensor, serial=None, **calibration):
+        """Load a sensor's cached calibration, or calibrate it and cache the result.
+
+        Call after init(), with ranging stopped. The target must be in place
+        if there is no cache yet, see VL53L5CX.calibrate_xtalk().
+
+        :param sensor: Initialised VL53L5CX.
+        :param serial: Key by this instead of the i2c bus and address.
+        :param calibration: Arguments for VL53L5CX.calibrate_xtalk()
+
+        Returns True if the cached calibration was loaded, False if the sensor was calibrated.
+
+        """
+        data = self.load(sensor, serial)
+        if data is not None:
+            if not sensor.set_xtalk_data(data):
+                raise RuntimeError("Could not load crosstalk calibration.")
+            return True
+        if not sensor.calibrate_xtalk(**calibration):
+            raise RuntimeError("Crosstalk calibration failed!")
+        self.save(sensor, sensor.get_xtalk_data(), serial)
+        return False
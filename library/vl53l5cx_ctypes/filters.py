@@ -0,0 +1,215 @@
+import time
+import numpy
+from .processing import VALID_STATUSES, status_table
+
+
+class ZoneFilter:
+    """Base class for per-zone temporal filters of distance_mm.
+
+    Filters work on arrays of any shape, eg: (8, 8), (targets, 8, 8), or
+    several sensors stacked as (sensors, 8, 8), with the shape fixed by
+    the first update until reset(). State is allocated once, so memory
+    use is constant.
+
+    Readings are only used where the zone is valid: a finite distance
+    with a valid target status, and range_sigma_mm within max_sigma_mm.
+    Zones with no valid reading yet are NaN.
+
+    """
+    def __init__(self, valid=VALID_STATUSES, max_sigma_mm=None):
+        """Initialise ZoneFilter.
+
+        :param valid: Target statuses to treat as valid.
+        :param max_sigma_mm: Ignore readings with a range_sigma_mm above this (default: no limit)
+
+        """
+        self._table = status_table(valid)
+        self.max_sigma_mm = max_sigma_mm
+        self.shape = None
+        self.value = None
+
+    def reset(self):
+        """Forget all state, allowing a new shape."""
+        self.shape = None
+        self.value = None
+
+    def update(self, distance_mm, target_status=None, range_sigma_mm=None):
+        """Filter a new frame.
+
+        :param distance_mm: Array of distances, NaN where invalid (eg: from FrameProcessor)
+        :param target_status: Array of target statuses (default: use every finite distance)
+        :param range_sigma_mm: Array of range sigmas, to weight (or reject) noisy readings.
+
+        Returns the filtered distances, an array which is updated in place by the next update.
+
+        """
+        distance = numpy.asarray(distance_mm, dtype=numpy.float32)
+        if self.shape is None:
+            self.shape = distance.shape
+            self.value = numpy.full(self.shape, numpy.nan, dtype=numpy.float32)
+            self._start(self.shape)
+        elif distance.shape != self.shape:
+            raise ValueError(f"Expected shape {self.shape}, got {distance.shape}, use reset() to change it")
+
+        valid = numpy.isfinite(distance)
+        if target_status is not None:
+            valid &= self._table.take(target_status)
+        if range_sigma_mm is not None:
+            range_sigma_mm = numpy.asarray(range_sigma_mm, dtype=numpy.float32)
+            if self.max_sigma_mm is not None:
+                valid &= range_sigma_mm <= self.max_sigma_mm
+
+        self._update(distance, valid, range_sigma_mm)
+        return self.value
+
+    def update_frame(self, frame):
+        """Filter a Frame, using its distance_mm, target_status and range_sigma_mm (if available)."""
+        return self.update(frame.distance_mm, getattr(frame, "target_status", None), getattr(frame, "range_sigma_mm", None))
+
+    def _start(self, shape):
+        pass
+
+    def _update(self, distance, valid, sigma):
+        raise NotImplementedError
+
+
+class EMAFilter(ZoneFilter):
+    """Exponential moving average per zone."""
+    def __init__(self, alpha=0.3, sigma_mm=None, **kwargs):
+        """Initialise EMAFilter.
+
+        :param alpha: Weight of each new reading, from 0 to 1.
+        :param sigma_mm: Readings with a range_sigma_mm above this are weighted down by (sigma_mm / range_sigma_mm)²,
+            or None to ignore range_sigma_mm.
+
+        Also accepts the ZoneFilter arguments.
+
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be > 0 and <= 1")
+        ZoneFilter.__init__(self, **kwargs)
+        self.alpha = alpha
+        self.sigma_mm = sigma_mm
+
+    def _update(self, distance, valid, sigma):
+        alpha = self.alpha
+        if self.sigma_mm is not None and sigma is not None:
+            alpha = alpha * numpy.minimum(1.0, (self.sigma_mm / numpy.maximum(sigma, 1e-3)) ** 2)
+
+        first = valid & numpy.isnan(self.value)
+        # Invalid zones get a zero step, zones with no value yet take the reading as is
+        self.value += alpha * (numpy.where(valid, distance, self.value) - self.value)
+        self.value[first] = distance[first]
+
+
+class MedianFilter(ZoneFilter):
+    """Median per zone over a sliding window of frames."""
+    def __init__(self, window=5, **kwargs):
+        """Initialise MedianFilter.
+
+        :param window: Number of frames to take the median of.
+
+        Also accepts the ZoneFilter arguments.
+
+        """
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        ZoneFilter.__init__(self, **kwargs)
+        self.window = window
+
+    def _start(self, shape):
+        self._history = numpy.full((self.window,) + shape, numpy.nan, dtype=numpy.float32)
+        self._index = 0
+
+    def _update(self, distance, valid, sigma):
+        self._history[self._index] = numpy.where(valid, distance, numpy.nan)
+        self._index = (self._index + 1) % self.window
+
+        # Sorting puts NaN last, so the median of the n valid readings is around index n / 2
+        ordered = numpy.sort(self._history, axis=0)
+        count = numpy.count_nonzero(~numpy.isnan(self._history), axis=0)
+        lower = numpy.take_along_axis(ordered, numpy.maximum(count - 1, 0)[numpy.newaxis] // 2, axis=0)[0]
+        upper = numpy.take_along_axis(ordered, (count // 2)[numpy.newaxis], axis=0)[0]
+        numpy.multiply(lower + upper, 0.5, out=self.value)
+        self.value[count == 0] = numpy.nan
+
+
+class KalmanFilter(ZoneFilter):
+    """Constant velocity Kalman filter per zone.
+
+    Readings are weighted by their range_sigma_mm, so noisy zones move
+    the estimate less. Also tracks each zone's velocity in mm/s.
+
+    """
+    def __init__(self, acceleration_mm=2000.0, sigma_mm=20.0, dt=None, **kwargs):
+        """Initialise KalmanFilter.
+
+        :param acceleration_mm: Expected acceleration (standard deviation, mm/s²) of targets, larger follows changes faster.
+        :param sigma_mm: Measurement noise used when range_sigma_mm isn't given.
+        :param dt: Time between frames in seconds (default: measure it between updates)
+
+        Also accepts the ZoneFilter arguments.
+
+        """
+        ZoneFilter.__init__(self, **kwargs)
+        self.acceleration_mm = acceleration_mm
+        self.sigma_mm = sigma_mm
+        self.dt = dt
+        self.velocity = None
+        self._t_last = None
+        self._dt = 0
+
+    def reset(self):
+        ZoneFilter.reset(self)
+        self.velocity = None
+
+    def update(self, distance_mm, target_status=None, range_sigma_mm=None, dt=None):
+        """Filter a new frame, see ZoneFilter.update()
+
+        :param dt: Time since the last frame in seconds, eg: when replaying faster than real time.
+
+        """
+        now = time.monotonic()
+        if dt is None:
+            dt = self.dt if self.dt is not None else now - (self._t_last or now)
+        self._t_last = now
+        self._dt = dt
+        return ZoneFilter.update(self, distance_mm, target_status, range_sigma_mm)
+
+    def _start(self, shape):
+        self.velocity = numpy.zeros(shape, dtype=numpy.float32)
+        # Covariance of [position, velocity], only the upper triangle is kept
+        self._p00 = numpy.zeros(shape, dtype=numpy.float32)
+        self._p01 = numpy.zeros(shape, dtype=numpy.float32)
+        self._p11 = numpy.zeros(shape, dtype=numpy.float32)
+
+    def _update(self, distance, valid, sigma):
+        dt = self._dt
+        q = self.acceleration_mm ** 2
+        r = (sigma if sigma is not None else numpy.float32(self.sigma_mm)) ** 2
+
+        # Predict
+        self.value += self.velocity * dt
+        self._p00 += dt * (2 * self._p01 + dt * self._p11) + q * dt ** 4 / 4
+        self._p01 += dt * self._p11 + q * dt ** 3 / 2
+        self._p11 += q * dt ** 2
+
+        # Correct, leaving zones without a reading at their prediction
+        innovation = numpy.where(valid, distance - self.value, 0)
+        gain = numpy.where(valid, 1.0 / (self._p00 + r), 0)
+        k0 = self._p00 * gain
+        k1 = self._p01 * gain
+        self.value += k0 * innovation
+        self.velocity += k1 * innovation
+        self._p11 -= k1 * self._p01
+        self._p01 -= k0 * self._p01
+        self._p00 -= k0 * self._p00
+
+        # Zones seen for the first time start at the reading, stationary
+        first = valid & numpy.isnan(self.value)
+        if first.any():
+            self.value[first] = distance[first]
+            self.velocity[first] = 0
+            self._p00[first] = numpy.broadcast_to(r, self.shape)[first]
+            self._p01[first] = 0
+            self._p11[first] = q
@@ -0,0 +1,62 @@
+import numpy
+from . import RESULTS_FIELDS, NB_TARGET_PER_ZONE
+
+
+# Fields with one value per zone, in VL53L5CX_ResultsData order
+ZONE_FIELDS = (
+    "ambient_per_spad",
+    "nb_target_detected",
+    "nb_spads_enabled"
+)
+
+# Fields with NB_TARGET_PER_ZONE values per zone, in VL53L5CX_ResultsData order
+TARGET_FIELDS = (
+    "signal_per_spad",
+    "range_sigma_mm",
+    "distance_mm",
+    "reflectance",
+    "target_status"
+)
+
+
+class Frame:
+    """Zero-copy NumPy views over a VL53L5CX_ResultsData.
+
+    The views are created once and share memory with `results`,
+    so reading new data into `results` updates them in place.
+
+    Per-zone fields are shaped (rows, cols) and per-target fields
+    (targets, rows, cols), so eg: distance_mm[0] is the first target.
+
+    """
+    def __init__(self, results, resolution):
+        """Initialise Frame.
+
+        :param results: VL53L5CX_ResultsData to view.
+        :param resolution: Either 4*4 or 8*8, determines the view shape.
+
+        """
+        self.results = results
+        self.resolution = resolution
+        size = int(resolution ** 0.5)
+        self.shape = (size, size)
+        self.targets = NB_TARGET_PER_ZONE
+
+        # Outputs compiled out of the library (see setup.py profiles) are omitted
+        self.fields = tuple(name for name in ZONE_FIELDS + TARGET_FIELDS if name in RESULTS_FIELDS)
+        for name in self.fields:
+            view = numpy.ctypeslib.as_array(getattr(results, name))
+            if name in TARGET_FIELDS:
+                # The driver stores targets zone by zone, transposing gives a strided view per target
+                view = view.reshape(-1, self.targets)[:resolution].T.reshape((self.targets,) + self.shape)
+            else:
+                view = view[:resolution].reshape(self.shape)
+            setattr(self, name, view)
+
+        self.motion = None
+        if "motion_indicator" in RESULTS_FIELDS:
+            self.motion = numpy.ctypeslib.as_array(results.motion_indicator.motion)
+
+    @property
+    def silicon_temp_degc(self):
+        return getattr(self.results, "silicon_temp_degc", None)
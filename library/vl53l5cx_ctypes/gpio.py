@@ -0,0 +1,116 @@
+import os
+import fcntl
+import struct
+import select
+
+
+# Linux GPIO character device line event ABI, see linux/gpio.h
+_GPIO_GET_LINEEVENT_IOCTL = 0xc030b404
+_GPIOHANDLE_REQUEST_INPUT = 1 << 0
+_GPIOHANDLE_REQUEST_BIAS_PULL_UP = 1 << 5
+_GPIOEVENT_REQUEST_FALLING_EDGE = 1 << 1
+
+# struct gpioevent_request: lineoffset, handleflags, eventflags, consumer_label, fd
+_EVENT_REQUEST = struct.Struct("<III32si")
+
+# struct gpioevent_data: timestamp (ns), id
+_EVENT_DATA = struct.Struct("<QI4x")
+
+
+class _EdgeEvents:
+    """Edge events read from a non-blocking file descriptor."""
+    def __init__(self, fd):
+        self._fd = fd
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self.events = 0
+        self.timestamp = None
+
+    def fileno(self):
+        return self._fd
+
+    def wait(self, timeout=None):
+        """Wait for an edge, consuming any which are pending.
+
+        :param timeout: Timeout in seconds, 0 to check without blocking, or None to wait forever.
+
+        Returns True if there was at least one edge.
+
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        return bool(readable) and self.clear() > 0
+
+    def clear(self):
+        """Discard pending edges, returning how many there were."""
+        count = 0
+        while True:
+            try:
+                data = os.read(self._fd, _EVENT_DATA.size * 16)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            for offset in range(0, len(data) - _EVENT_DATA.size + 1, _EVENT_DATA.size):
+                self.timestamp, _ = _EVENT_DATA.unpack_from(data, offset)
+                count += 1
+        self.events += count
+        return count
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class GPIOInterrupt(_EdgeEvents):
+    """The VL53L5CX INT pin, watched through the Linux GPIO character device.
+
+    The sensor pulls INT low when a new frame is ready, so waiting on
+    it replaces polling data_ready() over i2c.
+
+    """
+    def __init__(self, line, chip=0, pull_up=False, consumer="vl53l5cx"):
+        """Initialise GPIOInterrupt.
+
+        :param line: Line offset of the INT pin on the chip, eg: the BCM pin number on a Raspberry Pi.
+        :param chip: GPIO chip number (for /dev/gpiochipN) or device path.
+        :param pull_up: Enable the internal pull-up, if the INT pin has no external one.
+        :param consumer: Label shown for the line by gpioinfo.
+
+        """
+        path = chip if isinstance(chip, str) else f"/dev/gpiochip{chip}"
+        flags = _GPIOHANDLE_REQUEST_INPUT | (_GPIOHANDLE_REQUEST_BIAS_PULL_UP if pull_up else 0)
+        request = bytearray(_EVENT_REQUEST.pack(line, flags, _GPIOEVENT_REQUEST_FALLING_EDGE, consumer.encode()[:31], 0))
+
+        chip_fd = os.open(path, os.O_RDONLY)
+        try:
+            fcntl.ioctl(chip_fd, _GPIO_GET_LINEEVENT_IOCTL, request)
+        finally:
+            os.close(chip_fd)
+
+        _EdgeEvents.__init__(self, _EVENT_REQUEST.unpack(request)[4])
+
+
+class FakeGPIOInterrupt(_EdgeEvents):
+    """Stand-in for GPIOInterrupt, with edges raised by calling trigger().
+
+    Pass to SimulatedVL53L5CX to have it trigger an edge as each frame
+    becomes ready.
+
+    """
+    def __init__(self):
+        read_fd, self._write_fd = os.pipe()
+        _EdgeEvents.__init__(self, read_fd)
+
+    def trigger(self, timestamp=0):
+        """Raise an edge.
+
+        :param timestamp: Event timestamp in nanoseconds.
+
+        """
+        os.write(self._write_fd, _EVENT_DATA.pack(timestamp, 0))
+
+    def close(self):
+        _EdgeEvents.close(self)
+        if self._write_fd is not None:
+            os.close(self._write_fd)
+            self._write_fd = None
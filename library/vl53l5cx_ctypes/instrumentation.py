@@ -0,0 +1,276 @@
+import time
+import bisect
+import threading
+from . import _VL53
+
+
+# Public VL53L5CX methods which call the driver, timed when instrumentation is enabled and run as coroutines by aio
+INSTRUMENTED_METHODS = (
+    "init",
+    "is_alive",
+    "start_ranging",
+    "stop_ranging",
+    "set_i2c_address",
+    "enable_motion_indicator",
+    "set_motion_distance",
+    "set_motion_resolution",
+    "set_detection_thresholds",
+    "get_detection_thresholds",
+    "set_detection_thresholds_enable",
+    "get_detection_thresholds_enable",
+    "calibrate_xtalk",
+    "get_xtalk_data",
+    "set_xtalk_data",
+    "set_xtalk_margin",
+    "get_xtalk_margin",
+    "set_ranging_mode",
+    "get_ranging_mode",
+    "set_ranging_frequency_hz",
+    "get_ranging_frequency_hz",
+    "set_resolution",
+    "get_resolution",
+    "set_integration_time_ms",
+    "get_integration_time_ms",
+    "set_sharpener_percent",
+    "get_sharpener_percent",
+    "set_target_order",
+    "get_target_order",
+    "set_power_mode",
+    "get_settings",
+    "apply_config",
+    "save_state",
+    "restore_state",
+    "data_ready",
+    "wait_data_ready",
+    "get_data",
+    "get_frame"
+)
+
+# Upper bounds (seconds) of the call duration histogram buckets
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Platform counters recorded per call
+_COUNTERS = ("i2c_reads", "i2c_writes", "bytes_read", "bytes_written", "i2c_ns", "sleeps", "sleep_ms", "sleep_ns")
+
+
+class MethodStats:
+    """Accumulated counters for one instrumented method."""
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.streaming_calls = 0
+        self.time = 0.0
+        self.i2c_reads = 0
+        self.i2c_writes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.i2c_time = 0.0
+        self.sleeps = 0
+        self.sleep_time = 0.0
+        self.sleep_actual_time = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, sample):
+        self.calls += 1
+        self.errors += sample["error"]
+        self.streaming_calls += sample["streaming"]
+        self.time += sample["time"]
+        self.i2c_reads += sample["i2c_reads"]
+        self.i2c_writes += sample["i2c_writes"]
+        self.bytes_read += sample["bytes_read"]
+        self.bytes_written += sample["bytes_written"]
+        self.i2c_time += sample["i2c_time"]
+        self.sleeps += sample["sleeps"]
+        self.sleep_time += sample["sleep_time"]
+        self.sleep_actual_time += sample["sleep_actual_time"]
+        self.buckets[bisect.bisect_left(BUCKETS, sample["time"])] += 1
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "streaming_calls": self.streaming_calls,
+            "time": self.time,
+            "i2c_reads": self.i2c_reads,
+            "i2c_writes": self.i2c_writes,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "i2c_time": self.i2c_time,
+            "sleeps": self.sleeps,
+            "sleep_time": self.sleep_time,
+            "sleep_actual_time": self.sleep_actual_time,
+            # Time not spent in i2c or sleeping, ie: Python and driver processing
+            "other_time": max(0.0, self.time - self.i2c_time - self.sleep_actual_time),
+            "histogram": dict(zip(BUCKETS + (float("inf"),), self.buckets))
+        }
+
+
+class Instrumentation:
+    """Per-method i2c, sleep and timing statistics for a VL53L5CX.
+
+    Created by VL53L5CX.enable_instrumentation(). Only the outermost
+    instrumented call is recorded, eg: get_frame() includes the i2c
+    traffic of the get_data() it makes.
+
+    The platform counters are shared by every thread using the sensor,
+    so while streaming a call's i2c and sleep counters can't be told
+    apart from the streaming thread's. Calls made while streaming are
+    timed, but only counted towards totals()
+
+    """
+    def __init__(self, sensor):
+        """Initialise Instrumentation and attach it to a sensor.
+
+        :param sensor: VL53L5CX to instrument.
+
+        """
+        self.sensor = sensor
+        self.methods = {}
+        self._listeners = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        _VL53.set_platform_stats_enabled(sensor._configuration, 1)
+        self._baseline = self._counters()
+        for name in INSTRUMENTED_METHODS:
+            setattr(sensor, name, self._wrap(name, getattr(sensor, name)))
+
+    def detach(self):
+        """Stop counting and restore the sensor's uninstrumented methods."""
+        for name in INSTRUMENTED_METHODS:
+            self.sensor.__dict__.pop(name, None)
+        _VL53.set_platform_stats_enabled(self.sensor._configuration, 0)
+
+    def add_listener(self, listener):
+        """Call listener(method, sample) after every instrumented call, eg: to export metrics.
+
+        :param listener: Function taking the method name and a dict of counters for the call.
+
+        """
+        self._listeners.append(listener)
+
+    def reset(self):
+        """Clear all accumulated statistics."""
+        with self._lock:
+            self.methods = {}
+            self._baseline = self._counters()
+
+    def totals(self):
+        """Get the i2c and sleep counters of all traffic since instrumentation was enabled or reset, including streaming."""
+        with self._lock:
+            deltas = [b - a for a, b in zip(self._baseline, self._counters())]
+        return self._platform(deltas)
+
+    def summary(self):
+        """Get a dict of method name to accumulated statistics."""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self.methods.items()}
+
+    def prometheus(self, prefix="vl53l5cx", labels=None):
+        """Format the statistics in the Prometheus text exposition format.
+
+        :param prefix: Metric name prefix.
+        :param labels: Dict of extra labels to add to every metric, eg: {"sensor": "front"}
+
+        """
+        labels = labels or {}
+
+        def label(**extra):
+            items = dict(labels, **extra)
+            return "{" + ",".join('{}="{}"'.format(key, value) for key, value in items.items()) + "}"
+
+        summary = self.summary()
+        lines = [
+            "# HELP {}_call_duration_seconds Time spent in VL53L5CX methods.".format(prefix),
+            "# TYPE {}_call_duration_seconds histogram".format(prefix)
+        ]
+        for method, stats in summary.items():
+            total = 0
+            for bound, count in stats["histogram"].items():
+                total += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append("{}_call_duration_seconds_bucket{} {}".format(prefix, label(method=method, le=le), total))
+            lines.append("{}_call_duration_seconds_sum{} {}".format(prefix, label(method=method), stats["time"]))
+            lines.append("{}_call_duration_seconds_count{} {}".format(prefix, label(method=method), stats["calls"]))
+
+        counters = (
+            ("call_errors_total", "Calls which raised an exception.", lambda s: [({}, s["errors"])]),
+            ("i2c_transactions_total", "i2c transactions.", lambda s: [
+                ({"direction": "read"}, s["i2c_reads"]), ({"direction": "write"}, s["i2c_writes"])]),
+            ("i2c_bytes_total", "i2c bytes transferred.", lambda s: [
+                ({"direction": "read"}, s["bytes_read"]), ({"direction": "write"}, s["bytes_written"])]),
+            ("i2c_seconds_total", "Time spent in i2c transfers.", lambda s: [({}, s["i2c_time"])]),
+            ("driver_sleep_seconds_total", "Sleep time requested by the driver.", lambda s: [({}, s["sleep_time"])]),
+            ("driver_sleep_actual_seconds_total", "Time spent in driver sleeps.", lambda s: [({}, s["sleep_actual_time"])])
+        )
+        for name, help_text, values in counters:
+            lines.append("# HELP {}_{} {}".format(prefix, name, help_text))
+            lines.append("# TYPE {}_{} counter".format(prefix, name))
+            for method, stats in summary.items():
+                for extra, value in values(stats):
+                    lines.append("{}_{}{} {}".format(prefix, name, label(method=method, **extra), value))
+
+        return "\n".join(lines) + "\n"
+
+    def _counters(self):
+        stats = self.sensor.get_platform_stats()
+        return [getattr(stats, name) for name in _COUNTERS]
+
+    def _wrap(self, name, method):
+        local = self._local
+
+        def wrapper(*args, **kwargs):
+            # Nested calls are included in the outermost call
+            if getattr(local, "depth", 0):
+                return method(*args, **kwargs)
+
+            local.depth = 1
+            error = False
+            streaming = self.sensor._stream_thread is not None
+            before = self._counters()
+            t_start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - t_start
+                after = self._counters()
+                local.depth = 0
+                streaming = streaming or self.sensor._stream_thread is not None
+                # The streaming thread's traffic would be counted against this call
+                deltas = [0] * len(_COUNTERS) if streaming else [b - a for a, b in zip(before, after)]
+                self._record(name, elapsed, error, streaming, deltas)
+
+        wrapper.__name__ = name
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    @staticmethod
+    def _platform(deltas):
+        i2c_reads, i2c_writes, bytes_read, bytes_written, i2c_ns, sleeps, sleep_ms, sleep_ns = deltas
+        return {
+            "i2c_reads": i2c_reads,
+            "i2c_writes": i2c_writes,
+            "bytes_read": bytes_read,
+            "bytes_written": bytes_written,
+            "i2c_time": i2c_ns / 1e9,
+            "sleeps": sleeps,
+            "sleep_time": sleep_ms / 1000.0,
+            "sleep_actual_time": sleep_ns / 1e9
+        }
+
+    def _record(self, name, elapsed, error, streaming, deltas):
+        sample = {
+            "time": elapsed,
+            "error": int(error),
+            "streaming": int(streaming)
+        }
+        sample.update(self._platform(deltas))
+        with self._lock:
+            if name not in self.methods:
+                self.methods[name] = MethodStats()
+            self.methods[name].add(sample)
+        for listener in self._listeners:
+            listener(name, sample)
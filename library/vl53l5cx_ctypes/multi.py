@@ -0,0 +1,173 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from smbus2 import SMBus
+from . import VL53L5CX, _STREAM_POLL_INTERVAL
+
+
+class VL53L5CXArray:
+    """Several VL53L5CX sensors spread over one or more i2c buses.
+
+    Each bus has its own worker thread, so sensors on different buses are
+    initialised and read in parallel while access to any one bus is
+    serialised. Sensors on a bus are visited in an order which rotates on
+    every call, so none is consistently serviced last.
+
+    Sensors must already have unique addresses on their bus, see
+    examples/change_i2c_address.py.
+
+    """
+    def __init__(self, sensors, native_i2c=False, skip_init=False, i2c_devs=None, sensor_factory=None):
+        """Initialise VL53L5CXArray.
+
+        :param sensors: List of (bus, address) pairs, eg: [(1, 0x29), (1, 0x30), (3, 0x29)]
+        :param native_i2c: Open each bus natively from C (see VL53L5CX i2c_bus) rather than through smbus2.
+        :param skip_init: Skip (slow) sensor init (if they have not been power cycled).
+        :param i2c_devs: Dict of bus to i2c device to use instead of SMBus(bus), eg: a simulator.SimulatedBus
+        :param sensor_factory: Function taking (bus, address) and returning a sensor to use instead of VL53L5CX,
+            eg: a recording.ReplayVL53L5CX
+
+        """
+        self.addresses = list(sensors)
+        self.sensors = [None] * len(self.addresses)
+        self._buses = {}
+        for index, (bus, _) in enumerate(self.addresses):
+            self._buses.setdefault(bus, []).append(index)
+        self._executors = {bus: ThreadPoolExecutor(max_workers=1) for bus in self._buses}
+        self._rotation = {bus: 0 for bus in self._buses}
+        self._i2c = {}
+        self._opened = []
+        self._frame_sets = 0
+        self._frames = 0
+        self._skew_total = 0.0
+        self._skew_max = 0.0
+        self._t_start = None
+
+        def _init_bus(bus):
+            if sensor_factory is not None:
+                for index in self._buses[bus]:
+                    self.sensors[index] = sensor_factory(bus, self.addresses[index][1])
+                return
+            if i2c_devs and bus in i2c_devs:
+                self._i2c[bus] = i2c_devs[bus]
+            elif not native_i2c:
+                self._i2c[bus] = SMBus(bus)
+                self._opened.append(self._i2c[bus])
+            for index in self._buses[bus]:
+                address = self.addresses[index][1]
+                if bus not in self._i2c:
+                    self.sensors[index] = VL53L5CX(address, skip_init=skip_init, i2c_bus=bus)
+                else:
+                    self.sensors[index] = VL53L5CX(address, i2c_dev=self._i2c[bus], skip_init=skip_init)
+                    # i2c_devs may not be /dev/i2c-N devices, keep their sensors apart (eg: in an XtalkCache)
+                    self.sensors[index].i2c_bus = bus
+
+        t_start = time.monotonic()
+        try:
+            self._map_buses(_init_bus)
+        except BaseException:
+            # Don't leak the worker threads, or the buses opened for sensors which did initialise
+            self.close()
+            raise
+        self.init_time = time.monotonic() - t_start
+
+    def close(self):
+        """Shut down the per-bus worker threads and close the buses opened for the sensors."""
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        # Native buses are closed as each sensor is freed
+        self.sensors = [None] * len(self.addresses)
+        for i2c in self._opened:
+            i2c.close()
+        self._opened = []
+
+    def _map_buses(self, func):
+        # Run func(bus) on every bus worker at once, re-raising the first error once all have finished
+        futures = [self._executors[bus].submit(func, bus) for bus in self._buses]
+        wait(futures)
+        return [future.result() for future in futures]
+
+    def _bus_order(self, bus):
+        # Rotate the service order for this bus on every call
+        indexes = self._buses[bus]
+        start = self._rotation[bus]
+        self._rotation[bus] = (start + 1) % len(indexes)
+        return indexes[start:] + indexes[:start]
+
+    def call(self, method, *args):
+        """Call a VL53L5CX method on every sensor, buses in parallel.
+
+        :param method: Method name, eg: "set_resolution"
+
+        Returns a list of results in sensor order.
+
+        """
+        results = [None] * len(self.sensors)
+
+        def _call_bus(bus):
+            for index in self._bus_order(bus):
+                results[index] = getattr(self.sensors[index], method)(*args)
+
+        self._map_buses(_call_bus)
+        return results
+
+    def start_ranging(self):
+        """Start ranging on all sensors, as close together as the buses allow."""
+        self.call("start_ranging")
+        self._t_start = time.monotonic()
+
+    def stop_ranging(self):
+        """Stop ranging on all sensors."""
+        self.call("stop_ranging")
+
+    def get_frames(self, timeout=1.0):
+        """Wait for and read the next frame from every sensor.
+
+        :param timeout: Timeout in seconds for each bus to collect its frames.
+
+        Returns a list, in sensor order, of (timestamp, VL53L5CX_ResultsData) tuples,
+        or None for sensors which did not produce a frame before the timeout.
+
+        """
+        frames = [None] * len(self.sensors)
+
+        def _read_bus(bus):
+            pending = self._bus_order(bus)
+            t_timeout = time.monotonic() + timeout
+            while pending and time.monotonic() < t_timeout:
+                for index in list(pending):
+                    sensor = self.sensors[index]
+                    if sensor.data_ready():
+                        data = sensor.get_data()
+                        frames[index] = (time.monotonic(), data)
+                        pending.remove(index)
+                if pending:
+                    time.sleep(_STREAM_POLL_INTERVAL)
+
+        self._map_buses(_read_bus)
+
+        timestamps = [frame[0] for frame in frames if frame is not None]
+        if timestamps:
+            skew = max(timestamps) - min(timestamps)
+            self._frame_sets += 1
+            self._frames += len(timestamps)
+            self._skew_total += skew
+            self._skew_max = max(self._skew_max, skew)
+        return frames
+
+    def stats(self):
+        """Get aggregate throughput and frame skew statistics.
+
+        * init_time - seconds taken to construct and initialise all sensors
+        * frame_sets - number of get_frames() calls which returned data
+        * frames_per_second - frames read from all sensors since start_ranging()
+        * skew_mean_ms / skew_max_ms - spread of read times within a frame set
+
+        """
+        elapsed = time.monotonic() - self._t_start if self._t_start else 0
+        return {
+            "init_time": self.init_time,
+            "frame_sets": self._frame_sets,
+            "frames_per_second": self._frames / elapsed if elapsed else 0.0,
+            "skew_mean_ms": self._skew_total / self._frame_sets * 1000 if self._frame_sets else 0.0,
+            "skew_max_ms": self._skew_max * 1000
+        }
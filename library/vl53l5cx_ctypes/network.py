@@ -0,0 +1,434 @@
+import time
+import errno
+import socket
+import struct
+import asyncio
+import ipaddress
+import numpy
+from .frame import Frame, TARGET_FIELDS
+
+
+# Port used by FrameServer and FrameClient when none is given
+DEFAULT_PORT = 5553
+
+# Fields which can be sent, with their wire type. Each has a fixed bit in the
+# message field mask, by position, so never reorder or remove entries.
+FIELDS = (
+    ("ambient_per_spad", "<u4"),
+    ("nb_target_detected", "u1"),
+    ("nb_spads_enabled", "<u4"),
+    ("signal_per_spad", "<u4"),
+    ("range_sigma_mm", "<u2"),
+    ("distance_mm", "<i2"),
+    ("reflectance", "u1"),
+    ("target_status", "u1")
+)
+
+# Message header: magic, format version, flags, resolution, targets per zone, field mask,
+# sequence number and timestamp. Followed by each field in mask order, either as a full
+# little-endian array or, in delta frames, a bitmap of changed elements and their new values.
+_HEADER = struct.Struct("<4sBBBBHId")
+_MAGIC = b"VL5F"
+_VERSION = 1
+_FLAG_DELTA = 0x01
+
+# TCP messages are prefixed with their length
+_LENGTH = struct.Struct("<I")
+
+# Send a full frame at least this often, so UDP receivers recover from lost packets
+_KEYFRAME_INTERVAL = 30
+
+# Frames are skipped for TCP clients with more than this many bytes waiting to be sent
+_MAX_WRITE_BUFFER = 65536
+
+_FIELD_INDEX = {name: index for index, (name, _) in enumerate(FIELDS)}
+
+
+def _field_shape(name, resolution, targets):
+    size = int(resolution ** 0.5)
+    return (targets, size, size) if name in TARGET_FIELDS else (size, size)
+
+
+class NetworkFrame:
+    """A decoded frame, with a NumPy array for each field received.
+
+    Arrays are shaped as Frame, ie: (rows, cols) per zone or (targets,
+    rows, cols) per target, and are updated in place by the next frame.
+
+    """
+    def __init__(self, resolution, targets, fields):
+        self.resolution = resolution
+        self.targets = targets
+        self.fields = fields
+        self.sequence = 0
+        self.timestamp = 0.0
+        for name in fields:
+            setattr(self, name, numpy.zeros(_field_shape(name, resolution, targets), dtype=dict(FIELDS)[name]))
+
+
+class FrameEncoder:
+    """Encode frames in the compact binary wire format.
+
+    Only the selected fields are sent. With delta encoding, fields are
+    sent as a bitmap of the elements that changed since the previous
+    frame plus their new values, with a full keyframe every so often.
+
+    """
+    def __init__(self, fields=None, delta=False, keyframe_interval=_KEYFRAME_INTERVAL):
+        """Initialise FrameEncoder.
+
+        :param fields: Names of the fields to send, eg: ("distance_mm", "target_status") (default: all available)
+        :param delta: Send the changes from the previous frame instead of full frames.
+        :param keyframe_interval: With delta, send a full frame at least every this many frames.
+
+        """
+        if fields is not None:
+            unknown = set(fields) - set(_FIELD_INDEX)
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        self.fields = fields
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self.sequence = 0
+        self.keyframe = None
+        self._previous = None
+        self._since_keyframe = 0
+
+    def encode(self, frame, timestamp=None, keyframe=False):
+        """Encode a Frame.
+
+        :param frame: Frame, eg: from VL53L5CX.get_frame()
+        :param timestamp: Time of the frame (default: now, from time.time())
+        :param keyframe: Send a full frame even with delta encoding.
+
+        Returns the message. With delta encoding, the full message for the same frame
+        is kept in `keyframe`, for receivers which missed the previous frame.
+
+        """
+        names = [name for name, _ in FIELDS if (self.fields is None or name in self.fields) and name in frame.fields]
+        # Always copy, the frame's views change under us and delta encoding keeps the previous arrays
+        arrays = [numpy.array(getattr(frame, name), dtype=dict(FIELDS)[name], order="C") for name in names]
+        mask = sum(1 << _FIELD_INDEX[name] for name in names)
+        timestamp = time.time() if timestamp is None else timestamp
+        self.sequence = (self.sequence + 1) & 0xffffffff
+
+        def header(flags):
+            return _HEADER.pack(_MAGIC, _VERSION, flags, frame.resolution, frame.targets, mask, self.sequence, timestamp)
+
+        self.keyframe = header(0) + b"".join(array.tobytes() for array in arrays)
+        if not self.delta:
+            return self.keyframe
+
+        previous, self._previous = self._previous, (frame.resolution, mask, arrays)
+        self._since_keyframe += 1
+        if keyframe or previous is None or previous[:2] != (frame.resolution, mask) or self._since_keyframe >= self.keyframe_interval:
+            self._since_keyframe = 0
+            return self.keyframe
+
+        parts = [header(_FLAG_DELTA)]
+        for array, old in zip(arrays, previous[2]):
+            changed = (array != old).ravel()
+            parts.append(numpy.packbits(changed).tobytes())
+            parts.append(array.ravel()[changed].tobytes())
+        return b"".join(parts)
+
+
+class FrameDecoder:
+    """Decode messages from a FrameEncoder into a NetworkFrame.
+
+    Delta frames are applied to the previous frame, so one decoder must
+    see every message of a stream, in order.
+
+    """
+    def __init__(self):
+        self.frame = None
+        self.dropped = 0
+        self._sequence = None
+        self._synced = False
+
+    def decode(self, message):
+        """Decode a message.
+
+        Returns the NetworkFrame, or None for a delta frame that cannot be applied
+        because the frame before it was lost. Raises ValueError for a bad message.
+
+        """
+        if len(message) < _HEADER.size:
+            raise ValueError("Message is too short.")
+        magic, version, flags, resolution, targets, mask, sequence, timestamp = _HEADER.unpack_from(message)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a VL53L5CX frame message.")
+
+        contiguous = self._sequence is not None and sequence == (self._sequence + 1) & 0xffffffff
+        if self._sequence is not None and not contiguous:
+            self.dropped += (sequence - self._sequence - 1) & 0xffffffff
+        self._sequence = sequence
+
+        fields = tuple(name for index, (name, _) in enumerate(FIELDS) if mask & (1 << index))
+        frame = self.frame
+        delta = flags & _FLAG_DELTA
+        if delta:
+            # Deltas only apply on top of the previous frame, otherwise wait for the next keyframe
+            self._synced = self._synced and contiguous and (frame.resolution, frame.targets, frame.fields) == (resolution, targets, fields)
+            if not self._synced:
+                return None
+        elif frame is None or (frame.resolution, frame.targets, frame.fields) != (resolution, targets, fields):
+            frame = self.frame = NetworkFrame(resolution, targets, fields)
+
+        offset = _HEADER.size
+        try:
+            for name in fields:
+                array = getattr(frame, name).reshape(-1)
+                if delta:
+                    bitmap = numpy.frombuffer(message, numpy.uint8, (array.size + 7) // 8, offset)
+                    offset += bitmap.size
+                    changed = numpy.unpackbits(bitmap, count=array.size).view(bool)
+                    count = int(numpy.count_nonzero(changed))
+                    array[changed] = numpy.frombuffer(message, array.dtype, count, offset)
+                    offset += count * array.itemsize
+                else:
+                    array[:] = numpy.frombuffer(message, array.dtype, array.size, offset)
+                    offset += array.nbytes
+        except ValueError:
+            self._synced = False
+            raise ValueError("Message is truncated.")
+
+        self._synced = True
+        frame.sequence = sequence
+        frame.timestamp = timestamp
+        return frame
+
+
+class _Stats:
+    def _reset_stats(self):
+        self.frames = 0
+        self.bytes = 0
+        self._t_start = None
+
+    def _count(self, size):
+        if self._t_start is None:
+            self._t_start = time.monotonic()
+        self.frames += 1
+        self.bytes += size
+
+    def stats(self):
+        """Get frames sent/received, frames per second and mean bytes per frame."""
+        elapsed = time.monotonic() - self._t_start if self._t_start is not None else 0
+        return {
+            "frames": self.frames,
+            "fps": (self.frames - 1) / elapsed if elapsed > 0 else 0.0,
+            "bytes_per_frame": self.bytes / self.frames if self.frames else 0.0
+        }
+
+
+class FrameServer(_Stats):
+    """Stream frames to FrameClients over TCP and/or UDP (unicast or multicast).
+
+    TCP clients each get a keyframe when they connect and whenever they
+    fall behind, frames are skipped for slow clients rather than queued.
+
+    """
+    def __init__(self, sensor=None, host="0.0.0.0", port=DEFAULT_PORT, udp=None, ttl=1, **encoding):
+        """Initialise FrameServer.
+
+        :param sensor: AsyncVL53L5CX to stream from in serve(), or None to send() frames from elsewhere.
+        :param host: Address to accept TCP clients on, or None for no TCP.
+        :param port: TCP port.
+        :param udp: (address, port) to send datagrams to, eg: ("239.0.0.53", DEFAULT_PORT) for multicast.
+        :param ttl: Multicast time to live, 1 keeps it on the local network.
+        :param encoding: Arguments for FrameEncoder, ie: fields, delta and keyframe_interval.
+
+        """
+        self.sensor = sensor
+        self.host = host
+        self.port = port
+        self.udp = udp
+        self.ttl = ttl
+        self.encoder = FrameEncoder(**encoding)
+        self._server = None
+        self._socket = None
+        self._clients = {}
+        self._reset_stats()
+
+    async def start(self):
+        """Start accepting TCP clients and open the UDP socket."""
+        if self.host is not None:
+            self._server = await asyncio.start_server(self._accept, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+        if self.udp is not None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.setblocking(False)
+            if ipaddress.ip_address(self.udp[0]).is_multicast:
+                self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+
+    async def close(self):
+        """Disconnect all clients and stop the server."""
+        for writer in list(self._clients):
+            writer.close()
+        self._clients.clear()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    async def serve(self):
+        """Start the server (unless already started) and stream frames from the sensor until cancelled."""
+        if self._server is None and self._socket is None:
+            await self.start()
+        try:
+            async for results in self.sensor.frames():
+                # Read per frame (it is cached) so a resolution change is sent, and forces a keyframe
+                resolution = await self.sensor.get_resolution()
+                self.send(Frame(results, resolution))
+        finally:
+            await self.close()
+
+    def send(self, frame, timestamp=None):
+        """Encode a Frame and send it to every client.
+
+        :param frame: Frame, eg: from VL53L5CX.get_frame()
+        :param timestamp: Time of the frame (default: now, from time.time())
+
+        """
+        message = self.encoder.encode(frame, timestamp)
+        keyframe = self.encoder.keyframe
+        self._count(len(message))
+
+        if self._socket is not None:
+            try:
+                self._socket.sendto(message, self.udp)
+            except OSError as e:
+                # A full socket buffer drops the datagram, as the network would
+                if e.errno not in (errno.EAGAIN, errno.ENOBUFS):
+                    raise
+
+        for writer, synced in list(self._clients.items()):
+            if writer.transport.is_closing():
+                del self._clients[writer]
+            elif writer.transport.get_write_buffer_size() > _MAX_WRITE_BUFFER:
+                # Too far behind, skip this frame, so the next one must be a keyframe
+                self._clients[writer] = False
+            else:
+                data = message if synced else keyframe
+                writer.write(_LENGTH.pack(len(data)) + data)
+                self._clients[writer] = True
+
+    @property
+    def clients(self):
+        """Number of connected TCP clients."""
+        return len(self._clients)
+
+    async def _accept(self, reader, writer):
+        self._clients[writer] = False
+        try:
+            # Clients never send anything, this returns when they disconnect
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.pop(writer, None)
+            writer.close()
+
+
+class _DatagramQueue(asyncio.DatagramProtocol):
+    def __init__(self, queue):
+        self.queue = queue
+
+    def datagram_received(self, data, addr):
+        self.queue.put_nowait(data)
+
+    def connection_lost(self, exc):
+        self.queue.put_nowait(None)
+
+
+class FrameClient(_Stats):
+    """Receive frames from a FrameServer, decoding them into NumPy arrays.
+
+    Use FrameClient.connect() for TCP or FrameClient.listen() for UDP,
+    then read() or iterate with `async for frame in client`.
+
+    """
+    def __init__(self):
+        self.decoder = FrameDecoder()
+        self._reader = None
+        self._writer = None
+        self._transport = None
+        self._queue = None
+        self._reset_stats()
+
+    @classmethod
+    async def connect(cls, host, port=DEFAULT_PORT):
+        """Connect to a FrameServer over TCP."""
+        client = cls()
+        client._reader, client._writer = await asyncio.open_connection(host, port)
+        return client
+
+    @classmethod
+    async def listen(cls, port=DEFAULT_PORT, group=None, host="0.0.0.0"):
+        """Receive frames sent over UDP.
+
+        :param port: UDP port the server sends to.
+        :param group: Multicast group to join, eg: "239.0.0.53", or None for unicast.
+        :param host: Address to listen on.
+
+        """
+        client = cls()
+        client._queue = asyncio.Queue()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        if group is not None:
+            membership = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton(host))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        client._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _DatagramQueue(client._queue), sock=sock)
+        return client
+
+    @property
+    def dropped(self):
+        """Number of frames lost in transit, or skipped by the server."""
+        return self.decoder.dropped
+
+    def close(self):
+        """Disconnect from the server."""
+        if self._writer is not None:
+            self._writer.close()
+        if self._transport is not None:
+            self._transport.close()
+
+    async def read(self):
+        """Wait for the next frame.
+
+        Returns a NetworkFrame, updated in place by the next read, or None when the connection is closed.
+
+        """
+        while True:
+            if self._queue is not None:
+                message = await self._queue.get()
+                if message is None:
+                    return None
+            else:
+                try:
+                    length, = _LENGTH.unpack(await self._reader.readexactly(_LENGTH.size))
+                    message = await self._reader.readexactly(length)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return None
+            self._count(len(message))
+            try:
+                frame = self.decoder.decode(message)
+            except ValueError:
+                continue
+            if frame is not None:
+                return frame
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        frame = await self.read()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
@@ -0,0 +1,111 @@
+import collections
+import numpy
+from . import STATUS_RANGE_VALID, STATUS_RANGE_VALID_LARGE_PULSE
+
+
+# Target statuses treated as valid by default, as recommended by ST (UM2884)
+VALID_STATUSES = (STATUS_RANGE_VALID, STATUS_RANGE_VALID_LARGE_PULSE)
+
+ProcessedFrame = collections.namedtuple("ProcessedFrame", ("distance_mm", "reflectance", "valid"))
+
+
+def status_table(valid=VALID_STATUSES):
+    """Build a lookup table from target status to validity.
+
+    Indexing the table with a target_status array gives its validity mask
+    in one pass, eg: status_table().take(frame.target_status)
+
+    :param valid: Target statuses to treat as valid.
+
+    """
+    table = numpy.zeros(256, dtype=bool)
+    table[list(valid)] = True
+    return table
+
+
+def orient(array, flip_x=False, flip_y=False, rotate=0):
+    """Orient the zones of an array to match how the sensor is mounted.
+
+    Operates on the last two (rows, cols) axes, so works on single frames,
+    per-target arrays and batches of frames alike. Returns a view.
+
+    :param array: Array of zones, eg: Frame.distance_mm
+    :param flip_x: Mirror left to right.
+    :param flip_y: Mirror top to bottom.
+    :param rotate: Anticlockwise rotation in degrees, a multiple of 90, applied after flipping.
+
+    """
+    if rotate % 90:
+        raise ValueError("rotate must be a multiple of 90 degrees")
+    if flip_x:
+        array = array[..., ::-1]
+    if flip_y:
+        array = array[..., ::-1, :]
+    return numpy.rot90(array, (rotate // 90) % 4, axes=(-2, -1))
+
+
+class FrameProcessor:
+    """Validity masking and orientation of frames in one vectorised pass.
+
+    Works on Frame views (rows, cols) or (targets, rows, cols), or on
+    batches with any number of leading axes, eg: (N, 8, 8) from Recording.field()
+
+    """
+    def __init__(self, valid=VALID_STATUSES, flip_x=False, flip_y=False, rotate=0, dtype=numpy.float32):
+        """Initialise FrameProcessor.
+
+        :param valid: Target statuses to treat as valid.
+        :param flip_x: Mirror left to right.
+        :param flip_y: Mirror top to bottom, eg: to match the orientation of the examples.
+        :param rotate: Anticlockwise rotation in degrees, a multiple of 90, applied after flipping.
+        :param dtype: Float type of the masked distance and reflectance.
+
+        """
+        if rotate % 90:
+            raise ValueError("rotate must be a multiple of 90 degrees")
+        self.table = status_table(valid)
+        self.flip_x = flip_x
+        self.flip_y = flip_y
+        self.rotate = rotate
+        self.dtype = dtype
+        self._nan = numpy.dtype(dtype).type(numpy.nan)
+
+    def orient(self, array):
+        """Orient an array of zones, returning a view."""
+        return orient(array, self.flip_x, self.flip_y, self.rotate)
+
+    def valid(self, target_status):
+        """Get the oriented validity mask for an array of target statuses."""
+        return self.table.take(self.orient(target_status))
+
+    def process(self, distance_mm, reflectance, target_status):
+        """Orient and mask distance and reflectance, replacing invalid zones with NaN.
+
+        :param distance_mm: Array of distances, or None.
+        :param reflectance: Array of reflectances, or None.
+        :param target_status: Array of target statuses, or None to treat every zone as valid.
+
+        Returns a ProcessedFrame of (distance_mm, reflectance, valid).
+
+        """
+        if target_status is None:
+            # Built without target status (the distance profile), so nothing can be ruled out
+            valid = numpy.ones(self.orient(distance_mm).shape, dtype=bool)
+        else:
+            valid = self.valid(target_status)
+        return ProcessedFrame(self._mask(distance_mm, valid), self._mask(reflectance, valid), valid)
+
+    def process_frame(self, frame):
+        """Process a Frame, see process()
+
+        Outputs compiled out of the library are returned as None, without
+        target_status every zone is valid.
+
+        """
+        return self.process(frame.distance_mm, getattr(frame, "reflectance", None), getattr(frame, "target_status", None))
+
+    def _mask(self, values, valid):
+        if values is None:
+            return None
+        # A NaN of the output type keeps numpy.where from promoting to float64
+        return numpy.where(valid, self.orient(values), self._nan).astype(self.dtype, copy=False)
@@ -0,0 +1,118 @@
+import functools
+import numpy
+
+
+# Horizontal and vertical field of view of the VL53L5CX (63 degrees diagonally)
+FOV_DEGREES = 45.0
+
+
+@functools.lru_cache(maxsize=None)
+def ray_table(resolution, fov_degrees=FOV_DEGREES):
+    """Get unit ray directions through the centre of each zone.
+
+    Rays are in the sensor's frame: z along its axis, x to the right and
+    y down, with rows of zones running bottom to top (the examples flip
+    frames to display them). The table is shaped (3, rows, cols), ie: x, y
+    and z planes, so it can be oriented like any other array of zones.
+
+    Tables are computed once per resolution and are read-only.
+
+    :param resolution: Either 4*4 or 8*8.
+    :param fov_degrees: Field of view across the zones.
+
+    """
+    size = int(resolution ** 0.5)
+    tangents = numpy.tan(numpy.radians((numpy.arange(size) + 0.5) / size * fov_degrees - fov_degrees / 2))
+    x = numpy.broadcast_to(tangents, (size, size))
+    y = numpy.broadcast_to(-tangents[:, numpy.newaxis], (size, size))
+    rays = numpy.stack((x, y, numpy.ones((size, size))))
+    rays /= numpy.linalg.norm(rays, axis=0)
+    rays = rays.astype(numpy.float32)
+    rays.setflags(write=False)
+    return rays
+
+
+def rotation(x=0.0, y=0.0, z=0.0):
+    """Build a rotation matrix from angles about each axis.
+
+    Rotates about x, then y, then z.
+
+    :param x: Degrees about the x axis.
+    :param y: Degrees about the y axis.
+    :param z: Degrees about the z axis.
+
+    """
+    x, y, z = numpy.radians((x, y, z))
+    rx = numpy.array(((1, 0, 0), (0, numpy.cos(x), -numpy.sin(x)), (0, numpy.sin(x), numpy.cos(x))))
+    ry = numpy.array(((numpy.cos(y), 0, numpy.sin(y)), (0, 1, 0), (-numpy.sin(y), 0, numpy.cos(y))))
+    rz = numpy.array(((numpy.cos(z), -numpy.sin(z), 0), (numpy.sin(z), numpy.cos(z), 0), (0, 0, 1)))
+    return rz @ ry @ rx
+
+
+class Projector:
+    """Project frames to 3D points, for a sensor at a given pose.
+
+    Ray tables are rotated into place once per resolution, so each
+    frame costs a single multiply-add per zone.
+
+    """
+    def __init__(self, rotation=None, translation=(0, 0, 0), fov_degrees=FOV_DEGREES):
+        """Initialise Projector.
+
+        :param rotation: 3x3 rotation matrix from the sensor's frame to the common frame (default: none), see rotation()
+        :param translation: Position (mm) of the sensor in the common frame.
+        :param fov_degrees: Field of view across the zones.
+
+        """
+        self.rotation = numpy.identity(3) if rotation is None else numpy.asarray(rotation, dtype=float).reshape((3, 3))
+        self.translation = numpy.asarray(translation, dtype=numpy.float32).reshape((3, 1, 1))
+        self.fov_degrees = fov_degrees
+        self._rays = {}
+
+    def rays(self, resolution):
+        """Get the ray table for a resolution, rotated to the sensor's pose."""
+        rays = self._rays.get(resolution)
+        if rays is None:
+            rays = numpy.tensordot(self.rotation, ray_table(resolution, self.fov_degrees), axes=1).astype(numpy.float32)
+            rays.setflags(write=False)
+            self._rays[resolution] = rays
+        return rays
+
+    def project(self, distance_mm, valid=None):
+        """Project distances to points.
+
+        :param distance_mm: Array of distances in driver order, shaped (..., rows, cols), eg: Frame.distance_mm
+        :param valid: Optional validity mask, eg: from FrameProcessor.valid()
+
+        Returns an array shaped (..., 3, rows, cols) of x, y and z in mm, NaN where invalid.
+
+        """
+        distance = numpy.asarray(distance_mm, dtype=numpy.float32)
+        if valid is not None:
+            distance = numpy.where(valid, distance, numpy.float32(numpy.nan))
+        rays = self.rays(distance.shape[-1] * distance.shape[-2])
+        return distance[..., numpy.newaxis, :, :] * rays + self.translation
+
+    def points(self, distance_mm, valid=None):
+        """Project distances to a point cloud, see project()
+
+        Returns an array shaped (points, 3) of the valid points only.
+
+        """
+        points = numpy.moveaxis(self.project(distance_mm, valid), -3, -1).reshape((-1, 3))
+        return points[~numpy.isnan(points[:, 2])]
+
+
+def point_cloud(projectors, distances, valids=None):
+    """Merge the points from several sensors into one cloud.
+
+    :param projectors: A Projector for each sensor.
+    :param distances: Array of distances from each sensor.
+    :param valids: Optional validity mask for each sensor.
+
+    Returns an array shaped (points, 3).
+
+    """
+    if valids is None:
+        valids = [None] * len(projectors)
+    return numpy.concatenate([projector.points(distance, valid) for projector, distance, valid in zip(projectors, distances, valids)])
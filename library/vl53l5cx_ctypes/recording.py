@@ -0,0 +1,476 @@
+import os
+import json
+import time
+import struct
+import threading
+import numpy
+from ctypes import byref, memmove, sizeof
+from . import _VL53, _CONFIG_SETTERS, _RESULTS_TYPES, _STREAM_STOP_INTERVAL, _results_layout, DEFAULT_I2C_ADDRESS, NB_TARGET_PER_ZONE, VL53L5CX_ResultsData, FrameRing
+from .frame import Frame, TARGET_FIELDS
+
+
+# File header: magic, format version, reserved, offset of the first record.
+# Followed by a JSON description of the record layout, padded to the first record.
+_HEADER = struct.Struct("<8sHHI")
+_MAGIC = b"VL53LREC"
+_VERSION = 1
+_DATA_ALIGNMENT = 64
+
+# Record header: timestamp (seconds since the epoch), sensor id, config id.
+# Followed by the raw VL53L5CX_ResultsData, padded to a multiple of 8 bytes.
+_RECORD_HEADER = struct.Struct("<dHH4x")
+
+# Number of reusable results buffers behind ReplayVL53L5CX.get_frame()
+_FRAME_RING_SIZE = 2
+
+
+def _align(size, alignment):
+    return (size + alignment - 1) // alignment * alignment
+
+
+def _index_path(path):
+    return str(path) + ".idx"
+
+
+def _record_dtype(layout, results_size, record_size):
+    # Build the dtype from the recorded layout, not this build's, so any recording can be read
+    names, formats, offsets = [], [], []
+    for name, offset, size in layout:
+        dtype = numpy.dtype(_RESULTS_TYPES[name])
+        length = size // dtype.itemsize
+        names.append(name)
+        formats.append(dtype if length == 1 else (dtype, (length,)))
+        offsets.append(offset)
+    results = numpy.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": results_size})
+    return numpy.dtype({
+        "names": ["timestamp", "sensor", "config", "results"],
+        "formats": ["<f8", "<u2", "<u2", results],
+        "offsets": [0, 8, 10, _RECORD_HEADER.size],
+        "itemsize": record_size
+    })
+
+
+class Recorder:
+    """Append frames to a recording file, see Recording to read them back.
+
+    Frames are stored as fixed size records of a timestamp, sensor id,
+    config id and the raw VL53L5CX_ResultsData. The sensor names and
+    settings the ids refer to are appended to an index alongside
+    (<path>.idx) whenever a new one is seen.
+
+    """
+    def __init__(self, path):
+        """Initialise Recorder, creating (or replacing) the recording.
+
+        :param path: Path to the recording file.
+
+        """
+        self._results_size = sizeof(VL53L5CX_ResultsData)
+        self.record_size = _RECORD_HEADER.size + _align(self._results_size, 8)
+        self._padding = bytes(self.record_size - _RECORD_HEADER.size - self._results_size)
+        self._sensors = {}
+        self._configs = {}
+        self.frames = 0
+
+        info = json.dumps({
+            "layout": _results_layout(),
+            "results_size": self._results_size,
+            "record_size": self.record_size,
+            "nb_target_per_zone": NB_TARGET_PER_ZONE,
+            "api_revision": _VL53.get_api_revision().decode(),
+            "created": time.time()
+        }).encode()
+        data_offset = _align(_HEADER.size + len(info), _DATA_ALIGNMENT)
+
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, 0, data_offset) + info)
+        self._file.write(bytes(data_offset - _HEADER.size - len(info)))
+        self._index = open(_index_path(path), "w")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, results, settings, name="0", timestamp=None):
+        """Append a frame.
+
+        :param results: VL53L5CX_ResultsData to record.
+        :param settings: Dict of the settings the frame was captured with, see VL53L5CX.get_settings()
+        :param name: Name of the sensor the frame is from.
+        :param timestamp: Capture time in seconds since the epoch (default: now)
+
+        """
+        sensor_id = self._sensors.get(name)
+        if sensor_id is None:
+            sensor_id = self._sensors[name] = len(self._sensors)
+            self._log({"sensor": sensor_id, "name": name})
+
+        key = (sensor_id, tuple(sorted(settings.items())))
+        config_id = self._configs.get(key)
+        if config_id is None:
+            config_id = self._configs[key] = len(self._configs)
+            self._log({"config": config_id, "sensor": sensor_id, "settings": dict(settings), "record": self.frames})
+
+        self._file.write(_RECORD_HEADER.pack(time.time() if timestamp is None else timestamp, sensor_id, config_id))
+        self._file.write(results)
+        self._file.write(self._padding)
+        self.frames += 1
+
+    def record(self, sensor, results=None, name="0", timestamp=None):
+        """Append a frame from a VL53L5CX, along with its current settings.
+
+        :param sensor: VL53L5CX (or ReplayVL53L5CX) the frame is from.
+        :param results: VL53L5CX_ResultsData to record (default: read one with sensor.get_data())
+        :param name: Name of the sensor, to tell several apart.
+        :param timestamp: Capture time in seconds since the epoch (default: now)
+
+        Returns the recorded VL53L5CX_ResultsData.
+
+        """
+        if results is None:
+            results = sensor.get_data()
+        # Settings are cached by the getters, so this costs no i2c traffic once they're known
+        settings = {setting: getattr(sensor, "get_" + setting)() for setting in _CONFIG_SETTERS}
+        self.write(results, settings, name, timestamp)
+        return results
+
+    def flush(self):
+        """Flush buffered frames to disk."""
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+    def _log(self, entry):
+        self._index.write(json.dumps(entry) + "\n")
+        self._index.flush()
+
+
+class Recording:
+    """A recording, memory-mapped as a NumPy structured array.
+
+    Nothing is copied: records, and views of them such as field(),
+    are read from the file on demand. A partly written final record
+    (eg: from a recording still in progress) is ignored.
+
+    Requires numpy.
+
+    """
+    def __init__(self, path):
+        """Initialise Recording.
+
+        :param path: Path to a recording file from Recorder.
+
+        """
+        with open(path, "rb") as f:
+            magic, version, _, data_offset = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a VL53L5CX recording")
+            if version != _VERSION:
+                raise ValueError(f"Unsupported recording version: {version}")
+            self.info = json.loads(f.read(data_offset - _HEADER.size).rstrip(b"\0").decode())
+
+        self.layout = [tuple(field) for field in self.info["layout"]]
+        self.targets = self.info["nb_target_per_zone"]
+        self.dtype = _record_dtype(self.layout, self.info["results_size"], self.info["record_size"])
+
+        count = (os.path.getsize(path) - data_offset) // self.dtype.itemsize
+        if count:
+            self.records = numpy.memmap(path, dtype=self.dtype, mode="r", offset=data_offset, shape=(count,))
+        else:
+            self.records = numpy.zeros(0, dtype=self.dtype)
+
+        # Sensor names and configs by id
+        self.sensors = []
+        self.configs = []
+        with open(_index_path(path)) as f:
+            for line in f:
+                entry = json.loads(line)
+                if "name" in entry:
+                    self.sensors.append(entry["name"])
+                else:
+                    self.configs.append(entry)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamp(self):
+        return self.records["timestamp"]
+
+    @property
+    def sensor(self):
+        return self.records["sensor"]
+
+    @property
+    def config(self):
+        return self.records["config"]
+
+    @property
+    def results(self):
+        return self.records["results"]
+
+    def settings(self, index):
+        """Get the settings record `index` was captured with."""
+        return self.configs[self.config[index]]["settings"]
+
+    def indices(self, sensor=None, config=None):
+        """Get the indices of the records from a sensor and/or captured with a config.
+
+        :param sensor: Sensor name or id.
+        :param config: Config id.
+
+        """
+        mask = numpy.ones(len(self), dtype=bool)
+        if sensor is not None:
+            mask &= self.sensor == (self.sensors.index(sensor) if isinstance(sensor, str) else sensor)
+        if config is not None:
+            mask &= self.config == config
+        return numpy.flatnonzero(mask)
+
+    def field(self, name, resolution=None):
+        """Get a view of one output across all records.
+
+        :param name: Output name, eg: "distance_mm"
+        :param resolution: Either 4*4 or 8*8 to shape the values as Frame does, ie: (records, rows, cols)
+            or (records, targets, rows, cols), otherwise they're left as stored by the driver.
+
+        """
+        values = self.results[name]
+        if resolution is None:
+            return values
+        size = int(resolution ** 0.5)
+        if name in TARGET_FIELDS:
+            values = values.reshape(len(self), -1, self.targets)[:, :resolution].transpose(0, 2, 1)
+            return values.reshape((len(self), self.targets, size, size))
+        return values[:, :resolution].reshape((len(self), size, size))
+
+
+class ReplayVL53L5CX:
+    """Plays a recording back through the VL53L5CX interface.
+
+    Frames become ready at their recorded times, scaled by `speed`, so
+    code written against VL53L5CX can be run unchanged against a
+    recording. Setters succeed only if they match the recorded settings,
+    power, motion and address changes are accepted and ignored.
+
+    """
+    def __init__(self, recording, sensor=None, speed=1.0):
+        """Initialise ReplayVL53L5CX.
+
+        :param recording: Recording, or path to a recording file.
+        :param sensor: Name of the sensor to replay, for recordings of several sensors (default: the first)
+        :param speed: Playback speed, eg: 10 for ten times real time, or None to make every frame ready
+            as soon as the previous one has been read.
+
+        """
+        if not isinstance(recording, Recording):
+            recording = Recording(recording)
+        if recording.layout != _results_layout() or recording.info["results_size"] != sizeof(VL53L5CX_ResultsData):
+            raise RuntimeError("Recording layout does not match this build of the library, read it with Recording instead.")
+
+        self.recording = recording
+        self.speed = speed
+        self.interrupt = None
+        self.i2c_addr = DEFAULT_I2C_ADDRESS
+        self.i2c_bus = None
+        self.dropped = 0
+        self._indices = recording.indices(sensor=0 if sensor is None else sensor)
+        self._times = recording.timestamp[self._indices] - (recording.timestamp[self._indices[0]] if len(self._indices) else 0)
+        self._results_offset = recording.dtype.fields["results"][1]
+        self._results_size = sizeof(VL53L5CX_ResultsData)
+        self._ranging = False
+        self._t_start = 0
+        self._position = -1
+        self._frames = None
+        self._frame_index = 0
+        self._stream_ring = None
+        self._stream_thread = None
+        self._stream_stop = threading.Event()
+
+    @property
+    def finished(self):
+        """True once the last frame has been read."""
+        return self._position >= len(self._indices) - 1
+
+    def init(self):
+        self._position = -1
+        return True
+
+    def is_alive(self):
+        return True
+
+    def start_ranging(self):
+        """Start playback from the beginning."""
+        self._ranging = True
+        self._t_start = time.monotonic()
+        self._position = -1
+        return True
+
+    def stop_ranging(self):
+        self._ranging = False
+        return True
+
+    def set_power_mode(self, power_mode):
+        return True
+
+    def set_i2c_address(self, i2c_address):
+        self.i2c_addr = i2c_address
+        return True
+
+    def enable_motion_indicator(self, resolution=64):
+        """Accepted for compatibility, motion data is replayed as recorded."""
+        return True
+
+    def set_motion_distance(self, distance_min, distance_max):
+        return True
+
+    def set_motion_resolution(self, resolution):
+        return True
+
+    def get_settings(self):
+        return dict(self._settings())
+
+    def apply_config(self, settings):
+        recorded = self._settings()
+        return all(recorded.get(name) == value for name, value in settings.items())
+
+    def data_ready(self):
+        """Check if a frame newer than the last one read is due."""
+        return self._due() > self._position
+
+    def wait_data_ready(self, timeout=None):
+        """Wait until the next frame is due.
+
+        :param timeout: Timeout in seconds, or None to wait forever.
+
+        Returns False on timeout, or if the recording has finished.
+
+        """
+        if self.data_ready():
+            return True
+        next_position = self._position + 1
+        if not self._ranging or self.speed is None or next_position >= len(self._indices):
+            return False
+        delay = self._t_start + self._times[next_position] / self.speed - time.monotonic()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            return False
+        time.sleep(max(0, delay))
+        return True
+
+    def get_data(self, into=None):
+        """Get the most recent due frame, skipping any which were not read in time.
+
+        :param into: Optional VL53L5CX_ResultsData to read into, instead of allocating a new one.
+
+        """
+        due = self._due()
+        if due < 0:
+            raise RuntimeError("Error reading data.")
+        if due > self._position:
+            self.dropped += due - self._position - 1
+            self._position = due
+
+        results = VL53L5CX_ResultsData() if into is None else into
+        record = int(self._indices[self._position])
+        address = self.recording.records.ctypes.data + record * self.recording.dtype.itemsize + self._results_offset
+        memmove(byref(results), address, self._results_size)
+        return results
+
+    def get_frame(self):
+        """Get data as a Frame, see VL53L5CX.get_frame()"""
+        resolution = self.get_resolution()
+        if self._frames is None or self._frames[0].resolution != resolution:
+            self._frames = [Frame(VL53L5CX_ResultsData(), resolution) for _ in range(_FRAME_RING_SIZE)]
+
+        frame = self._frames[self._frame_index]
+        self._frame_index = (self._frame_index + 1) % _FRAME_RING_SIZE
+        self.get_data(into=frame.results)
+        return frame
+
+    def start_streaming(self, buffers=4):
+        """Start playback and read frames in a background thread, see VL53L5CX.start_streaming()"""
+        if self._stream_thread is not None:
+            raise RuntimeError("Already streaming.")
+        self._stream_ring = FrameRing(buffers)
+        self._stream_stop.clear()
+        self.start_ranging()
+        self._stream_thread = threading.Thread(target=self._stream, args=(self._stream_ring,), daemon=True)
+        self._stream_thread.start()
+
+    def stop_streaming(self):
+        """Stop the background reader thread and stop playback."""
+        if self._stream_thread is None:
+            return
+        self._stream_stop.set()
+        self._stream_thread.join()
+        self._stream_thread = None
+        self.stop_ranging()
+
+    def latest_frame(self):
+        """Get the most recent streamed frame without blocking, or None."""
+        return self._streaming_ring().latest()
+
+    def wait_frame(self, timeout=None):
+        """Wait for a streamed frame newer than the last one returned, or None on timeout."""
+        return self._streaming_ring().wait(timeout)
+
+    def stream_stats(self):
+        """Get streaming counters: frames published, dropped (never consumed) and read errors."""
+        ring = self._stream_ring
+        if ring is None:
+            raise RuntimeError("Not streaming.")
+        return {"frames": ring.frames, "dropped": ring.dropped, "errors": ring.errors}
+
+    def _streaming_ring(self):
+        if self._stream_thread is None:
+            raise RuntimeError("Not streaming.")
+        return self._stream_ring
+
+    def _stream(self, ring):
+        # Frames are due at known times, so wait for each rather than polling
+        while not self._stream_stop.is_set():
+            if self.finished:
+                self._stream_stop.wait(_STREAM_STOP_INTERVAL)
+            elif self.wait_data_ready(_STREAM_STOP_INTERVAL):
+                self.get_data(into=ring.next_slot())
+                ring.publish()
+
+    def _due(self):
+        # Index (into this sensor's records) of the latest frame due for playback
+        if not self._ranging or not len(self._indices):
+            return -1
+        if self.speed is None:
+            return min(self._position + 1, len(self._indices) - 1)
+        elapsed = (time.monotonic() - self._t_start) * self.speed
+        return int(numpy.searchsorted(self._times, elapsed, "right")) - 1
+
+    def _settings(self):
+        # Settings of the last frame read, or of the first before playback starts
+        record = self._indices[max(self._position, 0)] if len(self._indices) else None
+        return self.recording.settings(record) if record is not None else {}
+
+
+def _replay_getter(name):
+    def method(self):
+        return self._settings()[name]
+
+    method.__name__ = "get_" + name
+    return method
+
+
+def _replay_setter(name):
+    def method(self, value):
+        return self._settings().get(name) == value
+
+    method.__name__ = "set_" + name
+    return method
+
+
+for _name in _CONFIG_SETTERS:
+    setattr(ReplayVL53L5CX, "get_" + _name, _replay_getter(_name))
+    setattr(ReplayVL53L5CX, "set_" + _name, _replay_setter(_name))
@@ -0,0 +1,299 @@
+import time
+import zlib
+import struct
+import numpy
+from ctypes import byref, memmove, sizeof
+from multiprocessing import shared_memory
+from . import NB_TARGET_PER_ZONE, VL53L5CX_ResultsData
+from .frame import Frame
+
+
+# Shared memory name used when none is given
+DEFAULT_NAME = "vl53l5cx"
+
+# Bus header: magic, format version, slot count, slot size, VL53L5CX_ResultsData size and
+# targets per zone, so subscribers can check they were built with the same layout.
+# Followed by the sequence number of the latest frame, as a uint64 at _LATEST_OFFSET.
+_HEADER = struct.Struct("<8sHHIII")
+_MAGIC = b"VL53LSHM"
+_VERSION = 2
+_LATEST_OFFSET = 32
+_HEADER_SIZE = 64
+
+# Slot header: seqlock counter (odd while the slot is being written), frame sequence number,
+# timestamp, resolution and CRC32 of the frame. Followed by the raw VL53L5CX_ResultsData,
+# padded to _SLOT_ALIGNMENT.
+_SLOT_HEADER_SIZE = 32
+_SLOT_ALIGNMENT = 64
+
+# Interval between checks for a new frame in FrameSubscriber.wait() (seconds)
+_WAIT_POLL_INTERVAL = 0.001
+
+# Attempts to find a frame which is not being overwritten in FrameSubscriber.latest()
+_READ_RETRIES = 100
+
+
+def _slot_size():
+    size = _SLOT_HEADER_SIZE + sizeof(VL53L5CX_ResultsData)
+    return (size + _SLOT_ALIGNMENT - 1) // _SLOT_ALIGNMENT * _SLOT_ALIGNMENT
+
+
+def _slot_dtype(slot_size):
+    return numpy.dtype({
+        "names": ["lock", "sequence", "timestamp", "resolution", "checksum"],
+        "formats": ["<u8", "<u8", "<f8", "<u2", "<u4"],
+        "offsets": [0, 8, 16, 24, 28],
+        "itemsize": slot_size
+    })
+
+
+def _attach(name):
+    # Only the publisher unlinks the memory, but before Python 3.13 every process that
+    # attaches registers it with the resource tracker, which would unlink it on exit.
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedFrame(Frame):
+    """A Frame of zero-copy views into a slot of a shared memory frame bus.
+
+    The slot is overwritten by the publisher after `slots - 1` newer
+    frames, so check valid() after using the views (or copying them) to
+    be sure the data wasn't overwritten meanwhile.
+
+    """
+    def __init__(self, subscriber, index, resolution):
+        Frame.__init__(self, subscriber._results[index], resolution)
+        self._slot = subscriber._slots[index:index + 1]
+        self._payload = subscriber._payloads[index]
+        self._lock = 0
+        self._checksum = 0
+        self.sequence = 0
+        self.timestamp = 0.0
+
+    def valid(self):
+        """Check the slot has not been written to since this frame was returned."""
+        return int(self._slot["lock"][0]) == self._lock and zlib.crc32(self._payload) == self._checksum
+
+
+class _SharedBus:
+    def _map(self, slots):
+        slot_size = _slot_size()
+        buf = self._memory.buf
+        self._latest = numpy.ndarray((1,), "<u8", buf, _LATEST_OFFSET)
+        self._slots = numpy.ndarray((slots,), _slot_dtype(slot_size), buf, _HEADER_SIZE)
+        self._results = [VL53L5CX_ResultsData.from_buffer(buf, _HEADER_SIZE + i * slot_size + _SLOT_HEADER_SIZE) for i in range(slots)]
+        self._payloads = [buf[offset:offset + sizeof(VL53L5CX_ResultsData)] for offset in (_HEADER_SIZE + i * slot_size + _SLOT_HEADER_SIZE for i in range(slots))]
+
+    @property
+    def frames(self):
+        """Total number of frames published."""
+        return int(self._latest[0])
+
+    def _release(self):
+        # Every view of the buffer must be dropped before it can be closed
+        self._latest = self._slots = self._results = self._frames = None
+        for payload in self._payloads:
+            payload.release()
+        self._payloads = None
+        self._memory.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FramePublisher(_SharedBus):
+    """Publish frames into a shared memory ring for other processes.
+
+    One process owns the sensor and publishes each frame once, any number
+    of FrameSubscriber processes read them as zero-copy NumPy views, so
+    adding a reader costs no i2c traffic and no serialisation.
+
+    Each slot is guarded by a seqlock, so readers never block the
+    publisher and can tell when a slot changed under them. Python can't
+    issue memory barriers, so on weakly ordered CPUs (eg: the ARM cores
+    of a Raspberry Pi) a reader could see a new sequence number before
+    the frame itself. Each slot also carries a CRC32 of its frame, which
+    readers check, so a torn frame is retried or reported as invalid.
+
+    """
+    def __init__(self, name=DEFAULT_NAME, slots=8):
+        """Initialise FramePublisher.
+
+        :param name: Shared memory name subscribers attach to.
+        :param slots: Number of frames in the ring, a frame is overwritten after slots - 1 newer frames.
+
+        """
+        if slots < 2:
+            raise ValueError("slots must be >= 2")
+        self.name = name
+        self.slots = slots
+        self._frames = None
+        size = _HEADER_SIZE + slots * _slot_size()
+        try:
+            self._memory = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a publisher which did not close(), reuse it
+            self._memory = _attach(name)
+            if self._memory.size < size:
+                self._memory.close()
+                raise
+        self._memory.buf[:size] = bytes(size)
+        self._memory.buf[:_HEADER.size] = _HEADER.pack(_MAGIC, _VERSION, slots, _slot_size(), sizeof(VL53L5CX_ResultsData), NB_TARGET_PER_ZONE)
+        self._map(slots)
+
+    def close(self, unlink=True):
+        """Close the shared memory, and remove it unless unlink is False."""
+        self._release()
+        if unlink:
+            self._memory.unlink()
+
+    def read(self, sensor, timestamp=None):
+        """Read a frame from a sensor straight into the next slot and publish it.
+
+        :param sensor: VL53L5CX to call get_data() on, with data ready.
+        :param timestamp: Time of the frame (default: now, from time.time())
+
+        Raises RuntimeError as get_data() if the frame could not be read, publishing nothing.
+
+        """
+        resolution = sensor.get_resolution()
+        index = self._begin()
+        try:
+            sensor.get_data(into=self._results[index])
+        except RuntimeError:
+            self._end(index, 0, 0.0, False)
+            raise
+        self._end(index, resolution, time.time() if timestamp is None else timestamp)
+
+    def publish(self, results, resolution, timestamp=None):
+        """Copy a VL53L5CX_ResultsData into the next slot and publish it.
+
+        :param results: VL53L5CX_ResultsData, eg: from get_data() or wait_frame()
+        :param resolution: Either 4*4 or 8*8.
+        :param timestamp: Time of the frame (default: now, from time.time())
+
+        """
+        index = self._begin()
+        memmove(byref(self._results[index]), byref(results), sizeof(VL53L5CX_ResultsData))
+        self._end(index, resolution, time.time() if timestamp is None else timestamp)
+
+    def _begin(self):
+        # Make the lock odd before touching the slot, so readers can see it is being written
+        index = int(self._latest[0]) % self.slots
+        self._slots["lock"][index] += 1
+        return index
+
+    def _end(self, index, resolution, timestamp, publish=True):
+        slot = self._slots[index:index + 1]
+        sequence = int(self._latest[0]) + 1
+        slot["sequence"] = sequence if publish else 0
+        slot["timestamp"] = timestamp
+        slot["resolution"] = resolution
+        slot["checksum"] = zlib.crc32(self._payloads[index])
+        slot["lock"] += 1
+        if publish:
+            self._latest[0] = sequence
+
+
+class FrameSubscriber(_SharedBus):
+    """Read the frames published by a FramePublisher in another process.
+
+    Frames are SharedFrame views straight into shared memory, so any
+    number of subscribers read them without copying.
+
+    """
+    def __init__(self, name=DEFAULT_NAME):
+        """Initialise FrameSubscriber.
+
+        :param name: Shared memory name the publisher created.
+
+        Raises FileNotFoundError if there is no publisher.
+
+        """
+        self.name = name
+        self._memory = _attach(name)
+        magic, version, slots, slot_size, results_size, targets = _HEADER.unpack_from(self._memory.buf)
+        if magic != _MAGIC or version != _VERSION:
+            self._memory.close()
+            raise RuntimeError("{} is not a VL53L5CX frame bus.".format(name))
+        if slot_size != _slot_size() or results_size != sizeof(VL53L5CX_ResultsData) or targets != NB_TARGET_PER_ZONE:
+            self._memory.close()
+            raise RuntimeError("Frame bus was published by a library built with a different VL53L5CX_ResultsData layout.")
+        self.slots = slots
+        self._map(slots)
+        self._frames = [None] * slots
+        self._read_sequence = 0
+        self.dropped = 0
+
+    def close(self):
+        """Detach from the shared memory, which is left for the publisher to remove.
+
+        Every SharedFrame returned must have been released first.
+
+        """
+        self._release()
+
+    def latest(self):
+        """Get the latest frame without blocking, or None if nothing has been published.
+
+        Returns a SharedFrame, updated in place when its slot is reused.
+
+        """
+        for _ in range(_READ_RETRIES):
+            sequence = int(self._latest[0])
+            if sequence == 0:
+                return None
+            index = (sequence - 1) % self.slots
+            slot = self._slots[index]
+            lock = int(slot["lock"])
+            if lock & 1 or int(slot["sequence"]) != sequence:
+                # The publisher has moved on to this slot, so there's a newer frame
+                continue
+            resolution = int(slot["resolution"])
+            timestamp = float(slot["timestamp"])
+            checksum = int(slot["checksum"])
+            if int(self._slots["lock"][index]) != lock or zlib.crc32(self._payloads[index]) != checksum:
+                continue
+
+            frame = self._frames[index]
+            if frame is None or frame.resolution != resolution:
+                frame = self._frames[index] = SharedFrame(self, index, resolution)
+            frame._lock = lock
+            frame._checksum = checksum
+            frame.sequence = sequence
+            frame.timestamp = timestamp
+
+            if sequence > self._read_sequence:
+                # Count frames that were published but never returned
+                self.dropped += sequence - self._read_sequence - 1
+                self._read_sequence = sequence
+            return frame
+        raise RuntimeError("Frame bus is being overwritten faster than it can be read.")
+
+    def wait(self, timeout=None):
+        """Wait for a frame newer than the last one returned.
+
+        :param timeout: Timeout in seconds, or None to wait forever.
+
+        Returns a SharedFrame, or None on timeout.
+
+        """
+        t_end = None if timeout is None else time.monotonic() + timeout
+        while int(self._latest[0]) <= self._read_sequence:
+            if t_end is not None and time.monotonic() >= t_end:
+                return None
+            time.sleep(_WAIT_POLL_INTERVAL)
+        return self.latest()
@@ -0,0 +1,492 @@
+import math
+import time
+import errno
+import random
+import struct
+import threading
+from ctypes import memmove
+
+
+# Register map and command protocol, as used by vl53l5cx_api.c
+_PAGE_SELECT = 0x7fff
+_UI_CMD_STATUS = 0x2c00
+_UI_CMD_START = 0x2c04
+_UI_CMD_END = 0x2fff
+_UI_CMD_RANGING = 0x2ffc
+_NVM_DATA_SIZE = 492
+_XTALK_DATA_SIZE = 768
+_FIRMWARE_SIZE = 0x15000
+_FIRMWARE_PAGES = (0x09, 0x0a, 0x0b)
+_PAGE_SIZE = 0x8000
+
+_I2C_M_RD = 0x0001
+
+_DCI_UI_RANGE_CONFIG = 0x5440
+_DCI_ZONE_CONFIG = 0x5450
+_DCI_FREQ_HZ = 0x5458
+_DCI_TARGET_ORDER = 0xae64
+_DCI_SHARPENER = 0xaed8
+_DCI_OUTPUT_CONFIG = 0xcd60
+_DCI_OUTPUT_ENABLES = 0xcd68
+_DCI_OUTPUT_LIST = 0xcd78
+_DCI_DET_THRESH_GLOBAL_CONFIG = 0xb6e0
+_DCI_DET_THRESH_START = 0xb6e8
+
+# Settings which are not part of the driver's default configuration
+_DCI_DEFAULTS = {
+    _DCI_TARGET_ORDER: bytes((2, 0, 0, 0)),
+    _DCI_SHARPENER: bytes(13) + bytes((14, 0, 0))
+}
+
+# Outputs in the order the driver lists them when it starts ranging
+_OUTPUTS = (
+    "start",
+    "metadata",
+    "common",
+    "ambient_per_spad",
+    "nb_spads_enabled",
+    "nb_target_detected",
+    "signal_per_spad",
+    "range_sigma_mm",
+    "distance_mm",
+    "reflectance",
+    "target_status",
+    "motion_indicator"
+)
+
+# Element format and the fixed point scale the driver divides out, for per zone/target outputs
+_OUTPUT_FORMATS = {
+    "ambient_per_spad": ("I", 2048),
+    "nb_spads_enabled": ("I", 1),
+    "nb_target_detected": ("B", 1),
+    "signal_per_spad": ("I", 2048),
+    "range_sigma_mm": ("H", 128),
+    "distance_mm": ("h", 4),
+    "reflectance": ("B", 2),
+    "target_status": ("B", 1)
+}
+
+# Output compared by each detection threshold measurement, and the fixed point scale the driver multiplies in
+_THRESHOLD_MEASUREMENTS = {
+    1: ("distance_mm", 4),
+    2: ("signal_per_spad", 2048),
+    4: ("range_sigma_mm", 128),
+    8: ("ambient_per_spad", 2048),
+    9: ("nb_target_detected", 1),
+    12: ("target_status", 1),
+    13: ("nb_spads_enabled", 256)
+}
+
+# Detection threshold comparisons of a value with the low and high thresholds
+_THRESHOLD_COMPARISONS = {
+    0: lambda value, low, high: low <= value <= high,
+    1: lambda value, low, high: value < low or value > high,
+    2: lambda value, low, high: value <= low,
+    3: lambda value, low, high: value > high,
+    4: lambda value, low, high: value == low,
+    5: lambda value, low, high: value != low
+}
+
+# Outputs with one value per zone, the rest have one per target
+_ZONE_OUTPUTS = ("ambient_per_spad", "nb_spads_enabled", "nb_target_detected")
+
+
+def _swap(data):
+    # The sensor stores 32-bit words big-endian, the driver swaps them with SwapBuffer()
+    data = bytearray(data)
+    data[0::4], data[1::4], data[2::4], data[3::4] = data[3::4], data[2::4], data[1::4], data[0::4]
+    return data
+
+
+def flat_scene(distance_mm=1000):
+    """A flat wall facing the sensor.
+
+    :param distance_mm: Distance to the wall in mm.
+
+    """
+    def scene(t, width):
+        return [distance_mm] * (width * width)
+    return scene
+
+
+def ramp_scene(near_mm=200, far_mm=2000):
+    """A wall at an angle, getting further away from left to right.
+
+    :param near_mm: Distance seen by the leftmost column of zones.
+    :param far_mm: Distance seen by the rightmost column of zones.
+
+    """
+    def scene(t, width):
+        step = (far_mm - near_mm) / (width - 1)
+        return [near_mm + step * x for _ in range(width) for x in range(width)]
+    return scene
+
+
+def moving_object_scene(background_mm=2000, object_mm=300, size=0.25, period=4.0):
+    """A square object moving from side to side in front of a wall.
+
+    :param background_mm: Distance to the wall in mm, or None for nothing in range.
+    :param object_mm: Distance to the object in mm.
+    :param size: Size of the object, as a fraction of the field of view.
+    :param period: Time in seconds for the object to move across and back.
+
+    """
+    def scene(t, width):
+        half = size / 2
+        centre_x = 0.5 + (0.5 - half) * math.sin(2 * math.pi * t / period)
+        result = []
+        for y in range(width):
+            for x in range(width):
+                u, v = (x + 0.5) / width, (y + 0.5) / width
+                inside = abs(u - centre_x) <= half and abs(v - 0.5) <= half
+                result.append(object_mm if inside else background_mm)
+        return result
+    return scene
+
+
+class SimulatedVL53L5CX:
+    """Simulated VL53L5CX i2c device.
+
+    Emulates enough of the register and DCI command protocol for the
+    driver to boot the sensor, upload firmware, change settings and
+    range, returning frames rendered from a synthetic scene.
+
+    Use in place of an SMBus, eg: VL53L5CX(i2c_dev=SimulatedVL53L5CX())
+    or add several to a SimulatedBus.
+
+    """
+    def __init__(self, i2c_addr=0x29, scene=None, latency=0.0, bitrate=None,
+                 reflectance=50, ambient=5, temperature=30, noise_mm=0.0, seed=0, clock=time.monotonic,
+                 interrupt=None):
+        """Initialise SimulatedVL53L5CX.
+
+        :param i2c_addr: 7-bit i2c address the device responds to.
+        :param scene: Function returning the distance in mm (or None) for each zone, given the
+            time in seconds since ranging started and the number of zones across, see flat_scene().
+        :param latency: Time in seconds added to every i2c transaction.
+        :param bitrate: Bus clock in Hz used to add transfer time per byte (default: no transfer time).
+        :param reflectance: Reflectance (%) reported for every target.
+        :param ambient: Ambient rate (kcps/SPAD) reported for every zone.
+        :param temperature: Silicon temperature in degrees C.
+        :param noise_mm: Standard deviation of gaussian noise added to each distance.
+        :param seed: Random seed for the noise, so runs are repeatable.
+        :param clock: Function returning the time in seconds, used to pace frames.
+        :param interrupt: FakeGPIOInterrupt to trigger as each frame becomes ready, needs a real time clock.
+            With detection thresholds enabled it is only triggered for frames that meet them.
+
+        """
+        self.address = i2c_addr
+        self.scene = scene or flat_scene()
+        self.latency = latency
+        self.bitrate = bitrate
+        self.reflectance = reflectance
+        self.ambient = ambient
+        self.temperature = temperature
+        self.noise_mm = noise_mm
+        self.clock = clock
+        self.interrupt = interrupt
+        self._random = random.Random(seed)
+
+        # Crosstalk calibration data returned to the driver, as calibrated against a cover glass
+        self.xtalk = bytes(_XTALK_DATA_SIZE)
+
+        self.transactions = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.bus_time = 0.0
+        self.frames = 0
+
+        self._pages = {}
+        self._page = 0
+        self._dci = {}
+        self._firmware_bytes = 0
+        self._firmware = False
+        self._ranging = False
+        self._blocks = []
+        self._resolution = 16
+        self._period = 1.0
+        self._t_start = 0
+        self._frame_index = 0
+
+        self._memory(0x00)[0:2] = bytes((0xf0, 0x02))
+        self._memory(0x00)[0x09] = 0x04
+        self._memory(0x01)[0x21] = 0x10
+
+    def close(self):
+        pass
+
+    def i2c_rdwr(self, *msgs):
+        """Perform a combined i2c transaction, as SMBus.i2c_rdwr."""
+        register = 0
+        length = 0
+        for msg in msgs:
+            if msg.addr != self.address:
+                raise OSError(errno.EREMOTEIO, "No simulated VL53L5CX at 0x{:02x}".format(msg.addr))
+            if msg.flags & _I2C_M_RD:
+                data = self._read(register, msg.len)
+                memmove(msg.buf, bytes(data), msg.len)
+                register += msg.len
+                self.bytes_read += msg.len
+            else:
+                data = bytes(msg)
+                register = (data[0] << 8) | data[1]
+                if len(data) > 2:
+                    self._write(register, data[2:])
+                self.bytes_written += msg.len
+            length += msg.len
+
+        self.transactions += 1
+        self._delay(self.latency + (length * 9.0 / self.bitrate if self.bitrate else 0))
+
+    def _delay(self, delay):
+        if delay <= 0:
+            return
+        self.bus_time += delay
+        t_end = time.perf_counter() + delay
+        # Sleep for the bulk of longer delays, then spin for accuracy
+        if delay > 0.002:
+            time.sleep(delay - 0.001)
+        while time.perf_counter() < t_end:
+            pass
+
+    def _memory(self, page):
+        if page not in self._pages:
+            self._pages[page] = bytearray(_PAGE_SIZE)
+        return self._pages[page]
+
+    def _read(self, register, length):
+        if register == _PAGE_SELECT:
+            return bytes((self._page,)) * length
+
+        memory = self._memory(self._page)
+        if self._page == 0x00:
+            # GO2 status, MCU stopped (bit 7) and powered up (bit 0)
+            stopped = memory[0x14] == 0x01
+            memory[0x06] = (0x80 if stopped else 0x00) | (0x00 if memory[0x09] == 0x02 else 0x01)
+            memory[0x07] = 0x84 if stopped else 0x00
+        elif self._page == 0x02 and register == 0 and self._ranging:
+            self._update_frame()
+
+        return memory[register:register + length]
+
+    def _write(self, register, data):
+        if register == _PAGE_SELECT:
+            self._page = data[0]
+            return
+
+        if self._page in _FIRMWARE_PAGES:
+            self._firmware_bytes += len(data)
+            return
+
+        memory = self._memory(self._page)
+        memory[register:register + len(data)] = data
+
+        if self._page == 0x00:
+            self._write_control(register, data)
+        elif self._page == 0x02 and register + len(data) == _UI_CMD_END + 1:
+            if self._firmware:
+                self._command(register, len(data))
+
+    def _write_control(self, register, data):
+        for offset, value in enumerate(data):
+            register_offset = register + offset
+            if register_offset == 0x04:
+                self.address = value
+            elif register_offset == 0x0a and value == 0x03:
+                # Start of the boot sequence, the firmware must be uploaded again
+                self._firmware = False
+                self._firmware_bytes = 0
+                self._ranging = False
+            elif register_offset == 0x0b and value == 0x01:
+                # MCU released from reset
+                self._firmware = self._firmware_bytes >= _FIRMWARE_SIZE
+            elif register_offset == 0x14 and value == 0x01:
+                self._ranging = False
+
+    def _command(self, register, length):
+        memory = self._memory(0x02)
+        status = bytes((0x00, 0x03, 0x00, 0x00))
+
+        if register == _UI_CMD_RANGING and length == 4:
+            self._start_ranging()
+        else:
+            footer = memory[_UI_CMD_END - 7:_UI_CMD_END + 1]
+            start = _UI_CMD_END + 1 - (((footer[6] << 8) | footer[7]) + 4)
+            if footer[5] == 0x02 and footer[4] == 0x02:
+                # NVM read, the calibration data is left blank
+                memory[_UI_CMD_START:_UI_CMD_START + _NVM_DATA_SIZE] = bytes(_NVM_DATA_SIZE)
+                status = bytes((0x02, 0x00, 0x00, 0x00))
+            elif footer[5] == 0x02 and footer[4] == 0x07:
+                # Crosstalk calibration read
+                memory[_UI_CMD_START + 8:_UI_CMD_START + 8 + _XTALK_DATA_SIZE] = self.xtalk
+            elif footer[5] == 0x02:
+                self._dci_read(memory[start:start + 4])
+            else:
+                self._dci_write(memory[start:_UI_CMD_END - 7])
+
+        memory[_UI_CMD_STATUS:_UI_CMD_START] = status
+
+    def _dci_read(self, header):
+        index = (header[0] << 8) | header[1]
+        size = (header[2] << 4) | (header[3] >> 4)
+        data = self._dci.get(index, _DCI_DEFAULTS.get(index, b""))[:size]
+        data = data + bytes(size - len(data))
+        footer = bytes((0x00, 0x00, 0x00, 0x0f, 0x00, 0x01, 0x00, 0x00))
+        response = bytes(header) + _swap(data + footer)
+        self._memory(0x02)[_UI_CMD_START:_UI_CMD_START + len(response)] = response
+
+    def _dci_write(self, blocks):
+        # A write can carry several blocks, each a 4 byte header and big-endian data
+        position = 0
+        while position + 4 < len(blocks):
+            index = (blocks[position] << 8) | blocks[position + 1]
+            size = (blocks[position + 2] << 4) | (blocks[position + 3] >> 4)
+            if size == 0 or blocks[position + 3] & 0x0f or position + 4 + size > len(blocks):
+                break
+            self._dci[index] = bytes(_swap(blocks[position + 4:position + 4 + size]))
+            position += 4 + size
+
+    def _start_ranging(self):
+        zone_config = self._dci.get(_DCI_ZONE_CONFIG, bytes((4, 4)))
+        self._resolution = zone_config[0] * zone_config[1]
+        self._period = 1.0 / max(1, self._dci.get(_DCI_FREQ_HZ, bytes(2))[1])
+
+        # Crosstalk calibration programs a longer list, only the outputs the driver reads are simulated
+        output_list = self._dci.get(_DCI_OUTPUT_LIST, bytes(48))
+        outputs = struct.unpack_from("<{}I".format(len(output_list) // 4), output_list)
+        enables = struct.unpack("<4I", self._dci.get(_DCI_OUTPUT_ENABLES, bytes(16)))
+
+        self._blocks = []
+        data_read_size = 24
+        for i, (name, header) in enumerate(zip(_OUTPUTS, outputs)):
+            if i == 0 or header == 0 or not enables[i // 32] & (1 << (i % 32)):
+                continue
+            kind, size = header & 0x0f, (header >> 4) & 0x0fff
+            self._blocks.append((name, header, size))
+            data_read_size += 4 + (kind * size if 0x01 <= kind < 0x0d else size)
+
+        self._dci[_DCI_UI_RANGE_CONFIG] = bytes(8) + struct.pack("<HH", data_read_size, 0)
+        memory = self._memory(0x02)
+        memory[0:4] = bytes((0xff, 0x05, 0x05, 0x10))
+        self._t_start = self.clock()
+        self._frame_index = 0
+        self._ranging = True
+
+        if self.interrupt is not None:
+            threading.Thread(target=self._run_interrupt, args=(self._t_start, self._period), daemon=True).start()
+
+    def _run_interrupt(self, t_start, period):
+        # Pull INT low as each frame becomes due, until ranging stops or restarts
+        frame_index = 1
+        while self._ranging and self._t_start == t_start:
+            delay = t_start + frame_index * period - self.clock()
+            if delay > 0:
+                time.sleep(min(delay, 0.1))
+                continue
+            if self._thresholds_met(frame_index * period):
+                self.interrupt.trigger(int(self.clock() * 1e9))
+            frame_index = int((self.clock() - t_start) / period + 1e-6) + 1
+
+    def _thresholds_met(self, t):
+        # Only distance and the values derived from it are simulated, noise and motion are ignored
+        if not self._dci.get(_DCI_DET_THRESH_GLOBAL_CONFIG, bytes(2))[1]:
+            return True
+        zones = list(self.scene(t, int(self._resolution ** 0.5)))
+        thresholds = self._dci.get(_DCI_DET_THRESH_START, b"")
+        result = False
+        for offset in range(0, len(thresholds) - 11, 12):
+            low, high, measurement, comparison, zone, operation = struct.unpack_from("<iiBBBB", thresholds, offset)
+            if measurement in _THRESHOLD_MEASUREMENTS and comparison in _THRESHOLD_COMPARISONS and zone & 0x7f < len(zones):
+                name, scale = _THRESHOLD_MEASUREMENTS[measurement]
+                met = _THRESHOLD_COMPARISONS[comparison](self._value(name, zones[zone & 0x7f]), low / scale, high / scale)
+                result = (result and met) if operation == 2 else (result or met)
+            if zone & 0x80:
+                break
+        return result
+
+    def _update_frame(self):
+        # Allow for rounding, so a clock stepped by exactly one period always gives a new frame
+        frame_index = int((self.clock() - self._t_start) / self._period + 1e-6)
+        if frame_index == self._frame_index:
+            return
+        self._frame_index = frame_index
+
+        zones = self._zones(frame_index * self._period)
+        body = bytearray(12)
+        for name, header, size in self._blocks:
+            body += struct.pack("<I", header) + self._render(name, size, zones)
+        body += bytes(8)
+
+        memory = self._memory(0x02)
+        memory[0:4] = bytes(((frame_index - 1) % 255, 0x05, 0x05, 0x10))
+        memory[4:4 + len(body)] = _swap(body)
+        self.frames += 1
+
+    def _zones(self, t):
+        width = int(self._resolution ** 0.5)
+        zones = []
+        for distance in self.scene(t, width):
+            if distance and self.noise_mm:
+                distance += self._random.gauss(0, self.noise_mm)
+            zones.append(max(0, distance) if distance else None)
+        return zones
+
+    def _render(self, name, size, zones):
+        if name == "metadata":
+            return bytes(8) + struct.pack("<b3x", self.temperature)
+        if name not in _OUTPUT_FORMATS:
+            # Common data and motion indicator are left blank
+            return bytes(size)
+
+        # Only the first target in each zone is simulated
+        targets = 1 if name in _ZONE_OUTPUTS else size // self._resolution
+        values = []
+        for distance in zones:
+            values.append(self._value(name, distance))
+            values.extend(self._value(name, None) for _ in range(targets - 1))
+
+        fmt, scale = _OUTPUT_FORMATS[name]
+        return struct.pack("<{}{}".format(len(values), fmt), *[int(value * scale) for value in values])
+
+    def _value(self, name, distance):
+        if name == "ambient_per_spad":
+            return self.ambient
+        if distance is None:
+            return 255 if name == "target_status" else 0
+
+        metres = max(distance, 10) / 1000.0
+        return {
+            "nb_spads_enabled": 256 + int(metres * 1024),
+            "nb_target_detected": 1,
+            "signal_per_spad": min(100000, self.reflectance * 40 / (metres * metres)),
+            "range_sigma_mm": min(500, 1 + metres * 4),
+            "distance_mm": min(8000, distance),
+            "reflectance": self.reflectance,
+            "target_status": 5
+        }[name]
+
+
+class SimulatedBus:
+    """Several simulated devices sharing one i2c bus.
+
+    Use in place of an SMBus, transactions are routed to the device
+    at the requested address.
+
+    """
+    def __init__(self, devices):
+        """Initialise SimulatedBus.
+
+        :param devices: List of SimulatedVL53L5CX with unique addresses.
+
+        """
+        self.devices = list(devices)
+
+    def close(self):
+        pass
+
+    def i2c_rdwr(self, *msgs):
+        """Perform a combined i2c transaction, as SMBus.i2c_rdwr."""
+        for device in self.devices:
+            if device.address == msgs[0].addr:
+                return device.i2c_rdwr(*msgs)
+        raise OSError(errno.EREMOTEIO, "No simulated VL53L5CX at 0x{:02x}".format(msgs[0].addr))
@@ -0,0 +1,214 @@
+import time
+import numpy
+from .processing import VALID_STATUSES, status_table
+
+
+def segment(distance_mm, mask, max_step_mm=None):
+    """Label the connected regions of a mask of zones.
+
+    Zones are connected to their horizontal and vertical neighbours,
+    unless their distances differ by more than max_step_mm, so objects
+    in front of one another are kept apart.
+
+    :param distance_mm: Array of distances, shaped (rows, cols)
+    :param mask: Boolean array of the zones to label.
+    :param max_step_mm: Largest distance between connected zones (default: no limit)
+
+    Returns an array of labels from 0, -1 outside the mask, and the number of regions.
+
+    """
+    size = mask.size
+    labels = numpy.where(mask, numpy.arange(size).reshape(mask.shape), size)
+    right = mask[:, :-1] & mask[:, 1:]
+    down = mask[:-1] & mask[1:]
+    if max_step_mm is not None:
+        right &= numpy.abs(distance_mm[:, :-1] - distance_mm[:, 1:]) <= max_step_mm
+        down &= numpy.abs(distance_mm[:-1] - distance_mm[1:]) <= max_step_mm
+
+    # Spread the lowest label across each connection until nothing changes. Labels are
+    # zone indices, so following each label to that zone's label (with the background
+    # pointing to itself) lets them jump along long regions rather than crawl.
+    lookup = numpy.empty(size + 1, dtype=labels.dtype)
+    lookup[size] = size
+    while True:
+        previous = labels.copy()
+        lookup[:size] = labels.ravel()
+        labels = lookup[labels]
+        lowest = numpy.where(right, numpy.minimum(labels[:, :-1], labels[:, 1:]), size)
+        numpy.minimum(labels[:, :-1], lowest, out=labels[:, :-1])
+        numpy.minimum(labels[:, 1:], lowest, out=labels[:, 1:])
+        lowest = numpy.where(down, numpy.minimum(labels[:-1], labels[1:]), size)
+        numpy.minimum(labels[:-1], lowest, out=labels[:-1])
+        numpy.minimum(labels[1:], lowest, out=labels[1:])
+        if numpy.array_equal(previous, labels):
+            break
+
+    roots, inverse = numpy.unique(labels[mask], return_inverse=True)
+    labels = numpy.full(mask.shape, -1)
+    labels[mask] = inverse
+    return labels, len(roots)
+
+
+class TrackedObject:
+    """An object followed across frames by ObjectTracker.
+
+    x and y are the (reflectance weighted) centre of the object in
+    zones, from the first column and row, distance_mm is its mean
+    distance and size the number of zones it covers. velocity is
+    (x, y, distance_mm) per second.
+
+    """
+    def __init__(self, object_id, blob):
+        self.id = object_id
+        self.x, self.y, self.distance_mm, self.size = blob
+        self.velocity = (0.0, 0.0, 0.0)
+        self.age = 1
+        self.missed = 0
+
+    def __repr__(self):
+        return f"TrackedObject(id={self.id}, x={self.x:.2f}, y={self.y:.2f}, distance_mm={self.distance_mm:.0f}, size={self.size})"
+
+    def predict(self, dt):
+        return (self.x + self.velocity[0] * dt, self.y + self.velocity[1] * dt, self.distance_mm + self.velocity[2] * dt)
+
+    def update(self, blob, dt, smoothing):
+        x, y, distance_mm, size = blob
+        if dt > 0:
+            velocity = ((x - self.x) / dt, (y - self.y) / dt, (distance_mm - self.distance_mm) / dt)
+            self.velocity = tuple(old * smoothing + new * (1 - smoothing) for old, new in zip(self.velocity, velocity))
+        self.x, self.y, self.distance_mm, self.size = blob
+        self.age += 1
+        self.missed = 0
+
+
+class ObjectTracker:
+    """Find objects in each frame and follow them across frames.
+
+    Each frame is segmented into connected regions of valid zones
+    within the distance (and reflectance) thresholds, and each region is
+    matched to the nearest predicted position of an object seen before,
+    keeping its id, or becomes a new object.
+
+    """
+    def __init__(self, max_distance_mm=400, min_reflectance=None, min_size=1, max_step_mm=100,
+                 max_jump=2.0, max_depth_jump_mm=200, max_missed=3, smoothing=0.5, dt=None, valid=VALID_STATUSES):
+        """Initialise ObjectTracker.
+
+        :param max_distance_mm: Ignore zones further away than this.
+        :param min_reflectance: Ignore zones with a lower reflectance (%) than this (default: no limit)
+        :param min_size: Ignore regions of fewer zones than this.
+        :param max_step_mm: Split regions where neighbouring distances differ by more than this.
+        :param max_jump: Furthest (in zones) an object can move from its predicted position between frames.
+        :param max_depth_jump_mm: Furthest an object's distance can move from its prediction between frames.
+        :param max_missed: Forget objects not seen for this many frames.
+        :param smoothing: Weight of the previous velocity in each update, from 0 to 1.
+        :param dt: Time between frames in seconds (default: measure it between updates)
+        :param valid: Target statuses to treat as valid.
+
+        """
+        self.max_distance_mm = max_distance_mm
+        self.min_reflectance = min_reflectance
+        self.min_size = min_size
+        self.max_step_mm = max_step_mm
+        self.max_jump = max_jump
+        self.max_depth_jump_mm = max_depth_jump_mm
+        self.max_missed = max_missed
+        self.smoothing = smoothing
+        self.dt = dt
+        self.objects = []
+        self._table = status_table(valid)
+        self._next_id = 0
+        self._t_last = None
+
+    def find(self, distance_mm, reflectance=None, valid=None):
+        """Find the objects in a frame, without tracking them.
+
+        Returns a list of (x, y, distance_mm, size) tuples, see TrackedObject.
+
+        """
+        distance = numpy.asarray(distance_mm, dtype=numpy.float32)
+        mask = distance <= self.max_distance_mm
+        if valid is not None:
+            mask &= valid
+        if reflectance is not None and self.min_reflectance is not None:
+            mask &= reflectance >= self.min_reflectance
+
+        labels, count = segment(distance, mask, self.max_step_mm)
+        if count == 0:
+            return []
+
+        index = labels[mask]
+        weights = numpy.ones(len(index)) if reflectance is None else numpy.asarray(reflectance, dtype=float)[mask] + 1
+        rows, cols = numpy.nonzero(mask)
+        total = numpy.bincount(index, weights, count)
+        x = numpy.bincount(index, weights * cols, count) / total
+        y = numpy.bincount(index, weights * rows, count) / total
+        size = numpy.bincount(index, minlength=count)
+        distance = numpy.bincount(index, distance[mask], count) / size
+        return [blob for blob in zip(x.tolist(), y.tolist(), distance.tolist(), size.tolist()) if blob[3] >= self.min_size]
+
+    def update(self, distance_mm, reflectance=None, valid=None, dt=None):
+        """Track the objects in a new frame.
+
+        :param distance_mm: Array of distances, shaped (rows, cols)
+        :param reflectance: Optional array of reflectances, to weight positions and apply min_reflectance.
+        :param valid: Optional validity mask, eg: from FrameProcessor.valid()
+        :param dt: Time since the last frame in seconds, eg: when replaying faster than real time.
+
+        Returns a list of the TrackedObject seen in this frame.
+
+        """
+        now = time.monotonic()
+        if dt is None:
+            dt = self.dt if self.dt is not None else now - (self._t_last or now)
+        self._t_last = now
+
+        blobs = self.find(distance_mm, reflectance, valid)
+
+        # Greedily match the closest object/blob pairs within reach of each other
+        # Objects which went unseen have moved for every frame since they were last seen
+        pairs = []
+        for i, tracked in enumerate(self.objects):
+            px, py, pd = tracked.predict((tracked.missed + 1) * dt)
+            for j, (x, y, distance, _) in enumerate(blobs):
+                jump = ((x - px) ** 2 + (y - py) ** 2) ** 0.5
+                if jump <= self.max_jump and abs(distance - pd) <= self.max_depth_jump_mm:
+                    pairs.append((jump, i, j))
+        pairs.sort()
+
+        matched_objects = set()
+        matched_blobs = set()
+        for _, i, j in pairs:
+            if i in matched_objects or j in matched_blobs:
+                continue
+            self.objects[i].update(blobs[j], (self.objects[i].missed + 1) * dt, self.smoothing)
+            matched_objects.add(i)
+            matched_blobs.add(j)
+
+        for i, tracked in enumerate(self.objects):
+            if i not in matched_objects:
+                tracked.missed += 1
+        self.objects = [tracked for tracked in self.objects if tracked.missed <= self.max_missed]
+
+        for j, blob in enumerate(blobs):
+            if j not in matched_blobs:
+                self.objects.append(TrackedObject(self._next_id, blob))
+                self._next_id += 1
+
+        return [tracked for tracked in self.objects if tracked.missed == 0]
+
+    def update_frame(self, frame, target=0):
+        """Track the objects in a Frame, using its target_status and reflectance (if available).
+
+        Without target_status every zone is valid.
+
+        :param frame: Frame to track.
+        :param target: Which target to use in each zone.
+
+        """
+        reflectance = getattr(frame, "reflectance", None)
+        target_status = getattr(frame, "target_status", None)
+        return self.update(
+            frame.distance_mm[target],
+            None if reflectance is None else reflectance[target],
+            numpy.ones(frame.shape, dtype=bool) if target_status is None else self._table.take(target_status[target]))
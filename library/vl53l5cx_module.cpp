@@ -1,6 +1,11 @@
+#include <cstddef>
+
 extern "C" {
 	#include "vl53l5cx_api.h"
+	#include "vl53l5cx_buffers.h"
 	#include "vl53l5cx_plugin_motion_indicator.h"
+	#include "vl53l5cx_plugin_detection_thresholds.h"
+	#include "vl53l5cx_plugin_xtalk.h"
 
 	void *__symbols__[] = {
 		(void *)&vl53l5cx_is_alive,
@@ -29,25 +34,124 @@ extern "C" {
 		(void *)&vl53l5cx_dci_replace_data,
 		// Motion
 		(void *)&vl53l5cx_motion_indicator_init,
-		(void *)&vl53l5cx_motion_indicator_set_distance_motion
+		(void *)&vl53l5cx_motion_indicator_set_distance_motion,
+		(void *)&vl53l5cx_motion_indicator_set_resolution,
+		// Detection thresholds
+		(void *)&vl53l5cx_get_detection_thresholds_enable,
+		(void *)&vl53l5cx_set_detection_thresholds_enable,
+		(void *)&vl53l5cx_get_detection_thresholds,
+		(void *)&vl53l5cx_set_detection_thresholds,
+		// Crosstalk
+		(void *)&vl53l5cx_get_caldata_xtalk,
+		(void *)&vl53l5cx_set_caldata_xtalk,
+		(void *)&vl53l5cx_get_xtalk_margin,
+		(void *)&vl53l5cx_set_xtalk_margin
+	};
+
+	// Layout of VL53L5CX_ResultsData as compiled, so Python can build a matching Structure
+	typedef struct {
+		const char *name;
+		uint32_t offset;
+		uint32_t size;
+	} results_field;
+
+	#define RESULTS_FIELD(field) {#field, offsetof(VL53L5CX_ResultsData, field), sizeof(VL53L5CX_ResultsData::field)}
+
+	const results_field results_fields[] = {
+		RESULTS_FIELD(silicon_temp_degc),
+#ifndef VL53L5CX_DISABLE_AMBIENT_PER_SPAD
+		RESULTS_FIELD(ambient_per_spad),
+#endif
+#ifndef VL53L5CX_DISABLE_NB_TARGET_DETECTED
+		RESULTS_FIELD(nb_target_detected),
+#endif
+#ifndef VL53L5CX_DISABLE_NB_SPADS_ENABLED
+		RESULTS_FIELD(nb_spads_enabled),
+#endif
+#ifndef VL53L5CX_DISABLE_SIGNAL_PER_SPAD
+		RESULTS_FIELD(signal_per_spad),
+#endif
+#ifndef VL53L5CX_DISABLE_RANGE_SIGMA_MM
+		RESULTS_FIELD(range_sigma_mm),
+#endif
+#ifndef VL53L5CX_DISABLE_DISTANCE_MM
+		RESULTS_FIELD(distance_mm),
+#endif
+#ifndef VL53L5CX_DISABLE_REFLECTANCE_PERCENT
+		RESULTS_FIELD(reflectance),
+#endif
+#ifndef VL53L5CX_DISABLE_TARGET_STATUS
+		RESULTS_FIELD(target_status),
+#endif
+#ifndef VL53L5CX_DISABLE_MOTION_INDICATOR
+		RESULTS_FIELD(motion_indicator),
+#endif
 	};
 
+	uint32_t get_results_fields(const results_field **fields) {
+		*fields = results_fields;
+		return sizeof(results_fields) / sizeof(results_field);
+	}
+
+	uint32_t get_results_size() {
+		return sizeof(VL53L5CX_ResultsData);
+	}
+
+	uint32_t get_nb_target_per_zone() {
+		return VL53L5CX_NB_TARGET_PER_ZONE;
+	}
+
 	VL53L5CX_Configuration* get_configuration(uint8_t i2c_addr, i2c_read_func i2c_read, i2c_write_func i2c_write, sleep_func sleep_ms) {
 		VL53L5CX_Configuration *configuration = new VL53L5CX_Configuration{
 			.platform = {
 				.address = i2c_addr,
 				.i2c_read = i2c_read,
 				.i2c_write = i2c_write,
-				.sleep = sleep_ms
+				.sleep = sleep_ms,
+				.i2c_fd = -1
+			},
+		};
+		return configuration;
+	}
+
+	VL53L5CX_Configuration* get_native_configuration(uint8_t i2c_addr, uint8_t i2c_bus, sleep_func sleep_ms) {
+		int i2c_fd = i2c_open(i2c_bus);
+		if(i2c_fd < 0) {
+			return nullptr;
+		}
+		VL53L5CX_Configuration *configuration = new VL53L5CX_Configuration{
+			.platform = {
+				.address = i2c_addr,
+				.i2c_read = nullptr,
+				.i2c_write = nullptr,
+				.sleep = sleep_ms,
+				.i2c_fd = i2c_fd
 			},
 		};
 		return configuration;
 	}
 
 	void cleanup_configuration(VL53L5CX_Configuration *configuration) {
+		i2c_close(configuration->platform.i2c_fd);
 		delete configuration;
 	}
 
+	void set_platform_stats_enabled(VL53L5CX_Configuration *configuration, uint8_t enabled) {
+		configuration->platform.stats_enabled = enabled;
+	}
+
+	void get_platform_stats(VL53L5CX_Configuration *configuration, VL53L5CX_PlatformStats *stats) {
+		*stats = configuration->platform.stats;
+	}
+
+	void set_sleep_spin_us(VL53L5CX_Configuration *configuration, uint32_t spin_us) {
+		configuration->platform.spin_us = spin_us;
+	}
+
+	uint32_t get_xtalk_size() {
+		return VL53L5CX_XTALK_BUFFER_SIZE;
+	}
+
 	VL53L5CX_Motion_Configuration* get_motion_configuration() {
 		VL53L5CX_Motion_Configuration *configuration = new VL53L5CX_Motion_Configuration{
 
@@ -58,4 +162,54 @@ extern "C" {
 	void cleanup_motion_configuration(VL53L5CX_Motion_Configuration *motion_configuration) {
 		delete motion_configuration;
 	}
+
+	const char* get_api_revision() {
+		return VL53L5CX_API_REVISION;
+	}
+
+	uint32_t get_state_size() {
+		return VL53L5CX_OFFSET_BUFFER_SIZE + VL53L5CX_XTALK_BUFFER_SIZE;
+	}
+
+	// Copy out the calibration state vl53l5cx_init leaves in the configuration
+	void get_state(VL53L5CX_Configuration *configuration, uint8_t *state) {
+		memcpy(state, configuration->offset_data, VL53L5CX_OFFSET_BUFFER_SIZE);
+		memcpy(state + VL53L5CX_OFFSET_BUFFER_SIZE, configuration->xtalk_data, VL53L5CX_XTALK_BUFFER_SIZE);
+	}
+
+	// Restore the configuration to its post vl53l5cx_init state without touching the sensor
+	void set_state(VL53L5CX_Configuration *configuration, uint8_t *state) {
+		configuration->default_xtalk = (uint8_t*)VL53L5CX_DEFAULT_XTALK;
+		configuration->default_configuration = (uint8_t*)VL53L5CX_DEFAULT_CONFIGURATION;
+		memcpy(configuration->offset_data, state, VL53L5CX_OFFSET_BUFFER_SIZE);
+		memcpy(configuration->xtalk_data, state + VL53L5CX_OFFSET_BUFFER_SIZE, VL53L5CX_XTALK_BUFFER_SIZE);
+	}
+
+	// Check the firmware answers a DCI read, giving up after `retries` * 10ms
+	// rather than the 2 second timeout used by the driver.
+	uint8_t probe_firmware(VL53L5CX_Configuration *configuration, uint8_t retries) {
+		uint8_t status = VL53L5CX_STATUS_OK;
+		uint8_t cmd_status[4] = {0x00, 0x00, 0x00, 0x00};
+		uint8_t cmd[] = {
+			(uint8_t)(VL53L5CX_DCI_ZONE_CONFIG >> 8), (uint8_t)(VL53L5CX_DCI_ZONE_CONFIG & 0xff), 0x00, 0x80,
+			0x00, 0x00, 0x00, 0x0f,
+			0x00, 0x02, 0x00, 0x08};
+
+		status |= WrByte(&configuration->platform, 0x7fff, 0x02);
+		status |= WrMulti(&configuration->platform, VL53L5CX_UI_CMD_STATUS, cmd_status, sizeof(cmd_status));
+		status |= WrMulti(&configuration->platform, VL53L5CX_UI_CMD_END - 11, cmd, sizeof(cmd));
+
+		while(status == VL53L5CX_STATUS_OK) {
+			status |= RdMulti(&configuration->platform, VL53L5CX_UI_CMD_STATUS, cmd_status, sizeof(cmd_status));
+			if(cmd_status[1] == 0x03 && cmd_status[2] < 0x7f) {
+				return VL53L5CX_STATUS_OK;
+			}
+			if(retries-- == 0) {
+				return VL53L5CX_STATUS_TIMEOUT_ERROR;
+			}
+			status |= WaitMs(&configuration->platform, 10);
+		}
+
+		return status;
+	}
 }